@@ -12,11 +12,28 @@ from constants import (
 import traceback
 import time
 from functools import wraps
+from typing import List
 
-import decimal
-import json
 import os
-import boto3
+
+from clients.awsClients import get_aws_clients
+from clients.wrappedStore import DecimalEncoder, get_wrapped_store
+from clients.writeBehind import WriteBehindQueue
+from clients.llmCache import LLMResponseCache
+from helpers.match_ranking import rank_interesting_matches
+from helpers.ttl_cache import TTLCache
+
+# Background writer for queue_wrapped_for_storage
+wrapped_write_queue = WriteBehindQueue(get_wrapped_store)
+
+# Tool-use responses by request hash, persisted next to the wrapped records
+llm_cache = LLMResponseCache(get_wrapped_store)
+
+# Decoded wrapped records by unique_id, so popular profiles don't cost a DynamoDB read per view
+wrapped_cache = TTLCache(
+    max_bytes=int(os.getenv("WRAPPED_CACHE_MAX_BYTES", 64 * 1024**2)),
+    ttl=float(os.getenv("WRAPPED_CACHE_TTL_SECONDS", 300)),
+)
 
 
 def retry_on_throttle(max_retries=3, base_delay=2):
@@ -71,92 +88,98 @@ def retry_on_throttle(max_retries=3, base_delay=2):
     return decorator
 
 
-def convert_floats_to_decimals(obj):
-    """
-    Recursively converts all float values in a dictionary/list to Decimal
+def get_wrapped_from_dynamodb(unique_id: str, use_cache: bool = True):
     """
-    if isinstance(obj, dict):
-        return {key: convert_floats_to_decimals(value) for key, value in obj.items()}
-    elif isinstance(obj, list):
-        return [convert_floats_to_decimals(element) for element in obj]
-    elif isinstance(obj, float):
-        return decimal.Decimal(str(obj))
-    return obj
+    Check if player's wrapped data exists in the wrapped store
+    (DynamoDB unless WRAPPED_STORE_BACKEND selects a local store)
 
+    Records are served from an in-memory cache unless `use_cache` is False. The returned
+    dict may be shared with other requests, so it must not be modified.
+    """
+    if use_cache:
+        cached = wrapped_cache.get(unique_id)
+        if cached is not None:
+            return cached
 
-class DecimalEncoder(json.JSONEncoder):
-    def default(self, obj):
-        if isinstance(obj, decimal.Decimal):
-            return float(obj)
-        return super(DecimalEncoder, self).default(obj)
+    try:
+        found = get_wrapped_store().get_with_size(unique_id)
+        if found is None:
+            return None
+        record, size = found
+        wrapped_cache.put(unique_id, record, size)
+        return record
+    except Exception as e:
+        print(f"Error retrieving from DynamoDB: {e}")
+        return None
 
 
-def get_wrapped_from_dynamodb(unique_id: str):
+def get_wrapped_batch_from_dynamodb(unique_ids: List[str], use_cache: bool = True):
     """
-    Check if player's wrapped data exists in DynamoDB
+    Looks up several wrapped/comparison records at once: cached records are served from
+    memory and the rest are read from the wrapped store in one batch (a single
+    BatchGetItem on DynamoDB).
+
+    Returns:
+        dict: unique_id -> record (None when not found). As with get_wrapped_from_dynamodb,
+              records may be shared with other requests and must not be modified.
     """
+    records = {unique_id: None for unique_id in unique_ids}
+    missing = list(records)
+    if use_cache:
+        for unique_id in list(missing):
+            cached = wrapped_cache.get(unique_id)
+            if cached is not None:
+                records[unique_id] = cached
+                missing.remove(unique_id)
+
+    if not missing:
+        return records
+
     try:
-        # Get AWS credentials from environment variables
-        aws_access_key_id = os.getenv("AWS_ACCESS_KEY_ID")
-        aws_secret_access_key = os.getenv("AWS_SECRET_ACCESS_KEY")
-        aws_region = os.getenv("AWS_REGION", "eu-north-1")
-
-        if not all([aws_access_key_id, aws_secret_access_key]):
-            raise Exception("AWS credentials not found in environment variables")
-
-        # Create a new session with our credentials
-        session = boto3.Session(
-            aws_access_key_id=aws_access_key_id,
-            aws_secret_access_key=aws_secret_access_key,
-            region_name=aws_region,
-        )
+        found = get_wrapped_store().batch_get_with_size(missing)
+    except Exception as e:
+        print(f"Error batch retrieving from DynamoDB: {e}")
+        return records
 
-        # Use the session to create the DynamoDB resource
-        dynamodb = session.resource("dynamodb")
-        table = dynamodb.Table("rift-rewind-jay")
+    for unique_id, (record, size) in found.items():
+        wrapped_cache.put(unique_id, record, size)
+        records[unique_id] = record
+    return records
 
-        response = table.get_item(Key={"unique_id": unique_id})
 
-        item = response.get("Item")
-        if item:
-            # Convert the item to JSON and back to handle Decimal conversion
-            return json.loads(json.dumps(item, cls=DecimalEncoder))
-        return None
+def queue_wrapped_for_storage(json_for_db: dict):
+    """
+    Stores player's wrapped data without waiting on the wrapped store.
+
+    The record is readable through the in-memory cache right away and written by the
+    write-behind queue shortly after. With WRITE_BEHIND_ENABLED=false it is stored
+    synchronously instead.
+    """
+    if os.getenv("WRITE_BEHIND_ENABLED", "true").lower() in ("0", "false", "no"):
+        return store_wrapped_in_dynamodb(json_for_db)
+
+    try:
+        record_json = json.dumps(json_for_db, separators=(",", ":"), cls=DecimalEncoder)
+        wrapped_cache.put(json_for_db["unique_id"], json.loads(record_json), len(record_json))
+        wrapped_write_queue.put(json_for_db)
+        return True
     except Exception as e:
-        print(f"Error retrieving from DynamoDB: {e}")
-        return None
+        print(f"Error storing in DynamoDB: {e}")
+        return False
 
 
 def store_wrapped_in_dynamodb(json_for_db: dict):
     """
-    Store player's wrapped data in DynamoDB
+    Store player's wrapped data in the wrapped store
+    (DynamoDB unless WRAPPED_STORE_BACKEND selects a local store)
     """
     try:
-        # Get AWS credentials from environment variables
-        aws_access_key_id = os.getenv("AWS_ACCESS_KEY_ID")
-        aws_secret_access_key = os.getenv("AWS_SECRET_ACCESS_KEY")
-        aws_region = os.getenv("AWS_REGION", "eu-north-1")
-
-        if not all([aws_access_key_id, aws_secret_access_key]):
-            raise Exception("AWS credentials not found in environment variables")
-
-        # Create a new session with our credentials
-        session = boto3.Session(
-            aws_access_key_id=aws_access_key_id,
-            aws_secret_access_key=aws_secret_access_key,
-            region_name=aws_region,
-        )
-
-        # Use the session to create the DynamoDB resource
-        dynamodb = session.resource("dynamodb")
-        table = dynamodb.Table("rift-rewind-jay")
-
-        # Convert all float values to Decimal
-        converted_data = convert_floats_to_decimals(json_for_db)
-        print("Final Data to Store:", converted_data)
+        get_wrapped_store().put(json_for_db)
+        print(f"Successfully stored data for {json_for_db['unique_id']}")
 
-        table.put_item(Item=converted_data)
-        print(f"Successfully stored data for {converted_data['unique_id']}")
+        # Write through, with its own copy of the record as a read would return it
+        record_json = json.dumps(json_for_db, separators=(",", ":"), cls=DecimalEncoder)
+        wrapped_cache.put(json_for_db["unique_id"], json.loads(record_json), len(record_json))
         return True
     except Exception as e:
         print(f"Error storing in DynamoDB: {e}")
@@ -170,23 +193,10 @@ def find_and_generate_descriptions_of_interesting_matches(
     tool_config=INTERESTING_MATCHES_SCHEMA,
 ):
     try:
-        # Get AWS credentials from environment variables
-        aws_access_key_id = os.getenv("AWS_ACCESS_KEY_ID")
-        aws_secret_access_key = os.getenv("AWS_SECRET_ACCESS_KEY")
-        aws_region = os.getenv("AWS_REGION", "eu-north-1")
-
-        if not all([aws_access_key_id, aws_secret_access_key]):
-            raise Exception("AWS credentials not found in environment variables")
-
-        # Create a new session with our credentials
-        session = boto3.Session(
-            aws_access_key_id=aws_access_key_id,
-            aws_secret_access_key=aws_secret_access_key,
-            region_name=aws_region,
-        )
-
-        # Use the session to create the Bedrock client
-        bedrock_client = session.client("bedrock-runtime")
+        # Shared Bedrock client from the app's client registry
+        aws_clients = get_aws_clients()
+        bedrock_client = aws_clients.bedrock_runtime()
+        aws_region = aws_clients.region
 
         # Use Haiku for cost-effective match analysis
         model_id = "eu.anthropic.claude-haiku-4-5-20251001-v1:0"
@@ -194,6 +204,10 @@ def find_and_generate_descriptions_of_interesting_matches(
         # For better quality descriptions:
         # model_id = "eu.anthropic.claude-sonnet-4-5-20250929-v1:0"
 
+        # Only the best candidates by local scoring are sent, so the prompt size
+        # doesn't grow with the number of games played
+        candidates = rank_interesting_matches(timeline_data)
+
         # Create the initial message from user with match data
         messages = [
             {
@@ -201,9 +215,10 @@ def find_and_generate_descriptions_of_interesting_matches(
                 "content": [
                     {
                         "text": f"""Please analyze these League of Legends matches and identify the interesting ones using the find_players_interesting_matches tool.
+These are the {len(candidates)} most notable of the player's {len(timeline_data)} matches (multikill is the largest multikill, duration is in seconds, comeback means won after losing an inhibitor).
 
 Match Data:
-{json.dumps(timeline_data, indent=2)}"""
+{json.dumps(candidates, separators=(",", ":"), sort_keys=True)}"""
                     }
                 ],
             }
@@ -211,10 +226,12 @@ Match Data:
 
         print(f"Invoking Bedrock Model: {model_id}...")
         print(f"Region: {aws_region}")
-        print(f"Analyzing {len(timeline_data)} matches...")
+        print(f"Analyzing {len(candidates)} of {len(timeline_data)} matches...")
 
-        # First call to the model
-        response = bedrock_client.converse(
+        # First call to the model; an identical earlier request (same model, prompts,
+        # schema and input) is answered from the cache
+        response = llm_cache.converse(
+            bedrock_client,
             modelId=model_id, messages=messages, system=system_prompt, toolConfig=tool_config
         )
 
@@ -318,23 +335,10 @@ def generate_player_wrapped_json(
         dict: A dictionary containing unique_id and wrapped_data
     """
     try:
-        # Get AWS credentials from environment variables
-        aws_access_key_id = os.getenv("AWS_ACCESS_KEY_ID")
-        aws_secret_access_key = os.getenv("AWS_SECRET_ACCESS_KEY")
-        aws_region = os.getenv("AWS_REGION", "eu-north-1")
-
-        if not all([aws_access_key_id, aws_secret_access_key]):
-            raise Exception("AWS credentials not found in environment variables")
-
-        # Create a new session with our credentials
-        session = boto3.Session(
-            aws_access_key_id=aws_access_key_id,
-            aws_secret_access_key=aws_secret_access_key,
-            region_name=aws_region,
-        )
-
-        # Use the session to create the Bedrock client
-        bedrock_client = session.client("bedrock-runtime")
+        # Shared Bedrock client from the app's client registry
+        aws_clients = get_aws_clients()
+        bedrock_client = aws_clients.bedrock_runtime()
+        aws_region = aws_clients.region
 
         # to use while testing
         model_id = "eu.anthropic.claude-haiku-4-5-20251001-v1:0"
@@ -357,7 +361,7 @@ def generate_player_wrapped_json(
                         "text": f"""Please analyze this player data and generate a League of Legends Wrapped summary using the generate_player_wrapped tool.
 
         Player Data:
-        {json.dumps(player_data, indent=2)}"""
+        {json.dumps(player_data, indent=2, sort_keys=True)}"""
                     }
                 ],
             }
@@ -367,8 +371,10 @@ def generate_player_wrapped_json(
         print(f"Region: eu-north-1")
         print(f"Using Converse API with tool configuration")
 
-        # First call to the model
-        response = bedrock_client.converse(
+        # First call to the model; an identical earlier request (same model, prompts,
+        # schema and input) is answered from the cache
+        response = llm_cache.converse(
+            bedrock_client,
             modelId=model_id, messages=messages, system=system_prompt, toolConfig=tool_config
         )
 
@@ -491,23 +497,10 @@ def generate_player_comparison(
         dict: A dictionary containing the comparison data
     """
     try:
-        # Get AWS credentials from environment variables
-        aws_access_key_id = os.getenv("AWS_ACCESS_KEY_ID")
-        aws_secret_access_key = os.getenv("AWS_SECRET_ACCESS_KEY")
-        aws_region = os.getenv("AWS_REGION", "eu-north-1")
-
-        if not all([aws_access_key_id, aws_secret_access_key]):
-            raise Exception("AWS credentials not found in environment variables")
-
-        # Create a new session with our credentials
-        session = boto3.Session(
-            aws_access_key_id=aws_access_key_id,
-            aws_secret_access_key=aws_secret_access_key,
-            region_name=aws_region,
-        )
-
-        # Use the session to create the Bedrock client
-        bedrock_client = session.client("bedrock-runtime")
+        # Shared Bedrock client from the app's client registry
+        aws_clients = get_aws_clients()
+        bedrock_client = aws_clients.bedrock_runtime()
+        aws_region = aws_clients.region
 
         # Use Sonnet for better quality comparison
         model_id = "eu.anthropic.claude-sonnet-4-5-20250929-v1:0"
@@ -524,10 +517,10 @@ def generate_player_comparison(
                         "text": f"""Please analyze these two League of Legends players and generate a detailed comparison using the generate_player_comparison tool.
 
 Player 1: {player1_name}
-{json.dumps(player1_data, indent=2)}
+{json.dumps(player1_data, indent=2, sort_keys=True)}
 
 Player 2: {player2_name}
-{json.dumps(player2_data, indent=2)}"""
+{json.dumps(player2_data, indent=2, sort_keys=True)}"""
                     }
                 ],
             }
@@ -537,8 +530,10 @@ Player 2: {player2_name}
         print(f"Region: {aws_region}")
         print(f"Comparing {player1_name} vs {player2_name}")
 
-        # First call to the model
-        response = bedrock_client.converse(
+        # First call to the model; an identical earlier request (same model, prompts,
+        # schema and input) is answered from the cache
+        response = llm_cache.converse(
+            bedrock_client,
             modelId=model_id, messages=messages, system=system_prompt, toolConfig=tool_config
         )
 
@@ -0,0 +1,104 @@
+import logging
+import os
+import threading
+from typing import Any, Dict, Optional
+
+import boto3
+from botocore.config import Config
+
+logger = logging.getLogger(__name__)
+
+
+class AWSClientRegistry:
+    """
+    Long-lived boto3 clients shared by every request.
+
+    Credentials are resolved and endpoints loaded once, and each client keeps a pool
+    of open connections instead of paying for a new TLS handshake per call. boto3
+    clients are thread-safe, so all threads share one client (and one pool) per service;
+    DynamoDB is used through its client rather than a resource for the same reason.
+    """
+
+    def __init__(
+        self,
+        region: Optional[str] = None,
+        max_pool_connections: Optional[int] = None,
+        session: Optional[boto3.Session] = None,
+    ):
+        """
+        Args:
+            region (str, optional): AWS region. Defaults to AWS_REGION or eu-north-1.
+            max_pool_connections (int, optional): Connections each client keeps open.
+                Defaults to AWS_MAX_POOL_CONNECTIONS or 50.
+            session (boto3.Session, optional): Session to build clients from. Defaults to one
+                using AWS_ACCESS_KEY_ID/AWS_SECRET_ACCESS_KEY when set, else the default
+                credential chain.
+        """
+        self.region = region or os.getenv("AWS_REGION", "eu-north-1")
+        self.config = Config(
+            max_pool_connections=max_pool_connections
+            or int(os.getenv("AWS_MAX_POOL_CONNECTIONS", 50)),
+            tcp_keepalive=True,
+        )
+        self._session = session or boto3.Session(
+            aws_access_key_id=os.getenv("AWS_ACCESS_KEY_ID"),
+            aws_secret_access_key=os.getenv("AWS_SECRET_ACCESS_KEY"),
+            region_name=self.region,
+        )
+
+        # boto3 sessions aren't thread-safe, so clients are created under a lock
+        self._lock = threading.Lock()
+        self._clients: Dict[str, Any] = {}
+
+    def client(self, service_name: str):
+        """Returns the shared client for `service_name`, creating it on first use."""
+        client = self._clients.get(service_name)
+        if client is None:
+            with self._lock:
+                client = self._clients.get(service_name)
+                if client is None:
+                    logger.info(f"Creating {service_name} client in {self.region}")
+                    client = self._session.client(service_name, config=self.config)
+                    self._clients[service_name] = client
+        return client
+
+    def bedrock_runtime(self):
+        """Returns the shared bedrock-runtime client."""
+        return self.client("bedrock-runtime")
+
+    def close(self) -> None:
+        """Closes the shared clients' connection pools."""
+        with self._lock:
+            for client in self._clients.values():
+                client.close()
+            self._clients.clear()
+
+
+_aws_clients: Optional[AWSClientRegistry] = None
+_aws_clients_lock = threading.Lock()
+
+
+def get_aws_clients() -> AWSClientRegistry:
+    """
+    Returns the registry in use, creating a default one if the app hasn't set one
+    (e.g. when a client module is used from a script).
+    """
+    global _aws_clients
+    if _aws_clients is None:
+        with _aws_clients_lock:
+            if _aws_clients is None:
+                _aws_clients = AWSClientRegistry()
+    return _aws_clients
+
+
+def set_aws_clients(registry: Optional[AWSClientRegistry]) -> Optional[AWSClientRegistry]:
+    """
+    Installs `registry` as the one every AWS call uses and returns the previous one.
+
+    Called from the app lifespan; tests can install a stand-in exposing the same
+    methods (client, bedrock_runtime, close) to run without AWS.
+    """
+    global _aws_clients
+    with _aws_clients_lock:
+        previous, _aws_clients = _aws_clients, registry
+    return previous
@@ -1,9 +1,12 @@
-import boto3
 from botocore.exceptions import ClientError
 from constants import CHATBOT_SYSTEM_PROMPT
-import os
+from clients.awsClients import get_aws_clients
+from helpers.conversation_context import ConversationContext, message_tokens
+from helpers.ttl_cache import TTLCache
+import hashlib
 import logging
 import json
+import os
 
 # Configure logging
 logger = logging.getLogger(__name__)
@@ -12,39 +15,234 @@ logger = logging.getLogger(__name__)
 MAX_TOKENS = 6400
 MODEL_ID = "eu.anthropic.claude-haiku-4-5-20251001-v1:0"
 MAX_CONTEXT_TOKENS = 9000
-CHARS_PER_TOKEN = 4
+# After a reply, the conversation is compacted once over this share of MAX_CONTEXT_TOKENS,
+# leaving room for the next message so its request rarely has to wait for a summary
+POST_REPLY_COMPACTION_RATIO = 0.8
+# Longest summary of compacted turns
+SUMMARY_MAX_TOKENS = 600
+# Decimal places kept for floats in the stats block sent to the model
+STATS_FLOAT_DECIMALS = 3
+# Bedrock prompt-cache checkpoint, placed after the parts of the prompt that repeat
+# between turns so they are read from the cache instead of being processed again
+CACHE_POINT = {"cachePoint": {"type": "default"}}
+
+
+# Summaries by hash of (previous summary, summarized messages). Clients that resend the
+# whole conversation without the returned summary get the same messages compacted again
+# every turn.
+summary_cache = TTLCache(max_bytes=4 * 1024**2, ttl=24 * 3600)
+
+SUMMARY_SYSTEM_PROMPT = """You maintain a running summary of a conversation between a League of Legends player and their performance coach.
+Merge the earlier summary (if any) with the new messages into one updated summary.
+Keep the player's questions, goals and preferences, the advice given, and any numbers or champions discussed.
+Write at most 250 words of plain prose. Reply with the summary only."""
 
 
 def estimate_tokens(messages):
     """
-    Estimate the number of tokens in the conversation.
-    This is a rough approximation: ~4 characters per token for English.
+    Estimate the number of tokens in the conversation (see count_tokens).
+    """
+    return sum(message_tokens(msg) for msg in messages)
+
+
+def summarize_conversation(previous_summary, messages):
+    """
+    Folds `messages` into the running summary of the conversation.
+
+    Returns:
+        str: The updated summary, or None if the model call failed (the messages are
+             then dropped without being summarized)
     """
-    total_chars = 0
-    for msg in messages:
-        total_chars += len(msg["content"][0]["text"])
-    return total_chars // CHARS_PER_TOKEN
+    transcript = "\n\n".join(
+        f"{msg['role']}: {' '.join(block.get('text', '') for block in msg['content'])}"
+        for msg in messages
+    )
+    prompt = f"Earlier summary:\n{previous_summary or '(none)'}\n\nNew messages:\n{transcript}"
+
+    key = hashlib.sha256(prompt.encode("utf-8")).hexdigest()
+    cached = summary_cache.get(key)
+    if cached is not None:
+        return cached
 
+    try:
+        client = get_aws_clients().bedrock_runtime()
+        response = client.converse(
+            modelId=MODEL_ID,
+            messages=[{"role": "user", "content": [{"text": prompt}]}],
+            system=[{"text": SUMMARY_SYSTEM_PROMPT}],
+            inferenceConfig={"maxTokens": SUMMARY_MAX_TOKENS, "temperature": 0},
+        )
+        summary = response["output"]["message"]["content"][0]["text"].strip()
+    except Exception as e:
+        logger.warning(f"Could not summarize {len(messages)} old messages, dropping them: {e}")
+        return None
+
+    summary_cache.put(key, summary, len(summary))
+    logger.info(f"Compacted {len(messages)} old messages into the conversation summary")
+    return summary
 
-def trim_conversation(messages, max_tokens):
+
+def trim_conversation(messages, max_tokens, summarize=summarize_conversation, summary=None):
     """
-    Trim the conversation to stay within token limits.
-    Removes oldest messages first, but always keeps at least the last message.
+    Keeps the conversation within `max_tokens`.
+
+    Once over the limit, the oldest turns are compacted into a running summary (see
+    ConversationContext.compact); with summarize=None they are dropped instead. The
+    last message is always kept.
+
+    Args:
+        messages (list or ConversationContext): The conversation. A ConversationContext
+            (a server-side session's) is compacted in place.
+        max_tokens (int): Token budget for the conversation and its summary
+        summarize (callable, optional): Summarizer for compacted turns
+        summary (str, optional): Summary of turns compacted earlier, for a list of messages
+
+    Returns:
+        ConversationContext: The conversation within budget, with its summary if any
     """
-    while len(messages) > 1 and estimate_tokens(messages) > max_tokens:
-        messages.pop(0)
-        logger.info("Trimmed old message to stay within token limit")
-    return messages
+    if isinstance(messages, ConversationContext):
+        context = messages
+    else:
+        context = ConversationContext(messages, summary)
+    removed = context.compact(max_tokens, summarize)
+    if removed:
+        logger.info(f"Compacted {removed} old messages to stay within token limit")
+    return context
 
 
-def get_chatbot_response(stats, conversation, system_prompt=CHATBOT_SYSTEM_PROMPT):
+def _round_floats(value):
+    if isinstance(value, float):
+        return round(value, STATS_FLOAT_DECIMALS)
+    if isinstance(value, dict):
+        return {key: _round_floats(item) for key, item in value.items()}
+    if isinstance(value, list):
+        return [_round_floats(item) for item in value]
+    return value
+
+
+def serialize_stats(stats):
+    """
+    Serializes player stats for the prompt: compact, with sorted keys and rounded floats,
+    so the same stats always give the same text (and so the same cached prompt prefix).
+    """
+    return json.dumps(
+        _round_floats(stats), separators=(",", ":"), sort_keys=True, ensure_ascii=False
+    )
+
+
+def prompt_caching_enabled():
+    return os.getenv("CHATBOT_PROMPT_CACHE", "true").lower() not in ("0", "false", "no")
+
+
+def build_system_blocks(stats, system_prompt=CHATBOT_SYSTEM_PROMPT, summary=None):
+    """
+    Builds the system prompt: the static instructions, then the player's stats, then
+    the summary of compacted earlier turns, if any.
+
+    With prompt caching on, a cache checkpoint follows each part: the instructions are
+    the same for every player, the stats for every turn of a player's conversation, and
+    the summary until the next compaction.
+    """
+    blocks = [system_prompt, f"Current player statistics:\n{serialize_stats(stats)}"]
+    if summary:
+        blocks.append(f"Summary of the earlier conversation:\n{summary}")
+
+    if not prompt_caching_enabled():
+        return [{"text": "\n\n".join(blocks)}]
+    system = []
+    for block in blocks:
+        system += [{"text": block}, CACHE_POINT]
+    return system
+
+
+def with_conversation_cache_point(messages):
+    """
+    Returns `messages` with a cache checkpoint after the previous turn, so the history
+    up to the new user message is cached as well. The input list is left unchanged.
+    """
+    if not prompt_caching_enabled() or len(messages) < 2:
+        return messages
+    previous = messages[-2]
+    return [
+        *messages[:-2],
+        {**previous, "content": [*previous["content"], CACHE_POINT]},
+        messages[-1],
+    ]
+
+
+def build_chatbot_request(stats, conversation, system_prompt=CHATBOT_SYSTEM_PROMPT, summary=None):
+    """
+    Builds the Converse request for a chatbot turn.
+
+    Args:
+        conversation (list or ConversationContext): The conversation, ending with the
+            new user message. A ConversationContext is compacted in place.
+        summary (str, optional): Summary returned by an earlier turn, for a list
+
+    Returns:
+        tuple: (ConversationContext within the token limit, keyword arguments for
+                converse/converse_stream)
+    """
+    # Compact the conversation if it exceeds token limit
+    context = trim_conversation(
+        conversation if isinstance(conversation, ConversationContext) else list(conversation),
+        MAX_CONTEXT_TOKENS,
+        summary=summary,
+    )
+    trimmed_conversation = list(context.messages)
+
+    # Display current token usage
+    logger.info(f"Context: ~{context.token_estimate} tokens")
+
+    request = {
+        "modelId": MODEL_ID,
+        "messages": with_conversation_cache_point(trimmed_conversation),
+        "system": build_system_blocks(stats, system_prompt, context.summary),
+        "inferenceConfig": {"maxTokens": MAX_TOKENS, "temperature": 0.5},
+        "additionalModelRequestFields": {},
+    }
+    return context, request
+
+
+def compact_after_reply(context, summary_before):
+    """
+    Compacts the conversation once the reply is in, so the next turn's request starts
+    within budget instead of waiting for a summary first. Skipped when the summary
+    already changed this turn, so a turn makes at most one summarizer call.
+    """
+    if context.summary != summary_before:
+        return
+    removed = context.compact(
+        MAX_CONTEXT_TOKENS,
+        summarize_conversation,
+        trigger_tokens=int(MAX_CONTEXT_TOKENS * POST_REPLY_COMPACTION_RATIO),
+    )
+    if removed:
+        logger.info(f"Compacted {removed} old messages after the reply")
+
+
+def format_token_usage(usage):
+    """Turns Bedrock's usage block into the token_usage returned to the frontend."""
+    return {
+        "input": usage.get("inputTokens", 0),
+        "output": usage.get("outputTokens", 0),
+        "total": usage.get("totalTokens", 0),
+        "cache_read": usage.get("cacheReadInputTokens", 0),
+        "cache_write": usage.get("cacheWriteInputTokens", 0),
+    }
+
+
+def get_chatbot_response(stats, conversation, system_prompt=CHATBOT_SYSTEM_PROMPT, summary=None):
     """
     Send conversation and player stats to the chatbot and get a response.
 
     Args:
         stats (dict): Dictionary containing player statistics
-        conversation (list): List of message dictionaries with 'role' and 'content'
+        conversation (list or ConversationContext): List of message dictionaries with
+            'role' and 'content'. A ConversationContext (a server-side session's) is
+            compacted and gets the reply appended in place.
         system_prompt (str): System prompt for the chatbot (optional)
+        summary (str): Summary returned with an earlier turn's conversation (optional)
 
     Returns:
         dict: Response containing 'success', 'response_text', 'conversation', and optional 'error'
@@ -52,7 +250,9 @@ def get_chatbot_response(stats, conversation, system_prompt=CHATBOT_SYSTEM_PROMP
             'success': True,
             'response_text': 'The bot response',
             'conversation': [...updated conversation...],
-            'token_usage': {'input': 123, 'output': 45, 'total': 168}
+            'summary': 'Summary of compacted earlier turns' or None,
+            'token_estimate': 2048,
+            'token_usage': {'input': 123, 'output': 45, 'total': 168, ...}
         }
         Example error: {
             'success': False,
@@ -61,52 +261,36 @@ def get_chatbot_response(stats, conversation, system_prompt=CHATBOT_SYSTEM_PROMP
         }
     """
     try:
-        # Trim conversation if it exceeds token limit
-        trimmed_conversation = trim_conversation(conversation.copy(), MAX_CONTEXT_TOKENS)
-
-        # Append stats to system prompt
-        stats_json = json.dumps(stats, indent=2)
-        enhanced_system_prompt = f"{system_prompt}\n\nCurrent player statistics:\n{stats_json}"
+        summary_before = conversation.summary if isinstance(conversation, ConversationContext) else summary
+        context, request = build_chatbot_request(stats, conversation, system_prompt, summary)
 
-        # Display current token usage
-        current_tokens = estimate_tokens(trimmed_conversation)
-        logger.info(f"Context: ~{current_tokens} tokens")
-
-        # Initialize AWS client
-        aws_region = os.getenv("AWS_REGION", "eu-north-1")
-        client = boto3.client("bedrock-runtime", region_name=aws_region)
+        # Shared Bedrock client from the app's client registry
+        client = get_aws_clients().bedrock_runtime()
 
         # Send the message to the model
-        response = client.converse(
-            modelId=MODEL_ID,
-            messages=trimmed_conversation,
-            system=[{"text": enhanced_system_prompt}],
-            inferenceConfig={"maxTokens": MAX_TOKENS, "temperature": 0.5},
-            additionalModelRequestFields={},
-        )
+        response = client.converse(**request)
 
         # Extract response text
         response_text = response["output"]["message"]["content"][0]["text"]
 
         # Add assistant response to conversation
-        trimmed_conversation.append({"role": "assistant", "content": [{"text": response_text}]})
+        context.append({"role": "assistant", "content": [{"text": response_text}]})
+        compact_after_reply(context, summary_before)
 
         # Get token usage info
-        usage = response.get("usage", {})
-        token_usage = {
-            "input": usage.get("inputTokens", 0),
-            "output": usage.get("outputTokens", 0),
-            "total": usage.get("totalTokens", 0),
-        }
+        token_usage = format_token_usage(response.get("usage", {}))
 
         logger.info(
-            f"Token usage - Input: {token_usage['input']}, Output: {token_usage['output']}, Total: {token_usage['total']}"
+            f"Token usage - Input: {token_usage['input']}, Output: {token_usage['output']}, Total: {token_usage['total']}, "
+            f"Cache read: {token_usage['cache_read']}, Cache write: {token_usage['cache_write']}"
         )
 
         return {
             "success": True,
             "response_text": response_text,
-            "conversation": trimmed_conversation,
+            "conversation": list(context.messages),
+            "summary": context.summary,
+            "token_estimate": context.token_estimate,
             "token_usage": token_usage,
         }
 
@@ -119,3 +303,79 @@ def get_chatbot_response(stats, conversation, system_prompt=CHATBOT_SYSTEM_PROMP
         error_msg = f"Unexpected error: {e}"
         logger.exception(error_msg)
         return {"success": False, "error": error_msg, "conversation": conversation}
+
+
+def stream_chatbot_response(stats, conversation, system_prompt=CHATBOT_SYSTEM_PROMPT, summary=None):
+    """
+    Streams the chatbot's answer as it is generated, using converse_stream.
+
+    Args:
+        stats (dict): Dictionary containing player statistics
+        conversation (list or ConversationContext): List of message dictionaries with
+            'role' and 'content'. A ConversationContext (a server-side session's) is
+            compacted and gets the reply appended in place.
+        system_prompt (str): System prompt for the chatbot (optional)
+        summary (str): Summary returned with an earlier turn's conversation (optional)
+
+    Yields:
+        tuple: (event, data) pairs:
+            ('delta', {'text': ...}) for each piece of the answer, then
+            ('done', {'response_text', 'conversation', 'summary', 'token_estimate',
+            'token_usage', 'stop_reason'}) once
+            it is complete, or ('error', {'error': ...}) if the call fails
+    """
+    stream = None
+    try:
+        summary_before = conversation.summary if isinstance(conversation, ConversationContext) else summary
+        context, request = build_chatbot_request(stats, conversation, system_prompt, summary)
+
+        # Shared Bedrock client from the app's client registry
+        client = get_aws_clients().bedrock_runtime()
+        stream = client.converse_stream(**request)["stream"]
+
+        chunks = []
+        stop_reason = None
+        token_usage = format_token_usage({})
+        for event in stream:
+            if "contentBlockDelta" in event:
+                text = event["contentBlockDelta"]["delta"].get("text")
+                if text:
+                    chunks.append(text)
+                    yield "delta", {"text": text}
+            elif "messageStop" in event:
+                stop_reason = event["messageStop"].get("stopReason")
+            elif "metadata" in event:
+                token_usage = format_token_usage(event["metadata"].get("usage", {}))
+
+        response_text = "".join(chunks)
+        context.append({"role": "assistant", "content": [{"text": response_text}]})
+        compact_after_reply(context, summary_before)
+
+        logger.info(
+            f"Token usage - Input: {token_usage['input']}, Output: {token_usage['output']}, Total: {token_usage['total']}, "
+            f"Cache read: {token_usage['cache_read']}, Cache write: {token_usage['cache_write']}"
+        )
+
+        yield "done", {
+            "response_text": response_text,
+            "conversation": list(context.messages),
+            "summary": context.summary,
+            "token_estimate": context.token_estimate,
+            "token_usage": token_usage,
+            "stop_reason": stop_reason,
+        }
+
+    except ClientError as e:
+        error_msg = f"AWS ClientError: {e}"
+        logger.error(error_msg)
+        yield "error", {"error": error_msg}
+
+    except Exception as e:
+        error_msg = f"Unexpected error: {e}"
+        logger.exception(error_msg)
+        yield "error", {"error": error_msg}
+
+    finally:
+        # Stops reading the response when the client goes away mid-answer
+        if stream is not None:
+            stream.close()
@@ -0,0 +1,132 @@
+import hashlib
+import json
+import logging
+import os
+from typing import Callable, Optional
+
+from clients.wrappedStore import DecimalEncoder
+from helpers.ttl_cache import TTLCache
+
+logger = logging.getLogger(__name__)
+
+# Prefix of cache entries in the wrapped store; "#" can't appear in a Riot ID, so entries
+# never collide with player or comparison records
+LLM_CACHE_KEY_PREFIX = "llm#"
+
+
+class LLMResponseCache:
+    """
+    Caches Bedrock Converse tool-use responses by a hash of the whole request.
+
+    The key covers the model ID, system prompt, tool schema and messages, serialized
+    canonically, so the same prompt over the same input always maps to the same entry
+    and any change to one of them is a miss. Only responses that ended in a tool call
+    are cached.
+
+    Entries are kept in memory (bounded by `max_bytes`) and in the wrapped store with
+    their own TTL, so they are shared between workers and survive restarts. Responses
+    bigger than `max_entry_bytes` aren't cached.
+    """
+
+    def __init__(
+        self,
+        get_store: Callable,
+        ttl: Optional[float] = None,
+        max_bytes: Optional[int] = None,
+        max_entry_bytes: Optional[int] = None,
+    ):
+        """
+        Args:
+            get_store (callable): Returns the wrapped store entries are persisted in
+            ttl (float, optional): Entry lifetime in seconds. Defaults to
+                LLM_CACHE_TTL_SECONDS or 7 days.
+            max_bytes (int, optional): Size of the in-memory layer. Defaults to
+                LLM_CACHE_MAX_BYTES or 16 MiB.
+            max_entry_bytes (int, optional): Largest response cached. Defaults to
+                LLM_CACHE_MAX_ENTRY_BYTES or 256 KiB.
+        """
+        self.get_store = get_store
+        self.ttl = ttl or float(os.getenv("LLM_CACHE_TTL_SECONDS", 7 * 24 * 3600))
+        self.max_entry_bytes = max_entry_bytes or int(
+            os.getenv("LLM_CACHE_MAX_ENTRY_BYTES", 256 * 1024)
+        )
+        self.memory = TTLCache(
+            max_bytes=max_bytes or int(os.getenv("LLM_CACHE_MAX_BYTES", 16 * 1024**2)),
+            ttl=self.ttl,
+        )
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def enabled(self) -> bool:
+        return os.getenv("LLM_CACHE_ENABLED", "true").lower() not in ("0", "false", "no")
+
+    def key(self, request: dict) -> str:
+        """Returns the cache key for a Converse request (its keyword arguments)."""
+        canonical = json.dumps(
+            request, sort_keys=True, separators=(",", ":"), ensure_ascii=False, cls=DecimalEncoder
+        )
+        return LLM_CACHE_KEY_PREFIX + hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+    def get(self, key: str) -> Optional[dict]:
+        """Returns the cached response for `key`, or None."""
+        response = self.memory.get(key)
+        if response is not None:
+            return response
+
+        try:
+            record = self.get_store().get(key)
+        except Exception as e:
+            logger.warning(f"LLM cache lookup failed: {e}")
+            return None
+        if record is None:
+            return None
+
+        response = record["response"]
+        self.memory.put(key, response, len(json.dumps(response, separators=(",", ":"))))
+        return response
+
+    def put(self, key: str, response: dict) -> None:
+        """Caches `response` under `key`, unless it is too big."""
+        size = len(json.dumps(response, separators=(",", ":"), cls=DecimalEncoder))
+        if size > self.max_entry_bytes:
+            logger.info(f"Not caching {size} byte LLM response (limit {self.max_entry_bytes})")
+            return
+
+        self.memory.put(key, response, size)
+        try:
+            self.get_store().put({"unique_id": key, "response": response}, ttl=self.ttl)
+        except Exception as e:
+            logger.warning(f"LLM cache store failed: {e}")
+
+    def converse(self, bedrock_client, **request) -> dict:
+        """
+        bedrock_client.converse(**request), answered from the cache when the same request
+        was made before. Returns the response's output, stopReason and usage.
+        """
+        if not self.enabled:
+            return bedrock_client.converse(**request)
+
+        key = self.key(request)
+        cached = self.get(key)
+        if cached is not None:
+            self.hits += 1
+            logger.info(f"LLM cache hit for {request.get('modelId')} ({key[-12:]})")
+            return cached
+
+        self.misses += 1
+        response = bedrock_client.converse(**request)
+        if response.get("stopReason") == "tool_use":
+            self.put(
+                key,
+                {
+                    "output": response["output"],
+                    "stopReason": response["stopReason"],
+                    "usage": response.get("usage", {}),
+                },
+            )
+        return response
+
+    def stats(self) -> dict:
+        """Returns hit/miss counters and the in-memory layer's stats."""
+        return {"hits": self.hits, "misses": self.misses, "memory": self.memory.stats()}
@@ -0,0 +1,230 @@
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+import zlib
+from typing import Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_BYTES = 1024**3  # 1 GiB of compressed payloads
+# A read only updates a match's last_access once it is older than this, so cache hits
+# are almost always read-only; eviction order only needs to be roughly right
+LAST_ACCESS_RESOLUTION_SECONDS = 300
+
+
+class MatchStore:
+    """
+    Durable local store for match-v5 payloads and per-player match ID sync cursors.
+
+    A finished match never changes, so once a match ID has been fetched it never needs
+    to be fetched again. Payloads are stored compressed and content-addressed
+    (blobs/<sha256[:2]>/<sha256>.json.z); a SQLite index maps match IDs to blobs and
+    records size and last access time (to within LAST_ACCESS_RESOLUTION_SECONDS). When
+    the compressed total exceeds `max_bytes`, the least recently read matches are evicted.
+
+    Safe to share between threads and between worker processes on the same host.
+    """
+
+    def __init__(self, directory: Optional[str] = None, max_bytes: Optional[int] = None):
+        """
+        Args:
+            directory (str, optional): Root directory of the store.
+                Defaults to MATCH_STORE_DIR or ./data/match-store.
+            max_bytes (int, optional): Compressed size the store is kept under.
+                Defaults to MATCH_STORE_MAX_BYTES or 1 GiB.
+        """
+        self.directory = directory or os.getenv("MATCH_STORE_DIR", "./data/match-store")
+        self.max_bytes = max_bytes or int(os.getenv("MATCH_STORE_MAX_BYTES", DEFAULT_MAX_BYTES))
+        self._blob_dir = os.path.join(self.directory, "blobs")
+        os.makedirs(self._blob_dir, exist_ok=True)
+
+        self._index_path = os.path.join(self.directory, "index.sqlite3")
+        self._local = threading.local()
+
+        with self._connection() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS matches (
+                    match_id TEXT PRIMARY KEY,
+                    digest TEXT NOT NULL,
+                    size INTEGER NOT NULL,
+                    last_access REAL NOT NULL
+                )
+                """
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS matches_last_access ON matches(last_access)")
+            conn.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value INTEGER)")
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS match_id_syncs (
+                    sync_key TEXT PRIMARY KEY,
+                    match_ids TEXT NOT NULL,
+                    newest_match_id TEXT NOT NULL,
+                    synced_at REAL NOT NULL
+                )
+                """
+            )
+            conn.execute("INSERT OR IGNORE INTO meta VALUES ('total_bytes', 0)")
+
+        logger.info(f"Match store at {self.directory} (max {self.max_bytes / 1024**2:.0f} MiB)")
+
+    def _connection(self) -> sqlite3.Connection:
+        # sqlite3 connections can't be shared across threads, so keep one per thread
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self._index_path, timeout=30)
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def _blob_path(self, digest: str) -> str:
+        return os.path.join(self._blob_dir, digest[:2], f"{digest}.json.z")
+
+    def get(self, match_id: str) -> Optional[Dict]:
+        """Returns the stored payload for `match_id`, or None if it isn't stored."""
+        conn = self._connection()
+        row = conn.execute(
+            "SELECT digest, last_access FROM matches WHERE match_id = ?", (match_id,)
+        ).fetchone()
+        if row is None:
+            return None
+
+        try:
+            with open(self._blob_path(row[0]), "rb") as f:
+                payload = json.loads(zlib.decompress(f.read()))
+        except (OSError, zlib.error, ValueError) as e:
+            logger.warning(f"Dropping unreadable stored match {match_id}: {e}")
+            self._delete(match_id)
+            return None
+
+        now = time.time()
+        if now - row[1] > LAST_ACCESS_RESOLUTION_SECONDS:
+            with conn:
+                conn.execute(
+                    "UPDATE matches SET last_access = ? WHERE match_id = ?", (now, match_id)
+                )
+        return payload
+
+    def put(self, match_id: str, payload: Dict) -> None:
+        """Stores `payload` under `match_id`, then evicts old matches if the store is over size."""
+        data = zlib.compress(json.dumps(payload, separators=(",", ":")).encode("utf-8"))
+        digest = hashlib.sha256(data).hexdigest()
+
+        blob_path = self._blob_path(digest)
+        if not os.path.exists(blob_path):
+            os.makedirs(os.path.dirname(blob_path), exist_ok=True)
+            tmp_path = f"{blob_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with open(tmp_path, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, blob_path)
+
+        conn = self._connection()
+        with conn:
+            previous = conn.execute(
+                "SELECT size FROM matches WHERE match_id = ?", (match_id,)
+            ).fetchone()
+            conn.execute(
+                "INSERT OR REPLACE INTO matches VALUES (?, ?, ?, ?)",
+                (match_id, digest, len(data), time.time()),
+            )
+            conn.execute(
+                "UPDATE meta SET value = value + ? WHERE key = 'total_bytes'",
+                (len(data) - (previous[0] if previous else 0),),
+            )
+            total_bytes = conn.execute(
+                "SELECT value FROM meta WHERE key = 'total_bytes'"
+            ).fetchone()[0]
+
+        if total_bytes > self.max_bytes:
+            self._evict(total_bytes)
+
+    def _delete(self, match_id: str) -> None:
+        conn = self._connection()
+        with conn:
+            row = conn.execute(
+                "SELECT digest, size FROM matches WHERE match_id = ?", (match_id,)
+            ).fetchone()
+            if row is None:
+                return
+            conn.execute("DELETE FROM matches WHERE match_id = ?", (match_id,))
+            conn.execute(
+                "UPDATE meta SET value = value - ? WHERE key = 'total_bytes'", (row[1],)
+            )
+            still_referenced = conn.execute(
+                "SELECT 1 FROM matches WHERE digest = ? LIMIT 1", (row[0],)
+            ).fetchone()
+
+        if not still_referenced:
+            try:
+                os.remove(self._blob_path(row[0]))
+            except FileNotFoundError:
+                pass
+
+    def _evict(self, total_bytes: int) -> None:
+        """Drops least recently read matches until the store is back under 90% of max_bytes."""
+        target = int(self.max_bytes * 0.9)
+        conn = self._connection()
+        evicted = 0
+
+        for match_id, size in conn.execute(
+            "SELECT match_id, size FROM matches ORDER BY last_access"
+        ).fetchall():
+            if total_bytes <= target:
+                break
+            self._delete(match_id)
+            total_bytes -= size
+            evicted += 1
+
+        logger.info(f"Evicted {evicted} matches from the match store")
+
+    def get_match_id_sync(self, sync_key: str) -> Optional[Dict]:
+        """
+        Returns the last synced match ID list for `sync_key`, or None if never synced.
+
+        Returns:
+            dict: {"match_ids": [...newest first], "newest_match_id": str, "synced_at": epoch seconds}
+        """
+        row = self._connection().execute(
+            "SELECT match_ids, newest_match_id, synced_at FROM match_id_syncs WHERE sync_key = ?",
+            (sync_key,),
+        ).fetchone()
+        if row is None:
+            return None
+        return {"match_ids": json.loads(row[0]), "newest_match_id": row[1], "synced_at": row[2]}
+
+    def put_match_id_sync(self, sync_key: str, match_ids: List[str], synced_at: float) -> None:
+        """Records a complete, newest-first match ID list for `sync_key` as of `synced_at`."""
+        conn = self._connection()
+        with conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO match_id_syncs VALUES (?, ?, ?, ?)",
+                (sync_key, json.dumps(match_ids), match_ids[0], synced_at),
+            )
+
+
+_default_match_store: Optional[MatchStore] = None
+_default_match_store_lock = threading.Lock()
+
+
+def get_default_match_store() -> Optional[MatchStore]:
+    """
+    Returns the shared match store, or None when MATCH_STORE_ENABLED is false
+    or the store directory can't be opened.
+    """
+    global _default_match_store
+    if os.getenv("MATCH_STORE_ENABLED", "true").lower() in ("0", "false", "no"):
+        return None
+
+    with _default_match_store_lock:
+        if _default_match_store is None:
+            try:
+                _default_match_store = MatchStore()
+            except (OSError, sqlite3.Error) as e:
+                logger.error(f"Match store unavailable, fetching every match from Riot: {e}")
+                return None
+        return _default_match_store
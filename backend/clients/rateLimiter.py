@@ -0,0 +1,440 @@
+import asyncio
+import copy
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Mapping, Optional, Tuple
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+# Development key limits, used until the first response tells us the real ones
+DEFAULT_APP_RATE_LIMIT = "20:1,100:120"
+
+
+def parse_rate_limit_header(value: Optional[str]) -> List[Tuple[int, int]]:
+    """
+    Parses a Riot rate limit header into (count, window_seconds) pairs.
+
+    Both the limit headers ("20:1,100:120" = 20 calls per 1s, 100 calls per 120s)
+    and the count headers ("3:1,41:120" = 3 calls used in the 1s window, ...) use
+    this syntax. Malformed entries are skipped.
+    """
+    windows = []
+    if not value:
+        return windows
+
+    for part in value.split(","):
+        try:
+            count, seconds = part.strip().split(":")
+            windows.append((int(count), int(seconds)))
+        except ValueError:
+            logger.warning(f"Ignoring malformed rate limit entry: {part!r}")
+    return windows
+
+
+class RateLimitStore:
+    """
+    Holds rate limit and circuit breaker state as one small JSON-serializable dict.
+
+    Updates happen inside `transaction()`, which gives exclusive access to the state
+    for its duration; `snapshot()` reads it without writing anything back. Backends
+    differ only in where the state lives and how that exclusivity is enforced, so every
+    worker sharing a backend sees the same windows.
+    """
+
+    @contextmanager
+    def transaction(self) -> Iterator[Dict]:
+        raise NotImplementedError
+
+    def snapshot(self) -> Dict:
+        """Returns a copy of the current state, for read-only checks."""
+        raise NotImplementedError
+
+
+class MemoryRateLimitStore(RateLimitStore):
+    """State local to this process. Only correct with a single worker."""
+
+    def __init__(self):
+        self._state: Dict = {}
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def transaction(self) -> Iterator[Dict]:
+        with self._lock:
+            yield self._state
+
+    def snapshot(self) -> Dict:
+        with self._lock:
+            return copy.deepcopy(self._state)
+
+
+class FileRateLimitStore(RateLimitStore):
+    """
+    State in a JSON file guarded by an advisory file lock, shared by every process on the host.
+
+    Defaults to /dev/shm when available, so the file lives in shared memory and
+    never touches disk.
+    """
+
+    def __init__(self, directory: Optional[str] = None, namespace: str = "riot"):
+        if fcntl is None:
+            raise RuntimeError("FileRateLimitStore requires fcntl (POSIX only)")
+
+        if directory is None:
+            base = "/dev/shm" if os.path.isdir("/dev/shm") else tempfile.gettempdir()
+            directory = os.path.join(base, "rift-rewind")
+        os.makedirs(directory, exist_ok=True)
+
+        self.path = os.path.join(directory, f"{namespace}-rate-limits.json")
+        self._lock_path = f"{self.path}.lock"
+        # flock is per open file description, so threads in this process also serialize on it
+        self._thread_lock = threading.Lock()
+
+    @contextmanager
+    def transaction(self) -> Iterator[Dict]:
+        with self._thread_lock, open(self._lock_path, "a") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                try:
+                    with open(self.path) as f:
+                        state = json.load(f)
+                except (FileNotFoundError, json.JSONDecodeError):
+                    state = {}
+
+                yield state
+
+                tmp_path = f"{self.path}.{os.getpid()}.tmp"
+                with open(tmp_path, "w") as f:
+                    json.dump(state, f, separators=(",", ":"))
+                os.replace(tmp_path, self.path)
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def snapshot(self) -> Dict:
+        # A shared lock: readers don't wait for each other, only for a transaction
+        with open(self._lock_path, "a") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_SH)
+            try:
+                with open(self.path) as f:
+                    return json.load(f)
+            except (FileNotFoundError, json.JSONDecodeError):
+                return {}
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+class RedisRateLimitStore(RateLimitStore):
+    """State in a Redis (or Redis-compatible) key, shared by every process that can reach it."""
+
+    def __init__(self, url: str, namespace: str = "riot", lock_timeout: float = 5.0):
+        try:
+            import redis
+        except ImportError as e:
+            raise RuntimeError("RedisRateLimitStore requires the 'redis' package") from e
+
+        self._client = redis.Redis.from_url(url)
+        self._key = f"rift-rewind:{namespace}:rate-limits"
+        self._lock_timeout = lock_timeout
+
+    @contextmanager
+    def transaction(self) -> Iterator[Dict]:
+        with self._client.lock(f"{self._key}:lock", timeout=self._lock_timeout):
+            raw = self._client.get(self._key)
+            state = json.loads(raw) if raw else {}
+            yield state
+            self._client.set(self._key, json.dumps(state, separators=(",", ":")))
+
+    def snapshot(self) -> Dict:
+        # A single GET is atomic, so no lock is needed to read
+        raw = self._client.get(self._key)
+        return json.loads(raw) if raw else {}
+
+
+def create_rate_limit_store(backend: Optional[str] = None) -> RateLimitStore:
+    """
+    Builds the store selected by RATE_LIMIT_STORE ('file' by default, 'redis' or 'memory').
+
+    RATE_LIMIT_STATE_DIR overrides the file store's directory and RATE_LIMIT_REDIS_URL
+    points the redis store at a server.
+    """
+    backend = (backend or os.getenv("RATE_LIMIT_STORE", "file")).lower()
+
+    if backend == "redis":
+        return RedisRateLimitStore(os.getenv("RATE_LIMIT_REDIS_URL", "redis://localhost:6379/0"))
+    if backend == "file":
+        if fcntl is not None:
+            return FileRateLimitStore(os.getenv("RATE_LIMIT_STATE_DIR"))
+        logger.warning("File rate limit store unavailable on this platform, using memory store")
+    return MemoryRateLimitStore()
+
+
+class RiotRateLimiter:
+    """
+    Proactive client-side rate limiter for the Riot API.
+
+    Calls are scheduled against two kinds of buckets, both learned from response headers:
+    - app buckets, one per routing value (americas, europe, na1, kr, ...), from X-App-Rate-Limit
+    - method buckets, one per (routing value, API method), from X-Method-Rate-Limit
+
+    Every bucket has one or more fixed windows, tracked like Riot tracks them: a window
+    opens with its first call and counts calls until it expires. A call is only released
+    when every window of both buckets has room. Server-side counts (X-*-Rate-Limit-Count)
+    are folded back in, so calls made by anyone else sharing the key are accounted for.
+
+    The state lives in a RateLimitStore so several worker processes can share one key.
+    """
+
+    def __init__(
+        self,
+        store: Optional[RateLimitStore] = None,
+        default_app_limits: Optional[str] = None,
+        window_padding: float = 0.1,
+    ):
+        """
+        Args:
+            store (RateLimitStore, optional): Where window state lives. Defaults to an
+                in-process MemoryRateLimitStore.
+            default_app_limits (str, optional): App limits assumed before the first response,
+                in header syntax. Defaults to RIOT_APP_RATE_LIMIT or the development key limits.
+            window_padding (float): Seconds added to each window to absorb clock and network skew.
+        """
+        self.store = store or MemoryRateLimitStore()
+        self.default_app_limits = parse_rate_limit_header(
+            default_app_limits or os.getenv("RIOT_APP_RATE_LIMIT", DEFAULT_APP_RATE_LIMIT)
+        )
+        self.window_padding = window_padding
+
+    @staticmethod
+    def _app_key(routing: str) -> str:
+        return f"app:{routing}"
+
+    @staticmethod
+    def _method_key(routing: str, method: str) -> str:
+        return f"method:{routing}:{method}"
+
+    def _bucket(self, state: Dict, key: str) -> Dict:
+        # {"limits": [[limit, seconds], ...], "windows": {seconds: [start, count]}, "blocked_until": t}
+        bucket = state.setdefault("buckets", {}).setdefault(key, {"limits": None, "windows": {}})
+        if bucket["limits"] is None and key.startswith("app:"):
+            bucket["limits"] = [list(window) for window in self.default_app_limits]
+        return bucket
+
+    def _wait_time(self, bucket: Dict, now: float) -> float:
+        """Returns how long until `bucket` has room for one more call (0 if it has room now)."""
+        wait = max(bucket.get("blocked_until", 0) - now, 0)
+
+        # Method limits are unknown until the first response for that method
+        for limit, seconds in bucket["limits"] or []:
+            window = bucket["windows"].get(str(seconds))
+            if window is None:
+                continue
+            start, count = window
+            window_end = start + seconds + self.window_padding
+            if now < window_end and count >= limit:
+                wait = max(wait, window_end - now)
+
+        return wait
+
+    def _record(self, bucket: Dict, now: float) -> None:
+        for _, seconds in bucket["limits"] or []:
+            window = bucket["windows"].get(str(seconds))
+            if window is None or now >= window[0] + seconds + self.window_padding:
+                bucket["windows"][str(seconds)] = [now, 1]
+            else:
+                window[1] += 1
+
+    def _try_acquire(self, keys: List[str]) -> float:
+        with self.store.transaction() as state:
+            now = time.time()
+            buckets = [self._bucket(state, key) for key in keys]
+            wait = max(self._wait_time(bucket, now) for bucket in buckets)
+            if wait <= 0:
+                for bucket in buckets:
+                    self._record(bucket, now)
+            return wait
+
+    async def acquire(self, routing: str, method: str) -> None:
+        """
+        Waits until a call to `method` on `routing` fits within every known limit,
+        then reserves a slot for it.
+        """
+        keys = [self._app_key(routing), self._method_key(routing, method)]
+
+        while True:
+            wait = await asyncio.to_thread(self._try_acquire, keys)
+            if wait <= 0:
+                return
+
+            logger.debug(f"Rate limiter delaying {method} on {routing} for {wait:.2f}s")
+            await asyncio.sleep(wait)
+
+    def _apply_headers(self, state: Dict, routing: str, method: str, headers: Mapping[str, str]):
+        now = time.time()
+        buckets = [
+            (self._app_key(routing), "X-App-Rate-Limit", "X-App-Rate-Limit-Count"),
+            (self._method_key(routing, method), "X-Method-Rate-Limit", "X-Method-Rate-Limit-Count"),
+        ]
+
+        for key, limit_header, count_header in buckets:
+            bucket = self._bucket(state, key)
+
+            limits = [list(window) for window in parse_rate_limit_header(headers.get(limit_header))]
+            if limits and limits != bucket["limits"]:
+                logger.info(f"Rate limits for {key}: {headers.get(limit_header)}")
+                bucket["limits"] = limits
+
+            for count, seconds in parse_rate_limit_header(headers.get(count_header)):
+                window = bucket["windows"].get(str(seconds))
+                if window is None or now >= window[0] + seconds + self.window_padding:
+                    bucket["windows"][str(seconds)] = [now, count]
+                elif count > window[1]:
+                    # The server saw more calls than we did (e.g. a process on another host)
+                    window[1] = count
+
+    async def update_from_headers(
+        self, routing: str, method: str, headers: Mapping[str, str]
+    ) -> None:
+        """Learns limits and server-side usage from a Riot API response's headers."""
+
+        def apply():
+            with self.store.transaction() as state:
+                self._apply_headers(state, routing, method, headers)
+
+        await asyncio.to_thread(apply)
+
+    async def on_rate_limited(
+        self, routing: str, method: str, headers: Mapping[str, str], default_retry_after: float
+    ) -> float:
+        """
+        Records a 429 response so every caller backs off, not just the one that got it.
+
+        Returns:
+            float: The number of seconds the affected bucket is blocked for.
+        """
+        try:
+            retry_after = float(headers.get("Retry-After", default_retry_after))
+        except ValueError:
+            retry_after = default_retry_after
+
+        limit_type = headers.get("X-Rate-Limit-Type", "application")
+        if limit_type == "application":
+            key = self._app_key(routing)
+        else:
+            # "method" and "service" limits only affect this endpoint
+            key = self._method_key(routing, method)
+
+        def apply():
+            with self.store.transaction() as state:
+                bucket = self._bucket(state, key)
+                bucket["blocked_until"] = max(
+                    bucket.get("blocked_until", 0), time.time() + retry_after
+                )
+                self._apply_headers(state, routing, method, headers)
+
+        await asyncio.to_thread(apply)
+        logger.warning(f"429 ({limit_type}) for {key}. Blocking for {retry_after:.0f}s")
+        return retry_after
+
+
+class CircuitBreaker:
+    """
+    Consecutive-failure circuit breaker whose state is shared through a RateLimitStore.
+
+    After `max_failures` consecutive failures the circuit opens and calls are refused
+    for `cooldown` seconds. After that it is half-open: the first caller is let through
+    as a trial and everyone else stays refused until the trial's outcome is recorded
+    (or `cooldown` passes without one). A success closes the circuit, another failure
+    re-opens it.
+    """
+
+    def __init__(
+        self, store: Optional[RateLimitStore] = None, max_failures: int = 5, cooldown: float = 30
+    ):
+        self.store = store or MemoryRateLimitStore()
+        self.max_failures = max_failures
+        self.cooldown = cooldown
+
+    def is_open(self) -> bool:
+        # Closed or still cooling down can be told from a read-only snapshot; only the
+        # half-open check, which claims the trial call, needs a transaction
+        breaker = self.store.snapshot().get("breaker", {})
+        if breaker.get("failures", 0) < self.max_failures:
+            return False
+        if time.time() < breaker.get("opened_at", 0) + self.cooldown:
+            return True
+
+        with self.store.transaction() as state:
+            breaker = state.get("breaker", {})
+            now = time.time()
+            if breaker.get("failures", 0) < self.max_failures:
+                return False
+            if now < breaker.get("opened_at", 0) + self.cooldown:
+                return True
+            if now < breaker.get("trial_started_at", 0) + self.cooldown:
+                # Another caller's trial is still in flight
+                return True
+            breaker["trial_started_at"] = now
+            logger.info("Circuit half-open, letting a trial call through")
+            return False
+
+    def record_failure(self) -> int:
+        """Counts a failure and returns the number of consecutive failures so far."""
+        with self.store.transaction() as state:
+            breaker = state.setdefault("breaker", {"failures": 0})
+            breaker["failures"] = breaker.get("failures", 0) + 1
+            if breaker["failures"] >= self.max_failures:
+                # Opens the circuit, or re-opens it after a failed trial
+                breaker["opened_at"] = time.time()
+                breaker.pop("trial_started_at", None)
+            return breaker["failures"]
+
+    def record_success(self) -> None:
+        """
+        Resets the failure count, closing the circuit. The transaction is skipped when
+        the store shows no failures, so successes normally cost only a shared-lock read.
+        """
+        if not self.store.snapshot().get("breaker", {}).get("failures"):
+            return
+        with self.store.transaction() as state:
+            if state.get("breaker", {}).get("failures"):
+                state["breaker"] = {"failures": 0}
+
+
+_default_store: Optional[RateLimitStore] = None
+_default_rate_limiter: Optional[RiotRateLimiter] = None
+_default_circuit_breaker: Optional[CircuitBreaker] = None
+
+
+def _get_default_store() -> RateLimitStore:
+    global _default_store
+    if _default_store is None:
+        _default_store = create_rate_limit_store()
+    return _default_store
+
+
+def get_default_rate_limiter() -> RiotRateLimiter:
+    """Returns the limiter shared by every RiotAPIClient, backed by the configured store."""
+    global _default_rate_limiter
+    if _default_rate_limiter is None:
+        _default_rate_limiter = RiotRateLimiter(store=_get_default_store())
+    return _default_rate_limiter
+
+
+def get_default_circuit_breaker() -> CircuitBreaker:
+    """Returns the circuit breaker shared by every RiotAPIClient, backed by the configured store."""
+    global _default_circuit_breaker
+    if _default_circuit_breaker is None:
+        _default_circuit_breaker = CircuitBreaker(
+            store=_get_default_store(),
+            cooldown=float(os.getenv("RIOT_CIRCUIT_COOLDOWN", 30)),
+        )
+    return _default_circuit_breaker
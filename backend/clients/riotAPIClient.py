@@ -1,10 +1,19 @@
-import requests
+import asyncio
+import httpx
 import os
 import logging
 import time
-from typing import Optional, Dict, List, Any
+from typing import Optional, Dict, List, Any, Callable
 from datetime import datetime
 
+from clients.matchStore import MatchStore, get_default_match_store
+from clients.rateLimiter import (
+    CircuitBreaker,
+    RiotRateLimiter,
+    get_default_circuit_breaker,
+    get_default_rate_limiter,
+)
+
 
 class RiotAPIError(Exception):
     """Custom exception for Riot API errors."""
@@ -12,10 +21,26 @@ class RiotAPIError(Exception):
 
 class RiotAPIClient:
     """
-    A simple Python wrapper class for the Riot Games API with comprehensive logging.
+    A simple async Python wrapper class for the Riot Games API with comprehensive logging.
+
+    HTTP connections are kept alive in one pool per regional host, shared by every
+    client instance, so per-request clients don't pay a new TLS handshake per call.
     """
 
-    def __init__(self, default_region="asia", log_level=logging.INFO):
+    # base_url -> (event loop, pooled AsyncClient). httpx pools are bound to the loop
+    # they were created on, so a pool is rebuilt if it is used from a different loop.
+    _pools: Dict[str, tuple] = {}
+
+    def __init__(
+        self,
+        default_region="asia",
+        log_level=logging.INFO,
+        max_concurrency: Optional[int] = None,
+        timeout: float = 10.0,
+        rate_limiter: Optional[RiotRateLimiter] = None,
+        circuit_breaker: Optional[CircuitBreaker] = None,
+        match_store: Optional[MatchStore] = None,
+    ):
         """
         Initializes the API client.
 
@@ -23,10 +48,27 @@ class RiotAPIClient:
             default_region (str): The default regional routing value
                                   (e.g., 'asia', 'americas', 'europe').
             log_level: The logging level (default: logging.INFO)
+            max_concurrency (int, optional): Maximum number of match details fetched at once.
+                                             Defaults to RIOT_MATCH_FETCH_CONCURRENCY or 10.
+            timeout (float): Per-request timeout in seconds (default: 10.0)
+            rate_limiter (RiotRateLimiter, optional): Limiter every call is scheduled through.
+                                                      Defaults to the shared limiter.
+            circuit_breaker (CircuitBreaker, optional): Breaker tracking consecutive failures.
+                                                        Defaults to the shared breaker.
+            match_store (MatchStore, optional): Local store match payloads are read through.
+                                                Defaults to the shared store (if enabled).
         """
         self.default_region = default_region
-        self.consecutive_failures = 0
-        self.max_failures = 5
+        self.max_concurrency = max_concurrency or int(
+            os.getenv("RIOT_MATCH_FETCH_CONCURRENCY", 10)
+        )
+        self.timeout = timeout
+        # Both are backed by the shared RATE_LIMIT_STORE, so every worker on the key
+        # respects the same windows and trips the same breaker
+        self.rate_limiter = rate_limiter or get_default_rate_limiter()
+        self.circuit_breaker = circuit_breaker or get_default_circuit_breaker()
+        self.max_failures = self.circuit_breaker.max_failures
+        self.match_store = match_store or get_default_match_store()
 
         # Setup logging
         self.logger = logging.getLogger(__name__)
@@ -59,19 +101,49 @@ class RiotAPIClient:
         self.logger.debug(f"Using base URL: {base_url}")
         return base_url
 
-    def _request(
+    def _get_pool(self, base_url: str) -> httpx.AsyncClient:
+        """Returns the shared keep-alive connection pool for a regional host."""
+        loop = asyncio.get_running_loop()
+        pool_loop, pool = RiotAPIClient._pools.get(base_url, (None, None))
+        if pool is None or pool.is_closed or pool_loop is not loop:
+            self.logger.debug(f"Opening connection pool for {base_url}")
+            pool = httpx.AsyncClient(
+                base_url=base_url,
+                timeout=self.timeout,
+                limits=httpx.Limits(
+                    max_connections=self.max_concurrency * 2,
+                    max_keepalive_connections=self.max_concurrency,
+                ),
+            )
+            RiotAPIClient._pools[base_url] = (loop, pool)
+        return pool
+
+    @classmethod
+    async def close_pools(cls) -> None:
+        """Closes every shared connection pool. Call once on application shutdown."""
+        pools = list(cls._pools.values())
+        cls._pools.clear()
+        for _, pool in pools:
+            await pool.aclose()
+
+    async def _request(
         self, region: str, endpoint_path: str, params: Optional[Dict] = None,
-        max_retries: int = 3, initial_retry_delay: int = 2
+        max_retries: int = 3, initial_retry_delay: int = 2, method: Optional[str] = None
     ) -> Optional[Any]:
         """
         Internal method to make a GET request to the Riot API with retry mechanism.
 
+        Every attempt first waits for a slot from the rate limiter, so 429s are the
+        exception rather than the way we discover the limits.
+
         Args:
             region (str): The regional routing value.
             endpoint_path (str): The API endpoint path (e.g., '/lol/match/v5/matches/...')
             params (dict, optional): A dictionary of query parameters.
             max_retries (int): Maximum number of retry attempts
             initial_retry_delay (int): Initial delay between retries in seconds
+            method (str, optional): The API method name used for method rate limits
+                                    (e.g., 'match-v5.getMatch'). Defaults to the API path prefix.
 
         Returns:
             dict or list: The JSON response from the API, or None if an error occurred.
@@ -80,12 +152,14 @@ class RiotAPIClient:
             RiotAPIError: If consecutive failures exceed the maximum threshold.
         """
         # Check if we've exceeded the failure threshold
-        if self.consecutive_failures >= self.max_failures:
+        if await asyncio.to_thread(self.circuit_breaker.is_open):
             error_msg = f"Exceeded maximum consecutive failures ({self.max_failures}). Aborting API calls."
             self.logger.error(error_msg)
             raise RiotAPIError(error_msg)
         
-        base_url = self._get_base_url(region)
+        routing = region or self.default_region
+        method = method or "/".join(endpoint_path.split("/")[:3])
+        base_url = self._get_base_url(routing)
         url = f"{base_url}/{endpoint_path}"
 
         self.logger.info(f"Making request to: {endpoint_path}")
@@ -93,20 +167,24 @@ class RiotAPIClient:
         if params:
             self.logger.debug(f"Query parameters: {params}")
 
+        pool = self._get_pool(base_url)
         retry_count = 0
         retry_delay = initial_retry_delay
 
         while retry_count <= max_retries:
             try:
+                await self.rate_limiter.acquire(routing, method)
+
                 start_time = datetime.now()
-                response = requests.get(url, headers=self.headers, params=params)
+                response = await pool.get(f"/{endpoint_path}", headers=self.headers, params=params)
                 elapsed_time = (datetime.now() - start_time).total_seconds()
 
-                # If we hit rate limit
+                # If we hit rate limit, block the bucket for everyone; the next acquire() waits it out
                 if response.status_code == 429:
-                    retry_after = int(response.headers.get('Retry-After', retry_delay))
-                    self.logger.warning(f"Rate limit hit. Waiting {retry_after} seconds...")
-                    time.sleep(retry_after)
+                    retry_after = await self.rate_limiter.on_rate_limited(
+                        routing, method, response.headers, default_retry_after=retry_delay
+                    )
+                    self.logger.warning(f"Rate limit hit. Waiting {retry_after:.0f} seconds...")
                     retry_count += 1
                     retry_delay = retry_delay * 2  # Exponential backoff
                     continue
@@ -114,9 +192,8 @@ class RiotAPIClient:
                 # Log response status
                 self.logger.info(f"Response status: {response.status_code} | Time: {elapsed_time:.2f}s")
 
-                # Log rate limit headers if present
-                if "X-App-Rate-Limit" in response.headers:
-                    self.logger.debug(f"Rate limit: {response.headers.get('X-App-Rate-Limit')}")
+                # Keep the limiter in sync with the limits and usage the API reports
+                await self.rate_limiter.update_from_headers(routing, method, response.headers)
                 if "X-App-Rate-Limit-Count" in response.headers:
                     self.logger.debug(
                         f"Rate limit count: {response.headers.get('X-App-Rate-Limit-Count')}"
@@ -130,7 +207,7 @@ class RiotAPIClient:
                 self.logger.info(f"✓ Request successful for {endpoint_path}")
                 
                 # Reset consecutive failures on success
-                self.consecutive_failures = 0
+                await asyncio.to_thread(self.circuit_breaker.record_success)
 
                 # Log response size info
                 if isinstance(json_response, list):
@@ -140,14 +217,16 @@ class RiotAPIClient:
 
                 return json_response
 
-            except requests.exceptions.HTTPError as http_err:
+            except httpx.HTTPStatusError as http_err:
                 status_code = response.status_code
                 
                 # Track consecutive failures for critical errors (not rate limits)
                 if status_code in [401, 403, 400]:
-                    self.consecutive_failures += 1
+                    consecutive_failures = await asyncio.to_thread(
+                        self.circuit_breaker.record_failure
+                    )
                     self.logger.warning(
-                        f"Consecutive failures: {self.consecutive_failures}/{self.max_failures}"
+                        f"Consecutive failures: {consecutive_failures}/{self.max_failures}"
                     )
 
                 # Provide detailed error messages based on status code
@@ -174,31 +253,31 @@ class RiotAPIClient:
                 # Break out of retry loop - no point retrying critical errors
                 break
 
-            except requests.exceptions.ConnectionError as conn_err:
-                self.consecutive_failures += 1
+            except httpx.ConnectError as conn_err:
+                consecutive_failures = await asyncio.to_thread(self.circuit_breaker.record_failure)
                 self.logger.error(f"✗ Connection error: {conn_err}")
                 self.logger.warning(
-                    f"Consecutive failures: {self.consecutive_failures}/{self.max_failures}"
+                    f"Consecutive failures: {consecutive_failures}/{self.max_failures}"
                 )
                 break
-            except requests.exceptions.Timeout as timeout_err:
-                self.consecutive_failures += 1
+            except httpx.TimeoutException as timeout_err:
+                consecutive_failures = await asyncio.to_thread(self.circuit_breaker.record_failure)
                 self.logger.error(f"✗ Request timeout: {timeout_err}")
                 self.logger.warning(
-                    f"Consecutive failures: {self.consecutive_failures}/{self.max_failures}"
+                    f"Consecutive failures: {consecutive_failures}/{self.max_failures}"
                 )
                 break
-            except requests.exceptions.RequestException as req_err:
-                self.consecutive_failures += 1
+            except httpx.HTTPError as req_err:
+                consecutive_failures = await asyncio.to_thread(self.circuit_breaker.record_failure)
                 self.logger.error(f"✗ An error occurred: {req_err}")
                 self.logger.warning(
-                    f"Consecutive failures: {self.consecutive_failures}/{self.max_failures}"
+                    f"Consecutive failures: {consecutive_failures}/{self.max_failures}"
                 )
                 break
 
         return None
 
-    def get_puuid_from_name_and_tag(
+    async def get_puuid_from_name_and_tag(
         self,
         game_name: str,
         game_tag: str,
@@ -221,7 +300,7 @@ class RiotAPIClient:
         endpoint = f"riot/account/v1/accounts/by-riot-id/{game_name}/{game_tag}"
 
         # Call the internal request method
-        response = self._request(region, endpoint)
+        response = await self._request(region, endpoint, method="account-v1.getByRiotId")
 
         if response and "puuid" in response:
             puuid = response["puuid"]
@@ -231,7 +310,7 @@ class RiotAPIClient:
             self.logger.warning(f"✗ Could not find PUUID for {game_name}#{game_tag}")
             return None
 
-    def get_match_ids_by_puuid(
+    async def get_match_ids_by_puuid(
         self,
         puuid: str,
         region: Optional[str] = None,
@@ -245,6 +324,11 @@ class RiotAPIClient:
         Corresponds to the endpoint:
         /lol/match/v5/matches/by-puuid/{puuid}/ids
 
+        When the match store is enabled the list is synced incrementally: a cursor per
+        PUUID remembers the newest match ID and when the list was last synced, so a refresh
+        only asks for matches since then (with some overlap for games that were still in
+        progress) and stops paging as soon as it reaches the newest known match.
+
         Args:
             puuid (str): The player's PUUID. (Required)
             region (str, optional): The region to query. Defaults to the client's default region.
@@ -253,7 +337,7 @@ class RiotAPIClient:
             count (int, optional): The number of match IDs to return per request. Default 100.
 
         Returns:
-            list: A list of all match IDs since Jan 1, 2025, or None if the request failed.
+            list: A list of all match IDs since Jan 1, 2025 (newest first), or None if the request failed.
         """
         self.logger.info(f"Fetching match IDs for PUUID: {puuid[:8]}...{puuid[-8:]}")
         
@@ -261,22 +345,39 @@ class RiotAPIClient:
         from datetime import datetime, timezone
         jan_1_2025 = datetime(2025, 1, 1, 0, 0, 0, tzinfo=timezone.utc)
         start_time = int(jan_1_2025.timestamp())
-        
-        self.logger.info(f"Fetching matches since Jan 1, 2025 (epoch: {start_time})")
+
+        # Only full listings (start=0) can be synced incrementally
+        sync_key = f"{puuid}:{match_type or 'all'}:{start_time}"
+        cursor = None
+        if self.match_store and start == 0:
+            cursor = await asyncio.to_thread(self.match_store.get_match_id_sync, sync_key)
+
+        query_start_time = start_time
+        if cursor:
+            overlap = int(os.getenv("MATCH_ID_SYNC_OVERLAP_SECONDS", 7200))
+            query_start_time = max(start_time, int(cursor["synced_at"]) - overlap)
+            self.logger.info(
+                f"Syncing matches since {query_start_time} "
+                f"({len(cursor['match_ids'])} already known, newest {cursor['newest_match_id']})"
+            )
+        else:
+            self.logger.info(f"Fetching matches since Jan 1, 2025 (epoch: {start_time})")
         self.logger.debug(f"Parameters: type={match_type}, count={count}")
 
         # Construct the endpoint path
         endpoint = f"lol/match/v5/matches/by-puuid/{puuid}/ids"
 
+        synced_at = time.time()
         all_match_ids = []
         current_start = start
         page_num = 1
+        complete = True
 
         while True:
             query_params = {
                 "start": current_start,
                 "count": count,
-                "startTime": start_time
+                "startTime": query_start_time
             }
             if match_type is not None:
                 query_params["type"] = match_type
@@ -284,18 +385,28 @@ class RiotAPIClient:
             self.logger.info(f"Fetching page {page_num} (start={current_start}, count={count})")
 
             # Call the internal request method
-            match_ids = self._request(region, endpoint, params=query_params)
+            match_ids = await self._request(
+                region, endpoint, params=query_params, method="match-v5.getMatchIdsByPUUID"
+            )
 
             if match_ids is None:
                 # Request failed
                 self.logger.warning("✗ Failed to retrieve match IDs")
-                return None if not all_match_ids else all_match_ids
+                complete = False
+                break
             
             if not match_ids:
                 # Empty response, no more matches
                 self.logger.info(f"✓ No more matches found. Pagination complete.")
                 break
 
+            if cursor and cursor["newest_match_id"] in match_ids:
+                # Everything from here on is already known
+                known_index = match_ids.index(cursor["newest_match_id"])
+                all_match_ids.extend(match_ids[:known_index])
+                self.logger.info(f"✓ Reached the newest known match. Sync complete.")
+                break
+
             all_match_ids.extend(match_ids)
             self.logger.info(f"✓ Retrieved {len(match_ids)} match IDs (total so far: {len(all_match_ids)})")
 
@@ -308,6 +419,17 @@ class RiotAPIClient:
             current_start += count
             page_num += 1
 
+        if cursor:
+            self.logger.info(f"✓ {len(all_match_ids)} new match IDs since last sync")
+            new_ids = set(all_match_ids)
+            all_match_ids += [match_id for match_id in cursor["match_ids"] if match_id not in new_ids]
+
+        # A partial listing would hide the matches it missed from every later sync
+        if self.match_store and start == 0 and complete and all_match_ids:
+            await asyncio.to_thread(
+                self.match_store.put_match_id_sync, sync_key, all_match_ids, synced_at
+            )
+
         if all_match_ids:
             self.logger.info(f"✓ Total match IDs retrieved: {len(all_match_ids)}")
             self.logger.debug(f"First match ID: {all_match_ids[0]}")
@@ -317,7 +439,7 @@ class RiotAPIClient:
 
         return all_match_ids if all_match_ids else None
 
-    def get_match_metadata_by_match_id(
+    async def get_match_metadata_by_match_id(
         self,
         match_id: str,
         region: Optional[str] = None,
@@ -328,6 +450,9 @@ class RiotAPIClient:
         Corresponds to the endpoint:
         /lol/match/v5/matches/{matchId}
 
+        Matches are immutable once finished, so the local match store is checked first
+        and every payload fetched from the API is written back to it.
+
         Args:
             match_id (str): The match_id (Required)
             region (str, optional): The region to query. Defaults to the client's default region.
@@ -335,13 +460,19 @@ class RiotAPIClient:
         Returns:
             dict: The match metadata, or None if the request failed
         """
+        if self.match_store:
+            match_data = await asyncio.to_thread(self.match_store.get, match_id)
+            if match_data:
+                self.logger.debug(f"✓ Match {match_id} served from the match store")
+                return match_data
+
         self.logger.info(f"Fetching match metadata for: {match_id}")
 
         # Construct the endpoint path
         endpoint = f"lol/match/v5/matches/{match_id}"
 
         # Call the internal request method
-        match_data = self._request(region, endpoint)
+        match_data = await self._request(region, endpoint, method="match-v5.getMatch")
 
         if match_data:
             # Log some interesting match info
@@ -352,12 +483,66 @@ class RiotAPIClient:
             self.logger.debug(f"Game mode: {info.get('gameMode', 'Unknown')}")
             self.logger.debug(f"Game duration: {info.get('gameDuration', 0)}s")
             self.logger.debug(f"Participants: {len(metadata.get('participants', []))}")
+
+            if self.match_store:
+                await asyncio.to_thread(self.match_store.put, match_id, match_data)
         else:
             self.logger.warning(f"✗ Could not retrieve match data for {match_id}")
 
         return match_data
 
-    def get_summoner_by_puuid(
+    async def get_match_metadata_by_match_ids(
+        self,
+        match_ids: List[str],
+        region: Optional[str] = None,
+        max_concurrency: Optional[int] = None,
+        on_progress: Optional[Callable[[int, int], None]] = None,
+    ) -> Dict[str, Optional[Dict]]:
+        """
+        Gets metadata for many match ids concurrently.
+
+        At most `max_concurrency` requests are in flight at once; the rest queue
+        behind a semaphore. If one fetch aborts with RiotAPIError, the remaining
+        fetches are cancelled and the error is re-raised.
+
+        Args:
+            match_ids (list): The match ids to fetch (Required)
+            region (str, optional): The region to query. Defaults to the client's default region.
+            max_concurrency (int, optional): Fan-out limit. Defaults to the client's max_concurrency.
+            on_progress (callable, optional): Called as on_progress(done, total) after each fetch.
+
+        Returns:
+            dict: match_id -> match metadata (or None if that request failed),
+                  in the same order as `match_ids`
+        """
+        fan_out = max_concurrency or self.max_concurrency
+        semaphore = asyncio.Semaphore(fan_out)
+        self.logger.info(f"Fetching {len(match_ids)} matches with fan-out {fan_out}")
+
+        done = 0
+
+        async def fetch(match_id: str) -> Optional[Dict]:
+            nonlocal done
+            async with semaphore:
+                match_data = await self.get_match_metadata_by_match_id(
+                    match_id=match_id, region=region
+                )
+            done += 1
+            if on_progress:
+                on_progress(done, len(match_ids))
+            return match_data
+
+        tasks = [asyncio.create_task(fetch(match_id)) for match_id in match_ids]
+        try:
+            results = await asyncio.gather(*tasks)
+        except BaseException:
+            for task in tasks:
+                task.cancel()
+            raise
+
+        return dict(zip(match_ids, results))
+
+    async def get_summoner_by_puuid(
         self,
         puuid: str,
         platform: str = "na1",
@@ -374,7 +559,7 @@ class RiotAPIClient:
         """
         self.logger.info(f"Fetching summoner info for PUUID: {puuid[:8]}...{puuid[-8:]}")
         endpoint = f"lol/summoner/v4/summoners/by-puuid/{puuid}"
-        summoner_data = self._request(platform, endpoint)
+        summoner_data = await self._request(platform, endpoint, method="summoner-v4.getByPUUID")
 
         if summoner_data:
             self.logger.info(f"✓ Summoner data retrieved")
@@ -0,0 +1,454 @@
+import decimal
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+import zlib
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from boto3.dynamodb.table import BatchWriter
+from boto3.dynamodb.types import TypeDeserializer, TypeSerializer
+
+from clients.awsClients import get_aws_clients
+
+logger = logging.getLogger(__name__)
+
+# DynamoDB table holding wrapped and comparison records
+WRAPPED_TABLE_NAME = "rift-rewind-jay"
+
+# Version of the compressed "payload" attribute layout; items without one use plain attributes
+PAYLOAD_SCHEMA_VERSION = 1
+
+# BatchGetItem accepts at most 100 keys; unprocessed keys are resent this many times
+BATCH_GET_MAX_KEYS = 100
+BATCH_GET_MAX_RETRIES = 5
+
+
+def convert_floats_to_decimals(obj):
+    """
+    Recursively converts all float values in a dictionary/list to Decimal
+    """
+    if isinstance(obj, dict):
+        return {key: convert_floats_to_decimals(value) for key, value in obj.items()}
+    elif isinstance(obj, list):
+        return [convert_floats_to_decimals(element) for element in obj]
+    elif isinstance(obj, float):
+        return decimal.Decimal(str(obj))
+    return obj
+
+
+class DecimalEncoder(json.JSONEncoder):
+    def default(self, obj):
+        if isinstance(obj, decimal.Decimal):
+            return float(obj)
+        return super(DecimalEncoder, self).default(obj)
+
+
+_serializer = TypeSerializer()
+_deserializer = TypeDeserializer()
+
+
+def _to_attribute_values(item: dict) -> dict:
+    """Turns a plain item into the typed attribute values the low-level client takes."""
+    return {key: _serializer.serialize(value) for key, value in item.items()}
+
+
+def _from_attribute_values(item: dict) -> dict:
+    """Turns typed attribute values from the low-level client back into a plain item."""
+    return {key: _deserializer.deserialize(value) for key, value in item.items()}
+
+
+def _compress_record(record: dict) -> bytes:
+    record_json = json.dumps(record, separators=(",", ":"), cls=DecimalEncoder)
+    return zlib.compress(record_json.encode("utf-8"))
+
+
+def _expires_at(ttl: Optional[float]) -> Optional[int]:
+    return int(time.time() + ttl) if ttl else None
+
+
+def _expired(expires_at) -> bool:
+    return expires_at is not None and float(expires_at) <= time.time()
+
+
+class WrappedStore:
+    """
+    Storage for wrapped and comparison records, keyed by their "unique_id".
+
+    Records are plain JSON-compatible dicts. A record put with a TTL (or under a store
+    with a default TTL) stops being returned once it expires.
+    """
+
+    def __init__(self, ttl: Optional[float] = None):
+        """
+        Args:
+            ttl (float, optional): Default lifetime of records in seconds. Defaults to
+                WRAPPED_RECORD_TTL_SECONDS; 0 or unset keeps records forever.
+        """
+        self.ttl = ttl if ttl is not None else float(os.getenv("WRAPPED_RECORD_TTL_SECONDS", 0))
+
+    def get(self, unique_id: str) -> Optional[dict]:
+        """Returns the record for `unique_id`, or None if there is none or it expired."""
+        raise NotImplementedError
+
+    def get_with_size(self, unique_id: str) -> Optional[Tuple[dict, int]]:
+        """
+        Like get(), but returns (record, size) where size is the length of the record's
+        JSON, for sizing cache entries. Backends that store JSON return the length of
+        what they decompressed instead of serializing the record again.
+        """
+        record = self.get(unique_id)
+        if record is None:
+            return None
+        return record, len(json.dumps(record, separators=(",", ":"), cls=DecimalEncoder))
+
+    def put(self, record: dict, ttl: Optional[float] = None) -> None:
+        """Stores `record` under record["unique_id"], replacing any previous version."""
+        raise NotImplementedError
+
+    def delete(self, unique_id: str) -> None:
+        """Removes the record for `unique_id`, if any."""
+        raise NotImplementedError
+
+    def put_batch(self, records: List[dict], ttl: Optional[float] = None) -> None:
+        """Stores several records, as efficiently as the backend allows."""
+        for record in records:
+            self.put(record, ttl)
+
+    def batch_get(self, unique_ids: Iterable[str]) -> Dict[str, dict]:
+        """
+        Returns the records found for `unique_ids`, keyed by unique_id.
+        Missing and expired records are left out.
+        """
+        records = {}
+        for unique_id in dict.fromkeys(unique_ids):
+            record = self.get(unique_id)
+            if record is not None:
+                records[unique_id] = record
+        return records
+
+    def batch_get_with_size(self, unique_ids: Iterable[str]) -> Dict[str, Tuple[dict, int]]:
+        """Like batch_get(), with (record, size) values as returned by get_with_size()."""
+        records = {}
+        for unique_id in dict.fromkeys(unique_ids):
+            found = self.get_with_size(unique_id)
+            if found is not None:
+                records[unique_id] = found
+        return records
+
+
+class DynamoDBWrappedStore(WrappedStore):
+    """
+    Records in the DynamoDB table, using the app's shared client registry.
+
+    With WRAPPED_STORAGE_ENCODING=compressed (the default), everything except the key
+    is stored as one zlib-compressed JSON binary attribute next to a schema version,
+    which keeps big timelines far under the 400 KB item limit and skips the Decimal
+    conversion. With WRAPPED_STORAGE_ENCODING=attributes, records are stored as nested
+    attributes with floats converted to Decimal. Both layouts are read.
+
+    Expiry is written as an epoch-seconds "expires_at" attribute, for the table's TTL
+    setting, and also checked on read since DynamoDB deletes expired items lazily.
+
+    Calls go through the registry's shared low-level client, so every thread uses the
+    same connection pool; items are (de)serialized here rather than by a resource.
+    """
+
+    def __init__(self, table_name: str = WRAPPED_TABLE_NAME, ttl: Optional[float] = None):
+        super().__init__(ttl)
+        self.table_name = table_name
+
+    def _client(self):
+        # Shared, thread-safe client from the app's client registry
+        return get_aws_clients().client("dynamodb")
+
+    def _key(self, unique_id: str) -> dict:
+        return _to_attribute_values({"unique_id": unique_id})
+
+    def encode_item(self, record: dict, ttl: Optional[float] = None) -> dict:
+        """Turns a record into a DynamoDB item in the configured encoding."""
+        expires_at = _expires_at(ttl or self.ttl)
+
+        if os.getenv("WRAPPED_STORAGE_ENCODING", "compressed").lower() == "attributes":
+            item = convert_floats_to_decimals(record)
+        else:
+            body = {key: value for key, value in record.items() if key != "unique_id"}
+            item = {
+                "unique_id": record["unique_id"],
+                "payload_version": PAYLOAD_SCHEMA_VERSION,
+                "payload": _compress_record(body),
+            }
+
+        if expires_at:
+            item["expires_at"] = expires_at
+        return item
+
+    def decode_item(self, item: dict) -> Optional[Tuple[dict, int]]:
+        """
+        Turns a DynamoDB item written in either encoding back into a plain record.
+
+        Returns:
+            tuple: (record, length of the record's decoded JSON), or None if the item
+                   expired or uses a payload version this code doesn't know
+        """
+        if _expired(item.get("expires_at")):
+            return None
+
+        if "payload" not in item:
+            # Convert the item to JSON and back to handle Decimal conversion
+            record_json = json.dumps(item, separators=(",", ":"), cls=DecimalEncoder)
+            record = json.loads(record_json)
+            record.pop("expires_at", None)
+            return record, len(record_json)
+
+        version = int(item.get("payload_version", 0))
+        if version != PAYLOAD_SCHEMA_VERSION:
+            logger.warning(f"Unsupported payload version {version} for {item.get('unique_id')}")
+            return None
+
+        # boto3 returns Binary attributes wrapped in a Binary object
+        payload = item["payload"]
+        body_json = zlib.decompress(getattr(payload, "value", payload))
+        return {"unique_id": item["unique_id"], **json.loads(body_json)}, len(body_json)
+
+    def get(self, unique_id: str) -> Optional[dict]:
+        found = self.get_with_size(unique_id)
+        return found[0] if found else None
+
+    def get_with_size(self, unique_id: str) -> Optional[Tuple[dict, int]]:
+        response = self._client().get_item(TableName=self.table_name, Key=self._key(unique_id))
+        item = response.get("Item")
+        return self.decode_item(_from_attribute_values(item)) if item else None
+
+    def batch_get(self, unique_ids: Iterable[str]) -> Dict[str, dict]:
+        return {key: record for key, (record, _) in self.batch_get_with_size(unique_ids).items()}
+
+    def batch_get_with_size(self, unique_ids: Iterable[str]) -> Dict[str, Tuple[dict, int]]:
+        # BatchGetItem in groups of 100 keys, resending unprocessed keys with backoff
+        client = self._client()
+        keys = [self._key(unique_id) for unique_id in dict.fromkeys(unique_ids)]
+        records = {}
+        for start in range(0, len(keys), BATCH_GET_MAX_KEYS):
+            request = {self.table_name: {"Keys": keys[start : start + BATCH_GET_MAX_KEYS]}}
+            for attempt in range(BATCH_GET_MAX_RETRIES + 1):
+                response = client.batch_get_item(RequestItems=request)
+                for item in response.get("Responses", {}).get(self.table_name, []):
+                    found = self.decode_item(_from_attribute_values(item))
+                    if found is not None:
+                        records[found[0]["unique_id"]] = found
+
+                request = response.get("UnprocessedKeys") or {}
+                if not request:
+                    break
+                if attempt == BATCH_GET_MAX_RETRIES:
+                    unprocessed = len(request[self.table_name]["Keys"])
+                    raise RuntimeError(f"{unprocessed} keys still unprocessed after retries")
+                time.sleep(0.05 * (2**attempt))
+        return records
+
+    def put(self, record: dict, ttl: Optional[float] = None) -> None:
+        item = self.encode_item(record, ttl)
+        if "payload" in item:
+            logger.info(f"Storing {item['unique_id']} ({len(item['payload'])} compressed bytes)")
+        self._client().put_item(TableName=self.table_name, Item=_to_attribute_values(item))
+
+    def put_batch(self, records: List[dict], ttl: Optional[float] = None) -> None:
+        # BatchWriteItem in groups of 25; unprocessed items are resent by the batch writer
+        writer = BatchWriter(self.table_name, self._client(), overwrite_by_pkeys=["unique_id"])
+        with writer as batch:
+            for record in records:
+                batch.put_item(Item=_to_attribute_values(self.encode_item(record, ttl)))
+
+    def delete(self, unique_id: str) -> None:
+        self._client().delete_item(TableName=self.table_name, Key=self._key(unique_id))
+
+
+class SQLiteWrappedStore(WrappedStore):
+    """
+    Records as compressed JSON rows in a local SQLite database in WAL mode.
+
+    Safe to share between threads and between worker processes on the same host.
+    """
+
+    def __init__(self, path: Optional[str] = None, ttl: Optional[float] = None):
+        """
+        Args:
+            path (str, optional): Database file. Defaults to wrapped.sqlite3 in
+                WRAPPED_STORE_DIR or ./data/wrapped-store.
+            ttl (float, optional): Default record lifetime in seconds.
+        """
+        super().__init__(ttl)
+        if path is None:
+            directory = os.getenv("WRAPPED_STORE_DIR", "./data/wrapped-store")
+            os.makedirs(directory, exist_ok=True)
+            path = os.path.join(directory, "wrapped.sqlite3")
+        self.path = path
+        self._local = threading.local()
+
+        with self._connection() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS records (
+                    unique_id TEXT PRIMARY KEY,
+                    payload BLOB NOT NULL,
+                    expires_at REAL,
+                    updated_at REAL NOT NULL
+                )
+                """
+            )
+
+        logger.info(f"Wrapped store at {self.path}")
+
+    def _connection(self) -> sqlite3.Connection:
+        # sqlite3 connections can't be shared across threads, so keep one per thread
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30)
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def get(self, unique_id: str) -> Optional[dict]:
+        return self.batch_get([unique_id]).get(unique_id)
+
+    def get_with_size(self, unique_id: str) -> Optional[Tuple[dict, int]]:
+        return self.batch_get_with_size([unique_id]).get(unique_id)
+
+    def batch_get(self, unique_ids: Iterable[str]) -> Dict[str, dict]:
+        return {key: record for key, (record, _) in self.batch_get_with_size(unique_ids).items()}
+
+    def batch_get_with_size(self, unique_ids: Iterable[str]) -> Dict[str, Tuple[dict, int]]:
+        unique_ids = list(dict.fromkeys(unique_ids))
+        if not unique_ids:
+            return {}
+
+        placeholders = ",".join("?" * len(unique_ids))
+        rows = self._connection().execute(
+            "SELECT unique_id, payload, expires_at FROM records "
+            f"WHERE unique_id IN ({placeholders})",
+            unique_ids,
+        ).fetchall()
+        records = {}
+        for unique_id, payload, expires_at in rows:
+            if not _expired(expires_at):
+                record_json = zlib.decompress(payload)
+                records[unique_id] = json.loads(record_json), len(record_json)
+        return records
+
+    def put(self, record: dict, ttl: Optional[float] = None) -> None:
+        self.put_batch([record], ttl)
+
+    def put_batch(self, records: List[dict], ttl: Optional[float] = None) -> None:
+        rows = [
+            (record["unique_id"], _compress_record(record), _expires_at(ttl or self.ttl), time.time())
+            for record in records
+        ]
+        conn = self._connection()
+        with conn:
+            conn.executemany("INSERT OR REPLACE INTO records VALUES (?, ?, ?, ?)", rows)
+            # Expired rows are never returned; clearing them here keeps the file from growing
+            conn.execute("DELETE FROM records WHERE expires_at <= ?", (time.time(),))
+
+    def delete(self, unique_id: str) -> None:
+        conn = self._connection()
+        with conn:
+            conn.execute("DELETE FROM records WHERE unique_id = ?", (unique_id,))
+
+
+class FilesystemWrappedStore(WrappedStore):
+    """
+    One compressed JSON file per record in a local directory
+    (records/<sha256[:2]>/<sha256>.json.z), written atomically.
+    """
+
+    def __init__(self, directory: Optional[str] = None, ttl: Optional[float] = None):
+        """
+        Args:
+            directory (str, optional): Root directory. Defaults to WRAPPED_STORE_DIR
+                or ./data/wrapped-store.
+            ttl (float, optional): Default record lifetime in seconds.
+        """
+        super().__init__(ttl)
+        self.directory = directory or os.getenv("WRAPPED_STORE_DIR", "./data/wrapped-store")
+        os.makedirs(os.path.join(self.directory, "records"), exist_ok=True)
+        logger.info(f"Wrapped store at {self.directory}")
+
+    def _path(self, unique_id: str) -> str:
+        digest = hashlib.sha256(unique_id.encode("utf-8")).hexdigest()
+        return os.path.join(self.directory, "records", digest[:2], f"{digest}.json.z")
+
+    def get(self, unique_id: str) -> Optional[dict]:
+        found = self.get_with_size(unique_id)
+        return found[0] if found else None
+
+    def get_with_size(self, unique_id: str) -> Optional[Tuple[dict, int]]:
+        path = self._path(unique_id)
+        try:
+            with open(path, "rb") as f:
+                stored_json = zlib.decompress(f.read())
+        except FileNotFoundError:
+            return None
+
+        stored = json.loads(stored_json)
+        if _expired(stored["expires_at"]):
+            self.delete(unique_id)
+            return None
+        # Includes the small expiry wrapper, close enough for sizing
+        return stored["record"], len(stored_json)
+
+    def put(self, record: dict, ttl: Optional[float] = None) -> None:
+        path = self._path(record["unique_id"])
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        data = _compress_record({"expires_at": _expires_at(ttl or self.ttl), "record": record})
+
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+
+    def delete(self, unique_id: str) -> None:
+        try:
+            os.remove(self._path(unique_id))
+        except FileNotFoundError:
+            pass
+
+
+def create_wrapped_store(backend: Optional[str] = None) -> WrappedStore:
+    """
+    Creates the store selected by `backend` or WRAPPED_STORE_BACKEND:
+    'dynamodb' (default), 'sqlite' or 'filesystem'.
+    """
+    backend = (backend or os.getenv("WRAPPED_STORE_BACKEND", "dynamodb")).lower()
+    if backend == "sqlite":
+        return SQLiteWrappedStore()
+    if backend == "filesystem":
+        return FilesystemWrappedStore()
+    if backend != "dynamodb":
+        logger.warning(f"Unknown WRAPPED_STORE_BACKEND '{backend}', using dynamodb")
+    return DynamoDBWrappedStore()
+
+
+_wrapped_store: Optional[WrappedStore] = None
+_wrapped_store_lock = threading.Lock()
+
+
+def get_wrapped_store() -> WrappedStore:
+    """Returns the store in use, creating the configured one on first use."""
+    global _wrapped_store
+    if _wrapped_store is None:
+        with _wrapped_store_lock:
+            if _wrapped_store is None:
+                _wrapped_store = create_wrapped_store()
+    return _wrapped_store
+
+
+def set_wrapped_store(store: Optional[WrappedStore]) -> Optional[WrappedStore]:
+    """Installs `store` as the one wrapped records go to and returns the previous one."""
+    global _wrapped_store
+    with _wrapped_store_lock:
+        previous, _wrapped_store = _wrapped_store, store
+    return previous
@@ -0,0 +1,247 @@
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Dict, List, Optional
+
+from botocore.exceptions import ClientError, HTTPClientError
+from botocore.exceptions import ConnectionError as BotocoreConnectionError
+
+logger = logging.getLogger(__name__)
+
+THROTTLE_ERROR_CODES = {
+    "ProvisionedThroughputExceededException",
+    "ThrottlingException",
+    "RequestLimitExceeded",
+    "TooManyRequestsException",
+}
+
+
+def is_throttle_error(error: Exception) -> bool:
+    """True if `error` is an AWS throttling error worth retrying after a backoff."""
+    if not isinstance(error, ClientError):
+        return False
+    return error.response.get("Error", {}).get("Code", "") in THROTTLE_ERROR_CODES
+
+
+def is_transient_error(error: Exception) -> bool:
+    """
+    True if `error` says nothing about the records themselves (throttling, an AWS
+    server error or a dropped connection), so the same write may succeed later.
+    """
+    if isinstance(error, (BotocoreConnectionError, HTTPClientError)):
+        return True
+    if not isinstance(error, ClientError):
+        return False
+    status = error.response.get("ResponseMetadata", {}).get("HTTPStatusCode", 0)
+    return is_throttle_error(error) or status >= 500
+
+
+class WriteBehindQueue:
+    """
+    Persists records in the background so responses don't wait on the store.
+
+    Records are queued by unique_id (a newer record for the same ID replaces a queued
+    one) and written by one background thread in batches of up to `batch_size`
+    through the store's put_batch (BatchWriteItem on DynamoDB). Batches failing with
+    a transient error (throttling, server errors) are retried with exponential backoff
+    and dropped after `max_retries`. Any other error may be caused by a single record
+    (BatchWriteItem rejects the whole request for one oversized or invalid item), so
+    the batch is then written one record at a time and only the records that still
+    fail are dropped. When `max_backlog` records are waiting, put() writes synchronously
+    instead, so the backlog stays bounded without losing writes.
+
+    close() flushes whatever is queued; call it on shutdown.
+    """
+
+    def __init__(
+        self,
+        get_store: Callable,
+        max_backlog: Optional[int] = None,
+        batch_size: int = 25,
+        max_retries: int = 5,
+        base_delay: float = 0.5,
+    ):
+        """
+        Args:
+            get_store (callable): Returns the store to write to (looked up per batch,
+                so a swapped store is picked up)
+            max_backlog (int, optional): Records queued before put() writes synchronously.
+                Defaults to WRITE_BEHIND_MAX_BACKLOG or 1000.
+            batch_size (int): Records per batch write (25 is the BatchWriteItem maximum)
+            max_retries (int): Attempts per batch after the first before it is dropped
+            base_delay (float): First retry delay in seconds, doubled on each retry
+        """
+        self.get_store = get_store
+        self.max_backlog = max_backlog or int(os.getenv("WRITE_BEHIND_MAX_BACKLOG", 1000))
+        self.batch_size = batch_size
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+
+        # unique_id -> (record, queued_at), oldest first
+        self._pending: "OrderedDict[str, tuple]" = OrderedDict()
+        self._in_flight: Dict[str, dict] = {}
+        self._condition = threading.Condition()
+        self._thread: Optional[threading.Thread] = None
+        self._closing = False
+
+        self._counters = {
+            "queued": 0,
+            "coalesced": 0,
+            "written": 0,
+            "batches": 0,
+            "retries": 0,
+            "throttled": 0,
+            "failed": 0,
+            "written_synchronously": 0,
+        }
+
+    def _start(self) -> None:
+        if self._thread is None or not self._thread.is_alive():
+            self._closing = False
+            self._thread = threading.Thread(
+                target=self._run, name="wrapped-write-behind", daemon=True
+            )
+            self._thread.start()
+
+    def put(self, record: dict) -> bool:
+        """
+        Queues `record` for writing.
+
+        Returns:
+            bool: True if queued, False if the backlog was full and the record was
+                  written synchronously instead
+        """
+        unique_id = record["unique_id"]
+        with self._condition:
+            # A record with an older version queued or in flight is always queued behind
+            # it, so the synchronous write can never be overwritten by the older version
+            queued_before = unique_id in self._pending or unique_id in self._in_flight
+            if len(self._pending) >= self.max_backlog and not queued_before:
+                self._counters["written_synchronously"] += 1
+                backlog_full = True
+            else:
+                backlog_full = False
+                if unique_id in self._pending:
+                    self._counters["coalesced"] += 1
+                    del self._pending[unique_id]
+                self._pending[unique_id] = (record, time.time())
+                self._counters["queued"] += 1
+                self._start()
+                self._condition.notify_all()
+
+        if backlog_full:
+            logger.warning(f"Write-behind backlog full, writing {unique_id} synchronously")
+            self.get_store().put(record)
+            return False
+        return True
+
+    def _run(self) -> None:
+        while True:
+            with self._condition:
+                while not self._pending and not self._closing:
+                    self._condition.wait()
+                if not self._pending:
+                    return
+
+                batch = {}
+                while self._pending and len(batch) < self.batch_size:
+                    unique_id, (record, _) = self._pending.popitem(last=False)
+                    batch[unique_id] = record
+                self._in_flight.update(batch)
+
+            self._write_batch(batch)
+
+            with self._condition:
+                for unique_id in batch:
+                    self._in_flight.pop(unique_id, None)
+                self._condition.notify_all()
+
+    def _put_with_retries(self, records: List[dict]) -> Optional[Exception]:
+        """
+        Writes `records` in one put_batch, retrying transient errors with backoff.
+
+        Returns:
+            Exception: The error the write finally failed with, or None once written
+        """
+        for attempt in range(self.max_retries + 1):
+            try:
+                self.get_store().put_batch(records)
+                return None
+            except Exception as e:
+                throttled = is_throttle_error(e)
+                if throttled:
+                    with self._condition:
+                        self._counters["throttled"] += 1
+                if attempt == self.max_retries or not is_transient_error(e):
+                    return e
+
+                with self._condition:
+                    self._counters["retries"] += 1
+                delay = self.base_delay * (2**attempt)
+                logger.warning(
+                    f"{'Throttled' if throttled else 'Failed'} writing {len(records)} records, "
+                    f"retrying in {delay:.1f}s: {e}"
+                )
+                time.sleep(delay)
+
+    def _write_batch(self, batch: Dict[str, dict]) -> None:
+        error = self._put_with_retries(list(batch.values()))
+        if error is None:
+            with self._condition:
+                self._counters["written"] += len(batch)
+                self._counters["batches"] += 1
+            return
+
+        if len(batch) == 1 or is_transient_error(error):
+            logger.error(f"Dropping {len(batch)} records ({', '.join(batch)}): {error}")
+            with self._condition:
+                self._counters["failed"] += len(batch)
+            return
+
+        # One bad record fails the whole batch; write them singly so only it is lost
+        logger.warning(f"Writing {len(batch)} records failed, writing them one at a time: {error}")
+        for unique_id, record in batch.items():
+            error = self._put_with_retries([record])
+            with self._condition:
+                self._counters["written" if error is None else "failed"] += 1
+            if error is not None:
+                logger.error(f"Dropping record {unique_id}: {error}")
+
+    def wait_until_written(self, unique_id: str, timeout: Optional[float] = None) -> bool:
+        """Blocks until `unique_id` has no queued or in-flight write; False on timeout."""
+        with self._condition:
+            return self._condition.wait_for(
+                lambda: unique_id not in self._pending and unique_id not in self._in_flight,
+                timeout=timeout,
+            )
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """Blocks until everything queued so far is written; False on timeout."""
+        with self._condition:
+            return self._condition.wait_for(
+                lambda: not self._pending and not self._in_flight, timeout=timeout
+            )
+
+    def close(self, timeout: float = 30) -> None:
+        """Writes out the backlog and stops the background thread."""
+        with self._condition:
+            self._closing = True
+            self._condition.notify_all()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            if self._thread.is_alive():
+                logger.error(f"Write-behind flush timed out with {len(self._pending)} records left")
+            self._thread = None
+
+    def stats(self) -> Dict:
+        """Returns counters plus the current backlog size and age of its oldest record."""
+        with self._condition:
+            oldest = next(iter(self._pending.values()), None)
+            return {
+                **self._counters,
+                "backlog": len(self._pending),
+                "in_flight": len(self._in_flight),
+                "oldest_pending_seconds": round(time.time() - oldest[1], 3) if oldest else 0,
+            }
@@ -0,0 +1,192 @@
+import logging
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from helpers.conversation_context import ConversationContext
+
+logger = logging.getLogger(__name__)
+
+# Prefix of persisted sessions in the record store; "#" can't appear in a Riot ID
+CHAT_SESSION_KEY_PREFIX = "chat#"
+
+
+class ChatSessionBusyError(Exception):
+    """Raised when a message is sent while the session is still answering another."""
+
+    pass
+
+
+class ChatSession:
+    """A player's chatbot conversation, kept on the server between turns."""
+
+    def __init__(
+        self,
+        unique_id: str,
+        stats: Dict[str, Any],
+        session_id: Optional[str] = None,
+        conversation: Optional[List[dict]] = None,
+        summary: Optional[str] = None,
+    ):
+        self.unique_id = unique_id
+        self.session_id = session_id or uuid.uuid4().hex
+        self.stats = stats
+        # Messages with running token counts, plus the summary of compacted turns
+        self.context = ConversationContext(conversation or [], summary)
+        self.created_at = time.time()
+        self.last_used = self.created_at
+        # Held while a turn is answered, so turns of one session don't interleave
+        self.lock = threading.Lock()
+
+    @property
+    def key(self) -> Tuple[str, str]:
+        return self.unique_id, self.session_id
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Returns the session as a JSON-friendly dict (without the stats)."""
+        return {
+            "session_id": self.session_id,
+            "unique_id": self.unique_id,
+            "conversation": list(self.context.messages),
+            "summary": self.context.summary,
+            "token_estimate": self.context.token_estimate,
+        }
+
+    def to_record(self) -> Dict[str, Any]:
+        """Returns the record the session is persisted as (stats are reloaded, not stored)."""
+        return {
+            "unique_id": CHAT_SESSION_KEY_PREFIX + self.session_id,
+            "player_id": self.unique_id,
+            "conversation": list(self.context.messages),
+            "summary": self.context.summary,
+            "created_at": self.created_at,
+        }
+
+
+class ChatSessionManager:
+    """
+    Chatbot sessions keyed by (player unique_id, session ID), so each turn only sends
+    the new message instead of the player's stats and the whole conversation.
+
+    Sessions live in memory, least recently used first; past `max_sessions` the oldest
+    are evicted, and sessions idle for `ttl` seconds are dropped. With `save_record` and
+    `load_record`, each session is also persisted when created and after every turn, so a
+    session evicted here, or created by another uvicorn worker, is picked up again; its
+    stats are then reloaded with the `load_stats` passed to get().
+    """
+
+    def __init__(
+        self,
+        max_sessions: Optional[int] = None,
+        ttl: Optional[float] = None,
+        load_record: Optional[Callable[[str], Optional[dict]]] = None,
+        save_record: Optional[Callable[[dict, float], None]] = None,
+        delete_record: Optional[Callable[[str], None]] = None,
+    ):
+        """
+        Args:
+            max_sessions (int, optional): Sessions kept in memory.
+                Defaults to CHAT_SESSION_MAX or 1000.
+            ttl (float, optional): Seconds an idle session is kept.
+                Defaults to CHAT_SESSION_TTL_SECONDS or 3600.
+            load_record (callable, optional): Reads a persisted session record by key
+            save_record (callable, optional): Persists a session record with a TTL
+            delete_record (callable, optional): Removes a persisted session record by key
+        """
+        self.max_sessions = max_sessions or int(os.getenv("CHAT_SESSION_MAX", 1000))
+        self.ttl = ttl or float(os.getenv("CHAT_SESSION_TTL_SECONDS", 3600))
+        self.load_record = load_record
+        self.save_record = save_record
+        self.delete_record = delete_record
+
+        self._sessions: "OrderedDict[Tuple[str, str], ChatSession]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _add(self, session: ChatSession) -> None:
+        with self._lock:
+            self._sessions[session.key] = session
+            self._sessions.move_to_end(session.key)
+            while len(self._sessions) > self.max_sessions:
+                _, evicted = self._sessions.popitem(last=False)
+                logger.info(f"Evicted chat session {evicted.session_id} ({evicted.unique_id})")
+
+    def create(self, unique_id: str, stats: Dict[str, Any]) -> ChatSession:
+        """Starts an empty session for a player, persisted so any worker can continue it."""
+        session = ChatSession(unique_id, stats)
+        self._add(session)
+        self.save(session)
+        logger.info(f"Created chat session {session.session_id} for {unique_id}")
+        return session
+
+    def get(
+        self,
+        unique_id: str,
+        session_id: str,
+        load_stats: Optional[Callable[[str], Optional[Dict[str, Any]]]] = None,
+    ) -> Optional[ChatSession]:
+        """
+        Returns the session, or None if it doesn't exist or expired. Sessions not in
+        memory are restored from their persisted record, with stats from `load_stats`.
+        """
+        key = (unique_id, session_id)
+        now = time.time()
+        with self._lock:
+            session = self._sessions.get(key)
+            if session is not None:
+                if session.last_used + self.ttl < now:
+                    del self._sessions[key]
+                    return None
+                session.last_used = now
+                self._sessions.move_to_end(key)
+                return session
+
+        if self.load_record is None or load_stats is None:
+            return None
+
+        record = self.load_record(CHAT_SESSION_KEY_PREFIX + session_id)
+        if not record or record.get("player_id") != unique_id:
+            return None
+        stats = load_stats(unique_id)
+        if stats is None:
+            return None
+
+        session = ChatSession(
+            unique_id,
+            stats,
+            session_id=session_id,
+            conversation=record.get("conversation", []),
+            summary=record.get("summary"),
+        )
+        session.created_at = record.get("created_at", session.created_at)
+        self._add(session)
+        logger.info(f"Restored chat session {session_id} for {unique_id}")
+        return session
+
+    def save(self, session: ChatSession) -> None:
+        """Persists the session's conversation, if persistence is configured."""
+        session.last_used = time.time()
+        if self.save_record is None:
+            return
+        try:
+            self.save_record(session.to_record(), self.ttl)
+        except Exception as e:
+            logger.warning(f"Could not persist chat session {session.session_id}: {e}")
+
+    def delete(self, unique_id: str, session_id: str) -> None:
+        """Ends the session, removing its persisted record too."""
+        with self._lock:
+            self._sessions.pop((unique_id, session_id), None)
+        if self.delete_record is None:
+            return
+        try:
+            self.delete_record(CHAT_SESSION_KEY_PREFIX + session_id)
+        except Exception as e:
+            logger.warning(f"Could not delete chat session {session_id}: {e}")
+
+    def stats(self) -> Dict[str, int]:
+        """Returns the number of sessions in memory."""
+        with self._lock:
+            return {"sessions": len(self._sessions)}
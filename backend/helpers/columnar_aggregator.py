@@ -0,0 +1,195 @@
+"""
+NumPy-backed engine for MatchStatsAggregator.
+
+Instead of walking every key of every match three times (overall, champion, role),
+each match is written once as a row of a growing 2D array whose columns are the
+numeric stat keys. Sums and champion/role group-bys are then computed with
+vectorized reductions when the stats are read.
+
+Every match from the parser has the same keys in the same order, so which values
+go to which columns is worked out once per layout (see _RowPlan) rather than per key
+of every match.
+"""
+from operator import itemgetter
+from typing import Any, Dict, List, Optional, Tuple
+import logging
+
+import numpy as np
+
+from constants import IGNORE_KEYS
+from helpers.match_aggregator import MatchStatsAggregator
+
+logger = logging.getLogger(__name__)
+
+# Row plans kept; layouts are normally few, but stats that are sometimes missing or None
+# could multiply them, so past this the cache is started over
+MAX_ROW_PLANS = 64
+
+
+def _getter(positions: List[int]):
+    """itemgetter that always returns a tuple, even for zero or one position."""
+    if len(positions) == 1:
+        position = positions[0]
+        return lambda values: (values[position],)
+    if not positions:
+        return lambda values: ()
+    return itemgetter(*positions)
+
+
+class _RowPlan:
+    """
+    Where the numeric values of a match with a given layout (keys and value types, in
+    order) go: their positions among the match's values and their target columns.
+    """
+
+    def __init__(self, values, columns, int_values, int_columns, float_columns):
+        self.values = values  # all numeric values, for the float array
+        self.columns = columns
+        self.int_values = int_values  # int and bool values, for the exact int64 array
+        self.int_columns = int_columns
+        self.float_columns = float_columns  # columns holding a float in this layout
+
+
+class ColumnarMatchStatsAggregator(MatchStatsAggregator):
+    """
+    MatchStatsAggregator whose per-match stat sums are buffered in columnar arrays.
+
+    Produces the same output as the dict-based engine: integer and boolean stats are
+    summed exactly in an int64 array and float stats are summed row by row in match
+    order in a float64 array, so results match the sequential Python sums.
+    """
+
+    def __init__(self, initial_rows: int = 256, initial_columns: int = 256):
+        super().__init__()
+        self._columns: Dict[str, int] = {}  # stat key -> column index, assigned on first sight
+        self._plans: Dict[Tuple[tuple, tuple], _RowPlan] = {}
+        self._ints = np.zeros((initial_rows, initial_columns), dtype=np.int64)
+        self._floats = np.zeros((initial_rows, initial_columns), dtype=np.float64)
+        self._present = np.zeros((initial_rows, initial_columns), dtype=bool)
+        self._is_float = np.zeros((initial_rows, initial_columns), dtype=bool)
+        self._rows = 0
+
+        # Per buffered row: index into the first-seen-ordered champion/role lists
+        self._row_champions: List[int] = []
+        self._row_roles: List[int] = []
+        self._champion_index: Dict[str, int] = {}
+        self._role_index: Dict[Optional[str], int] = {}
+
+    def _grow(self, rows: int, columns: int) -> None:
+        old_rows, old_columns = self._ints.shape
+        if rows <= old_rows and columns <= old_columns:
+            return
+
+        # Double whichever dimension ran out, so appends stay amortized O(1)
+        new_shape = (
+            old_rows if rows <= old_rows else max(rows, old_rows * 2),
+            old_columns if columns <= old_columns else max(columns, old_columns * 2),
+        )
+        for name in ("_ints", "_floats", "_present", "_is_float"):
+            old = getattr(self, name)
+            grown = np.zeros(new_shape, dtype=old.dtype)
+            grown[:old_rows, :old_columns] = old
+            setattr(self, name, grown)
+
+    def _plan(self, keys: tuple, types: tuple) -> _RowPlan:
+        """Builds (and caches) the row plan for matches with these keys and value types."""
+        positions, columns, int_positions, int_columns, float_columns = [], [], [], [], []
+        for position, (key, value_type) in enumerate(zip(keys, types)):
+            # Skip ignored keys and anything that isn't a number (bools count as ints)
+            if key in IGNORE_KEYS or not issubclass(value_type, (int, float)):
+                continue
+
+            column = self._columns.get(key)
+            if column is None:
+                column = self._columns[key] = len(self._columns)
+
+            positions.append(position)
+            columns.append(column)
+            if issubclass(value_type, float):
+                float_columns.append(column)
+            else:
+                int_positions.append(position)
+                int_columns.append(column)
+
+        plan = _RowPlan(
+            _getter(positions),
+            np.array(columns, dtype=np.intp),
+            _getter(int_positions),
+            np.array(int_columns, dtype=np.intp),
+            np.array(float_columns, dtype=np.intp),
+        )
+        if len(self._plans) >= MAX_ROW_PLANS:
+            self._plans.clear()
+        self._plans[(keys, types)] = plan
+        return plan
+
+    def _aggregate_match_stats(
+        self, match_data: Dict[str, Any], champion: str, role: Optional[str]
+    ) -> None:
+        keys = tuple(match_data)
+        values = tuple(match_data.values())
+        types = tuple(map(type, values))
+        plan = self._plans.get((keys, types)) or self._plan(keys, types)
+
+        row = self._rows
+        self._grow(row + 1, len(self._columns))
+        self._ints[row, plan.int_columns] = plan.int_values(values)
+        self._floats[row, plan.columns] = plan.values(values)
+        self._present[row, plan.columns] = True
+        self._is_float[row, plan.float_columns] = True
+        self._rows += 1
+
+        self._row_champions.append(
+            self._champion_index.setdefault(champion, len(self._champion_index))
+        )
+        self._row_roles.append(self._role_index.setdefault(role, len(self._role_index)))
+
+    def _fold_rows(self, stats_dict: Dict[str, Any], rows) -> None:
+        """Adds the column sums of the selected buffered rows into `stats_dict`."""
+        n_columns = len(self._columns)
+        present = self._present[rows, :n_columns]
+        stats_dict["games_played"] += int(present.shape[0])
+
+        seen = present.any(axis=0)
+        has_float = self._is_float[rows, :n_columns].any(axis=0)
+        # Sequential row-by-row reductions along axis 0, same order as the python engine
+        int_sums = self._ints[rows, :n_columns].sum(axis=0)
+        float_sums = self._floats[rows, :n_columns].sum(axis=0)
+
+        for key, column in self._columns.items():
+            if not seen[column]:
+                continue
+            value = float(float_sums[column]) if has_float[column] else int(int_sums[column])
+            stats_dict[key] = stats_dict.get(key, 0) + value
+
+    def _flush_pending(self) -> None:
+        if not self._rows:
+            return
+
+        n_rows = self._rows
+        self._fold_rows(self.overall_stats, slice(0, n_rows))
+
+        champion_codes = np.asarray(self._row_champions)
+        for champion, code in self._champion_index.items():
+            rows = np.flatnonzero(champion_codes == code)
+            if rows.size:
+                self._fold_rows(self.champion_stats[champion], rows)
+
+        role_codes = np.asarray(self._row_roles)
+        for role, code in self._role_index.items():
+            rows = np.flatnonzero(role_codes == code)
+            if rows.size:
+                self._fold_rows(self.role_stats[role], rows)
+
+        logger.debug(f"Folded {n_rows} buffered matches into aggregated stats")
+
+        # Keep the column map and array capacity; only the buffered rows are consumed
+        self._ints[:n_rows] = 0
+        self._floats[:n_rows] = 0
+        self._present[:n_rows] = False
+        self._is_float[:n_rows] = False
+        self._rows = 0
+        self._row_champions.clear()
+        self._row_roles.clear()
+        self._champion_index.clear()
+        self._role_index.clear()
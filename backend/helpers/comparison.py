@@ -0,0 +1,76 @@
+from typing import Any, Dict, Tuple
+
+# Fields of the comparison tool output that belong to one side, swapped when reorienting
+SIDE_FIELD_PAIRS = {
+    "statistical_comparison": ("player1_value", "player2_value"),
+    "playstyle_comparison": ("player1_strengths", "player2_strengths"),
+    "champion_comparison": ("unique_player1", "unique_player2"),
+}
+
+SWAPPED_WINNERS = {"player1": "player2", "player2": "player1"}
+
+
+def canonical_comparison_id(player1_unique_id: str, player2_unique_id: str) -> Tuple[str, bool]:
+    """
+    Builds the key a comparison is stored under, the same for A-vs-B and B-vs-A.
+
+    Args:
+        player1_unique_id (str): unique_id of the player requested first
+        player2_unique_id (str): unique_id of the player requested second
+
+    Returns:
+        tuple: (unique_id, reversed) where reversed is True if the stored comparison has
+               the players the other way round from this request
+    """
+    first, second = sorted((player1_unique_id, player2_unique_id))
+    return f"comparison_{first}_{second}", first != player1_unique_id
+
+
+def _swap_winner(winner: Any) -> Any:
+    if isinstance(winner, str):
+        return SWAPPED_WINNERS.get(winner.strip().lower(), winner)
+    return winner
+
+
+def reorient_comparison(result: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Returns a copy of a compareData result with player1 and player2 swapped.
+
+    Swaps the player entries and every per-side field of the comparison (stat values,
+    strengths, unique champions) and flips "player1"/"player2" winners, so a comparison
+    generated as A-vs-B can be served for B-vs-A. The input is left unchanged.
+    """
+    comparison = dict(result.get("comparison") or {})
+
+    stats = comparison.get("statistical_comparison")
+    if isinstance(stats, list):
+        first, second = SIDE_FIELD_PAIRS["statistical_comparison"]
+        swapped_stats = []
+        for stat in stats:
+            stat = dict(stat)
+            stat[first], stat[second] = stat.get(second), stat.get(first)
+            if "winner" in stat:
+                stat["winner"] = _swap_winner(stat["winner"])
+            swapped_stats.append(stat)
+        comparison["statistical_comparison"] = swapped_stats
+
+    for section in ("playstyle_comparison", "champion_comparison"):
+        if isinstance(comparison.get(section), dict):
+            first, second = SIDE_FIELD_PAIRS[section]
+            fields = dict(comparison[section])
+            if first in fields or second in fields:
+                fields[first], fields[second] = fields.get(second, []), fields.get(first, [])
+            comparison[section] = fields
+
+    if isinstance(comparison.get("verdict"), dict):
+        verdict = dict(comparison["verdict"])
+        if "winner" in verdict:
+            verdict["winner"] = _swap_winner(verdict["winner"])
+        comparison["verdict"] = verdict
+
+    return {
+        **result,
+        "player1": result.get("player2"),
+        "player2": result.get("player1"),
+        "comparison": comparison,
+    }
@@ -0,0 +1,128 @@
+import re
+from collections import deque
+from typing import Callable, Iterable, List, Optional
+
+# Words, numbers and single punctuation marks, roughly how BPE tokenizers split text
+TOKEN_PIECE_PATTERN = re.compile(r"[A-Za-z]+|\d+|[^\sA-Za-z\d]")
+
+# Messages are moved into the summary in multiples of this. Fixed-size chunks keep the
+# removed messages the same from turn to turn, so a summary of them can be reused.
+COMPACTION_CHUNK_MESSAGES = 8
+# Compaction stops once the context is back under this share of the limit, so it
+# doesn't run again on the very next turn
+COMPACTION_TARGET_RATIO = 0.6
+
+
+def count_tokens(text: str) -> int:
+    """
+    Approximates the number of tokens in `text` for Claude-style BPE tokenizers.
+
+    Short words count as one token and longer ones as one per ~4 letters; digits go
+    in groups of 3; every punctuation mark or symbol is a token of its own. Closer than
+    a flat characters/4 for JSON, numbers and code, which the stats questions are full of.
+    """
+    tokens = 0
+    for piece in TOKEN_PIECE_PATTERN.findall(text):
+        if piece[0].isdigit():
+            tokens += (len(piece) + 2) // 3
+        elif piece[0].isalpha():
+            tokens += 1 if len(piece) <= 4 else (len(piece) + 3) // 4
+        else:
+            tokens += 1
+    return tokens
+
+
+def message_tokens(message: dict) -> int:
+    """Approximate tokens in a Converse message (its text blocks)."""
+    return sum(count_tokens(block.get("text", "")) for block in message.get("content", []))
+
+
+class ConversationContext:
+    """
+    A chatbot conversation with a running token count.
+
+    Each message is counted once, when it is added, so keeping the total up to date
+    costs O(1) per turn. When the total passes the limit, compact() moves the oldest
+    turns into a running summary, with one summarizer call, instead of discarding them.
+    """
+
+    def __init__(self, messages: Iterable[dict] = (), summary: Optional[str] = None):
+        self.messages: deque = deque()
+        self._tokens: deque = deque()
+        self.total_tokens = 0
+        self.summary = summary
+        self.summary_tokens = count_tokens(summary) if summary else 0
+        for message in messages:
+            self.append(message)
+
+    @property
+    def token_estimate(self) -> int:
+        """Approximate tokens of the messages plus the summary."""
+        return self.total_tokens + self.summary_tokens
+
+    def append(self, message: dict) -> None:
+        tokens = message_tokens(message)
+        self.messages.append(message)
+        self._tokens.append(tokens)
+        self.total_tokens += tokens
+
+    def pop(self) -> dict:
+        """Removes and returns the newest message (e.g. a turn the model never answered)."""
+        self.total_tokens -= self._tokens.pop()
+        return self.messages.pop()
+
+    def _popleft(self) -> dict:
+        self.total_tokens -= self._tokens.popleft()
+        return self.messages.popleft()
+
+    def compact(
+        self,
+        max_tokens: int,
+        summarize: Optional[Callable[[Optional[str], List[dict]], Optional[str]]] = None,
+        trigger_tokens: Optional[int] = None,
+    ) -> int:
+        """
+        Brings the context back under `max_tokens` if it went over.
+
+        The oldest messages are taken off in chunks of COMPACTION_CHUNK_MESSAGES until
+        the messages are under COMPACTION_TARGET_RATIO of the limit, then folded into the
+        summary with a single `summarize(previous_summary, removed_messages)` call;
+        without a summarizer (or when it returns None) they are just dropped. The newest
+        message is always kept, and the remaining conversation always starts with a
+        user message.
+
+        Args:
+            max_tokens (int): Token budget for the messages and the summary
+            summarize (callable, optional): Folds removed messages into the summary
+            trigger_tokens (int, optional): Compact once over this many tokens instead
+                of `max_tokens`, e.g. to leave room for the next message
+
+        Returns:
+            int: Number of messages taken off
+        """
+        if self.token_estimate <= (trigger_tokens or max_tokens):
+            return 0
+
+        target = max_tokens * COMPACTION_TARGET_RATIO
+        removed: List[dict] = []
+        # Only the messages are measured against the target: the summary they're folded
+        # into replaces the current one, and is bounded by the summarizer
+        while self.total_tokens > target and len(self.messages) > 1:
+            chunk_end = len(removed) + COMPACTION_CHUNK_MESSAGES
+            while len(removed) < chunk_end and len(self.messages) > 1:
+                removed.append(self._popleft())
+            # Converse requires the conversation to open with a user turn
+            while len(self.messages) > 1 and self.messages[0].get("role") != "user":
+                removed.append(self._popleft())
+
+        if removed and summarize:
+            summary = summarize(self.summary, removed)
+            if summary:
+                self.summary = summary
+                self.summary_tokens = count_tokens(summary)
+
+        # A summary that alone exceeds the budget is dropped rather than sent
+        if self.token_estimate > max_tokens and self.summary:
+            self.summary = None
+            self.summary_tokens = 0
+        return len(removed)
@@ -0,0 +1,276 @@
+import asyncio
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+QUEUED = "queued"
+RUNNING = "running"
+SUCCEEDED = "succeeded"
+FAILED = "failed"
+
+# Least time between sweeps of expired status files from the job directory
+FILE_SWEEP_INTERVAL_SECONDS = 60
+
+
+class JobQueueFullError(Exception):
+    """Raised when a job is submitted while the pending job backlog is full."""
+
+    pass
+
+
+class Job:
+    """A background job and its progress, as reported to pollers."""
+
+    def __init__(self, job_id: str, kind: str, params: Dict[str, Any]):
+        self.job_id = job_id
+        self.kind = kind
+        self.params = params
+        self.status = QUEUED
+        self.stage = QUEUED
+        self.percent = 0
+        self.result: Optional[Dict] = None
+        self.error: Optional[Dict] = None
+        self.created_at = time.time()
+        self.updated_at = self.created_at
+        self.task: Optional[asyncio.Task] = None
+        # Writes the status file in the background; _dirty means it needs another write
+        self._writer: Optional[asyncio.Task] = None
+        self._dirty = False
+
+    @property
+    def finished(self) -> bool:
+        return self.status in (SUCCEEDED, FAILED)
+
+    def snapshot(self, include_result: bool = False) -> Dict[str, Any]:
+        """Returns the job's status as a JSON-friendly dict."""
+        snapshot = {
+            "job_id": self.job_id,
+            "kind": self.kind,
+            "params": self.params,
+            "status": self.status,
+            "stage": self.stage,
+            "percent": self.percent,
+            "error": self.error,
+            "created_at": self.created_at,
+            "updated_at": self.updated_at,
+        }
+        if include_result:
+            snapshot["result"] = self.result
+        return snapshot
+
+
+class JobManager:
+    """
+    Runs long pipelines as background asyncio tasks that outlive the request that
+    submitted them.
+
+    At most `max_concurrent` jobs run at once and at most `max_pending` are queued or
+    running; further submissions raise JobQueueFullError. This keeps a burst of new
+    players from tying up the threadpool that every other endpoint shares.
+
+    Job status is mirrored to JSON files in `directory` so that any uvicorn worker
+    can answer a status poll, whichever worker runs the job. The files are written
+    off the event loop, and `directory` is created by the first write. Finished jobs
+    are forgotten `ttl` seconds after they complete.
+    """
+
+    def __init__(
+        self,
+        max_concurrent: Optional[int] = None,
+        max_pending: Optional[int] = None,
+        ttl: Optional[float] = None,
+        directory: Optional[str] = None,
+    ):
+        """
+        Args:
+            max_concurrent (int, optional): Jobs run at once.
+                Defaults to WRAPPED_JOB_CONCURRENCY or 2.
+            max_pending (int, optional): Jobs queued or running before submissions are rejected.
+                Defaults to WRAPPED_JOB_MAX_PENDING or 50.
+            ttl (float, optional): Seconds a finished job is kept for polling.
+                Defaults to WRAPPED_JOB_TTL_SECONDS or 3600.
+            directory (str, optional): Where job status files are written.
+                Defaults to WRAPPED_JOB_DIR or ./data/jobs.
+        """
+        self.max_concurrent = max_concurrent or int(os.getenv("WRAPPED_JOB_CONCURRENCY", 2))
+        self.max_pending = max_pending or int(os.getenv("WRAPPED_JOB_MAX_PENDING", 50))
+        self.ttl = ttl or float(os.getenv("WRAPPED_JOB_TTL_SECONDS", 3600))
+        self.directory = directory or os.getenv("WRAPPED_JOB_DIR", "./data/jobs")
+        self._directory_ready = False
+
+        self._jobs: Dict[str, Job] = {}
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._last_file_sweep = 0.0
+        self._file_sweep: Optional[asyncio.Task] = None
+
+    def _path(self, job_id: str) -> str:
+        return os.path.join(self.directory, f"{job_id}.json")
+
+    def _write(self, job_id: str, snapshot: Dict[str, Any]) -> None:
+        """Writes a job status file. Blocking; runs in a worker thread."""
+        tmp_path = f"{self._path(job_id)}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            if not self._directory_ready:
+                os.makedirs(self.directory, exist_ok=True)
+                self._directory_ready = True
+            with open(tmp_path, "w") as f:
+                json.dump(snapshot, f, default=str)
+            os.replace(tmp_path, self._path(job_id))
+        except OSError as e:
+            logger.warning(f"Could not write status of job {job_id}: {e}")
+
+    async def _write_pending(self, job: Job) -> None:
+        # Updates made while a write is in flight are folded into the next one, so a
+        # slow disk costs fewer writes rather than a backlog, and writes stay in order
+        while job._dirty:
+            job._dirty = False
+            await asyncio.to_thread(self._write, job.job_id, job.snapshot(include_result=job.finished))
+
+    def _persist(self, job: Job) -> asyncio.Task:
+        """
+        Schedules a write of the job's status (and result, once finished) for other
+        workers to read, without blocking the event loop.
+
+        Returns:
+            asyncio.Task: The job's writer, done once the current status is written
+        """
+        job._dirty = True
+        if job._writer is None or job._writer.done():
+            job._writer = asyncio.create_task(self._write_pending(job))
+        return job._writer
+
+    def _prune(self) -> None:
+        """
+        Forgets finished jobs older than the TTL. Their status files are removed by a
+        sweep in a worker thread, started at most every FILE_SWEEP_INTERVAL_SECONDS.
+        """
+        now = time.time()
+        cutoff = now - self.ttl
+        for job_id, job in list(self._jobs.items()):
+            if job.finished and job.updated_at < cutoff:
+                del self._jobs[job_id]
+
+        if now - self._last_file_sweep < FILE_SWEEP_INTERVAL_SECONDS:
+            return
+        if self._file_sweep is not None and not self._file_sweep.done():
+            return
+        self._last_file_sweep = now
+        self._file_sweep = asyncio.create_task(asyncio.to_thread(self._sweep_files, cutoff))
+
+    def _sweep_files(self, cutoff: float) -> None:
+        """Removes status files last written before `cutoff`. Blocking; runs in a worker thread."""
+        try:
+            for entry in os.scandir(self.directory):
+                if entry.name.endswith(".json") and entry.stat().st_mtime < cutoff:
+                    os.remove(entry.path)
+        except FileNotFoundError:
+            # Nothing written yet
+            pass
+        except OSError as e:
+            logger.warning(f"Could not prune job status files: {e}")
+
+    def submit(
+        self,
+        kind: str,
+        params: Dict[str, Any],
+        runner: Callable[[Callable[[str, float], None]], Awaitable[Dict]],
+    ) -> Dict[str, Any]:
+        """
+        Queues `runner` as a background job and returns its initial status.
+
+        Args:
+            kind (str): What the job produces, e.g. "wrapped"
+            params (dict): The job's inputs, echoed back in its status
+            runner (callable): Coroutine function called as runner(progress); it reports
+                progress with progress(stage, percent) and returns the job result
+
+        Returns:
+            dict: The job's status snapshot
+        """
+        self._prune()
+        pending = sum(1 for job in self._jobs.values() if not job.finished)
+        if pending >= self.max_pending:
+            raise JobQueueFullError(f"{pending} jobs already pending")
+
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_concurrent)
+
+        job = Job(uuid.uuid4().hex, kind, params)
+        self._jobs[job.job_id] = job
+        self._persist(job)
+        job.task = asyncio.create_task(self._run(job, runner))
+        logger.info(f"Queued {kind} job {job.job_id} ({pending + 1} pending)")
+        return job.snapshot()
+
+    async def _run(self, job: Job, runner) -> None:
+        def progress(stage: str, percent: float) -> None:
+            percent = int(max(0, min(99, percent)))
+            if stage == job.stage and percent == job.percent:
+                return
+            job.stage = stage
+            job.percent = percent
+            job.updated_at = time.time()
+            self._persist(job)
+
+        try:
+            async with self._semaphore:
+                job.status = RUNNING
+                progress("starting", 0)
+                job.result = await runner(progress)
+            job.status = SUCCEEDED
+            job.stage = "done"
+            job.percent = 100
+        except asyncio.CancelledError:
+            job.status = FAILED
+            job.error = {"status_code": 503, "detail": "Job was interrupted by a server shutdown"}
+            raise
+        except Exception as e:
+            job.status = FAILED
+            job.error = {
+                "status_code": getattr(e, "status_code", 500),
+                "detail": getattr(e, "detail", None) or str(e),
+            }
+            logger.error(f"Job {job.job_id} failed: {job.error['detail']}")
+        finally:
+            job.updated_at = time.time()
+            # Finish with the final status (and result) on disk, for pollers on other workers
+            await asyncio.shield(self._persist(job))
+
+    def get(self, job_id: str, include_result: bool = False) -> Optional[Dict[str, Any]]:
+        """
+        Returns the job's status snapshot, or None if the job is unknown or expired.
+        Jobs run by other workers are read from their status file.
+        """
+        job = self._jobs.get(job_id)
+        if job is not None:
+            return job.snapshot(include_result=include_result)
+
+        # Job IDs are hex UUIDs; anything else can't name a status file
+        if not all(c in "0123456789abcdef" for c in job_id) or len(job_id) != 32:
+            return None
+
+        try:
+            with open(self._path(job_id)) as f:
+                snapshot = json.load(f)
+        except (OSError, ValueError):
+            return None
+
+        expired = snapshot["updated_at"] < time.time() - self.ttl
+        if snapshot["status"] in (SUCCEEDED, FAILED) and expired:
+            return None
+        if not include_result:
+            snapshot.pop("result", None)
+        return snapshot
+
+    async def shutdown(self) -> None:
+        """Cancels unfinished jobs, marking them failed so pollers stop waiting."""
+        tasks = [job.task for job in self._jobs.values() if job.task and not job.task.done()]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
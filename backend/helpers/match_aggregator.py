@@ -3,9 +3,13 @@ from collections import defaultdict
 from datetime import datetime
 from constants import IGNORE_KEYS, CHAMPION_STATS_KEYS, ROLE_STATS_KEYS
 import logging
+import os
 
 logger = logging.getLogger(__name__)
 
+# Bump when the layout produced by MatchStatsAggregator.to_state() changes
+STATE_VERSION = 1
+
 
 class MatchStatsAggregator:
     """
@@ -20,7 +24,7 @@ class MatchStatsAggregator:
         self.hourly_stats = defaultdict(lambda: {"games": 0})
         self.total_time_played_seconds = 0  # Track total play time in seconds
 
-        # Track only current month stats and best month
+        # Track monthly stats; the best month is picked from them when summarizing
         self.current_month_stats = {}  # {month_key: {wins, losses, games}}
         self.best_month = None  # Stores the best month info
 
@@ -67,9 +71,7 @@ class MatchStatsAggregator:
             self._update_win_streak(is_win)
 
             # Aggregate to all three views
-            self._aggregate_stats(self.overall_stats, match_data)
-            self._aggregate_stats(self.champion_stats[champion], match_data)
-            self._aggregate_stats(self.role_stats[role], match_data)
+            self._aggregate_match_stats(match_data, champion, role)
 
             # Track time-based stats
             self._aggregate_time_stats(match_data)
@@ -82,6 +84,128 @@ class MatchStatsAggregator:
             )
             logger.error(f"Error aggregating match for champion={champion}: {e}")
 
+    def _aggregate_match_stats(
+        self, match_data: Dict[str, Any], champion: str, role: Optional[str]
+    ) -> None:
+        """Adds one match's numeric stats to the overall, champion and role sums."""
+        self._aggregate_stats(self.overall_stats, match_data)
+        self._aggregate_stats(self.champion_stats[champion], match_data)
+        self._aggregate_stats(self.role_stats[role], match_data)
+
+    def _flush_pending(self) -> None:
+        """
+        Hook for engines that buffer matches instead of summing them in add_match.
+        Called before the sum dictionaries are read; a no-op here.
+        """
+
+    def to_state(self) -> Dict[str, Any]:
+        """
+        Serializes the raw aggregation state into a compact, JSON-friendly dict.
+
+        Champion and role sums are trimmed to the keys `get_summary()` reports on, and
+        match results are stored as a "W"/"L" string. Restore with `from_state()`.
+        """
+        self._flush_pending()
+        return {
+            "version": STATE_VERSION,
+            "overall": dict(self.overall_stats),
+            "champions": [
+                [champ, self._compact_group_stats(stats, CHAMPION_STATS_KEYS)]
+                for champ, stats in self.champion_stats.items()
+            ],
+            "roles": [
+                [role, self._compact_group_stats(stats, ROLE_STATS_KEYS)]
+                for role, stats in self.role_stats.items()
+            ],
+            "hourly": [[hour, stats["games"]] for hour, stats in self.hourly_stats.items()],
+            "months": self.current_month_stats,
+            "results": "".join("W" if is_win else "L" for is_win in self.match_results),
+            "total_time_played_seconds": self.total_time_played_seconds,
+        }
+
+    @classmethod
+    def from_state(cls, state: Dict[str, Any]) -> "MatchStatsAggregator":
+        """Rebuilds an aggregator from the output of `to_state()`."""
+        if state.get("version") != STATE_VERSION:
+            raise ValueError(f"Unsupported aggregator state version: {state.get('version')}")
+
+        aggregator = cls()
+        aggregator.overall_stats = cls._restore_counts(state["overall"])
+        for champ, stats in state["champions"]:
+            aggregator.champion_stats[champ] = cls._restore_counts(stats)
+        for role, stats in state["roles"]:
+            aggregator.role_stats[role] = cls._restore_counts(stats)
+        for hour, games in state["hourly"]:
+            aggregator.hourly_stats[int(hour)] = {"games": int(games)}
+        aggregator.current_month_stats = {
+            month: {key: int(value) for key, value in stats.items()}
+            for month, stats in state["months"].items()
+        }
+        aggregator.total_time_played_seconds = state["total_time_played_seconds"]
+
+        for result in state["results"]:
+            aggregator.match_results.append(result == "W")
+            aggregator._update_win_streak(result == "W")
+
+        return aggregator
+
+    def merge(self, other: "MatchStatsAggregator") -> "MatchStatsAggregator":
+        """
+        Folds another aggregator into this one, as if its matches had been added after ours.
+
+        Sums, monthly and hourly buckets are added together and streaks are recomputed
+        from the combined match results. Returns self so calls can be chained.
+        """
+        self._flush_pending()
+        other._flush_pending()
+        self._merge_stats(self.overall_stats, other.overall_stats)
+        for champ, stats in other.champion_stats.items():
+            self._merge_stats(self.champion_stats[champ], stats)
+        for role, stats in other.role_stats.items():
+            self._merge_stats(self.role_stats[role], stats)
+        for hour, stats in other.hourly_stats.items():
+            self.hourly_stats[hour]["games"] += stats["games"]
+
+        for month_key, stats in other.current_month_stats.items():
+            month = self.current_month_stats.setdefault(
+                month_key, {"wins": 0, "losses": 0, "games": 0}
+            )
+            for key in ("wins", "losses", "games"):
+                month[key] += stats[key]
+
+        self.total_time_played_seconds += other.total_time_played_seconds
+
+        self.match_results.extend(other.match_results)
+        self.current_streak = 0
+        self.best_win_streak = 0
+        for is_win in self.match_results:
+            self._update_win_streak(is_win)
+
+        return self
+
+    @staticmethod
+    def _merge_stats(target: Dict[str, Any], source: Dict[str, Any]) -> None:
+        for key, value in source.items():
+            target[key] = target.get(key, 0) + value
+
+    @staticmethod
+    def _restore_counts(stats: Dict[str, Any]) -> Dict[str, Any]:
+        """Copies summed stats, turning game and win counts back into ints (storage may not keep them)."""
+        restored = dict(stats)
+        for key in ("games_played", "win"):
+            if key in restored:
+                restored[key] = int(restored[key])
+        return restored
+
+    @staticmethod
+    def _compact_group_stats(stats: Dict[str, Any], summary_keys: set) -> Dict[str, Any]:
+        """Keeps only the sums behind `summary_keys` (plus games played and wins)."""
+        return {
+            key: value
+            for key, value in stats.items()
+            if key in ("games_played", "win") or f"{key}_avg_per_game" in summary_keys
+        }
+
     def _aggregate_time_stats(self, match_data: Dict[str, Any]) -> None:
         """
         Aggregates time-based statistics (best month and hourly play patterns).
@@ -127,9 +251,6 @@ class MatchStatsAggregator:
             else:
                 self.current_month_stats[month_key]["losses"] += 1
 
-            # Check if this month is now the best
-            self._update_best_month(month_key)
-
             # Track hourly stats (0-23 hour in ET)
             hour = et_dt.hour
             self.hourly_stats[hour]["games"] += 1
@@ -245,10 +366,12 @@ class MatchStatsAggregator:
 
     def get_overall_stats(self) -> Dict[str, Any]:
         """Returns aggregated stats across all games with averages."""
+        self._flush_pending()
         return self._compute_averages(self.overall_stats)
 
     def get_champion_stats(self) -> Dict[str, Dict[str, Any]]:
         """Returns aggregated stats by champion with averages."""
+        self._flush_pending()
         return {
             champ: {**self._compute_averages(stats), "champion": champ}
             for champ, stats in self.champion_stats.items()
@@ -256,6 +379,7 @@ class MatchStatsAggregator:
 
     def get_role_stats(self) -> Dict[str, Dict[str, Any]]:
         """Returns aggregated stats by role/position with averages."""
+        self._flush_pending()
         return {
             role: {**self._compute_averages(stats), "role": role}
             for role, stats in self.role_stats.items()
@@ -265,6 +389,12 @@ class MatchStatsAggregator:
         """
         Returns the month with the best performance (most wins - losses).
         """
+        # Picked from the final monthly totals, so the result doesn't depend on the order
+        # matches (or merged aggregators) were added in
+        self.best_month = None
+        for month_key in self.current_month_stats:
+            self._update_best_month(month_key)
+
         if not self.best_month:
             return {}
 
@@ -324,6 +454,7 @@ class MatchStatsAggregator:
         Returns a summary of key statistics for LLM-friendly yearly recap generation.
         All stats are averages per game.
         """
+        self._flush_pending()
         overall = self.get_overall_stats()
         games_played = overall.get("games_played", 0)
 
@@ -501,3 +632,20 @@ class MatchStatsAggregator:
             "best_month": data.get("best_month", {}),
             "peak_play_time": data.get("peak_play_time", {}),
         }
+
+
+def create_match_stats_aggregator() -> MatchStatsAggregator:
+    """
+    Returns an empty aggregator using the engine selected by AGGREGATOR_ENGINE:
+    'python' (default, dict-based) or 'columnar' (NumPy, faster on large histories).
+    Both produce identical summaries.
+    """
+    engine = os.getenv("AGGREGATOR_ENGINE", "python").lower()
+    if engine == "columnar":
+        try:
+            from helpers.columnar_aggregator import ColumnarMatchStatsAggregator
+
+            return ColumnarMatchStatsAggregator()
+        except ImportError as e:
+            logger.warning(f"Columnar aggregator unavailable, using the python engine: {e}")
+    return MatchStatsAggregator()
@@ -0,0 +1,121 @@
+import logging
+import math
+import os
+from typing import Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# Score added for each signal; a match's score is the sum of the signals it shows
+MULTIKILL_SCORES = {3: 1.5, 4: 3.0, 5: 5.0}
+COMEBACK_WIN_SCORE = 2.5
+SURRENDER_SCORE = 0.5
+FIRST_GAME_ON_CHAMPION_SCORE = 1.0
+# Standard deviations from the player's own average before KDA or duration count as extreme
+OUTLIER_THRESHOLD = 1.5
+
+
+def timeline_entry(match_id: str, flattened_match_data: dict) -> dict:
+    """
+    Builds the compact timeline entry for a parsed match: what the interesting-matches
+    LLM sees, plus the signals rank_interesting_matches scores it on.
+    """
+    win = flattened_match_data["win"]
+    return {
+        "id": match_id,
+        "kda": flattened_match_data["kda"],
+        "champ": flattened_match_data["championName"],
+        "win": win,
+        "multikill": flattened_match_data.get("largestMultiKill", 0),
+        "duration": flattened_match_data.get("gameDuration", 0),
+        "surrender": bool(flattened_match_data.get("gameEndedInSurrender")),
+        # Won after losing an inhibitor or having the nexus exposed
+        "comeback": bool(
+            win
+            and (
+                flattened_match_data.get("lostAnInhibitor")
+                or flattened_match_data.get("hadOpenNexus")
+            )
+        ),
+    }
+
+
+def _mean_and_std(values: List[float]):
+    if not values:
+        return 0.0, 0.0
+    mean = sum(values) / len(values)
+    variance = sum((value - mean) ** 2 for value in values) / len(values)
+    return mean, math.sqrt(variance)
+
+
+def _outlier_score(value: Optional[float], mean: float, std: float) -> float:
+    """How far past OUTLIER_THRESHOLD standard deviations `value` lies, or 0."""
+    if value is None or std == 0:
+        return 0.0
+    return max(0.0, abs(value - mean) / std - OUTLIER_THRESHOLD)
+
+
+def score_matches(timeline_data: List[dict]) -> Dict[str, float]:
+    """
+    Scores each match in a newest-first timeline on how likely it is to be interesting:
+    KDA and duration outliers against the player's own averages, multikills, comeback
+    wins, surrenders, and the first game on each champion.
+
+    Entries stored before the extra signals existed only have kda/champ/win and are
+    scored on those.
+
+    Returns:
+        dict: match ID -> score
+    """
+    kdas = [match["kda"] for match in timeline_data if match.get("kda") is not None]
+    durations = [match["duration"] for match in timeline_data if match.get("duration")]
+    kda_mean, kda_std = _mean_and_std(kdas)
+    duration_mean, duration_std = _mean_and_std(durations)
+
+    # The timeline is newest first, so a champion's first game is its last entry
+    first_game_ids = {match.get("champ"): match["id"] for match in timeline_data}
+
+    scores = {}
+    for match in timeline_data:
+        kda = match.get("kda")
+        score = _outlier_score(kda, kda_mean, kda_std)
+        if kda is not None and kda < kda_mean:
+            # Rough games are only worth a fraction of a standout one
+            score *= 0.25
+
+        score += MULTIKILL_SCORES.get(min(match.get("multikill") or 0, 5), 0.0)
+        score += _outlier_score(match.get("duration") or None, duration_mean, duration_std)
+        if match.get("comeback"):
+            score += COMEBACK_WIN_SCORE
+        if match.get("surrender"):
+            score += SURRENDER_SCORE
+        if first_game_ids.get(match.get("champ")) == match["id"]:
+            score += FIRST_GAME_ON_CHAMPION_SCORE
+
+        scores[match["id"]] = score
+    return scores
+
+
+def rank_interesting_matches(timeline_data: List[dict], top_k: Optional[int] = None) -> List[dict]:
+    """
+    Picks the `top_k` highest scoring matches (see score_matches) as candidates for the
+    interesting-matches LLM call, so its prompt stays the same size however many games
+    the player has. Ties go to the newer match, so the pick is deterministic.
+
+    Args:
+        timeline_data (list): Timeline entries, newest first
+        top_k (int, optional): Candidates to keep. Defaults to
+            INTERESTING_MATCH_CANDIDATES or 60.
+
+    Returns:
+        list: The candidates, in their timeline order
+    """
+    top_k = top_k or int(os.getenv("INTERESTING_MATCH_CANDIDATES", 60))
+    if len(timeline_data) <= top_k:
+        return list(timeline_data)
+
+    scores = score_matches(timeline_data)
+    ranked = sorted(range(len(timeline_data)), key=lambda i: (-scores[timeline_data[i]["id"]], i))
+    keep = sorted(ranked[:top_k])
+
+    logger.info(f"Pre-ranked {len(timeline_data)} matches down to {top_k} candidates")
+    return [timeline_data[i] for i in keep]
@@ -0,0 +1,161 @@
+import asyncio
+import hashlib
+import logging
+import os
+import tempfile
+import time
+from typing import IO, Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+
+class _Flight:
+    """A running computation, with the callers following its events."""
+
+    def __init__(self):
+        self.task: Optional[asyncio.Task] = None
+        self.subscribers: List[Callable[..., None]] = []
+        # Events published so far, replayed to callers that join late
+        self.events: List[tuple] = []
+
+    def publish(self, *event) -> None:
+        self.events.append(event)
+        for subscriber in list(self.subscribers):
+            try:
+                subscriber(*event)
+            except Exception as e:
+                # One caller's callback failing mustn't break the computation for the rest
+                logger.warning(f"Single-flight subscriber failed: {e}")
+
+
+class SingleFlight:
+    """
+    Coalesces concurrent calls for the same key into one computation.
+
+    Within a process, callers that arrive while a key is in flight await the running
+    computation instead of starting their own. The computation runs in its own task,
+    so it isn't cancelled when the caller that started it goes away. Events it publishes
+    (e.g. progress) reach every caller waiting on it.
+
+    Across uvicorn workers, acquire_host_lock/release_host_lock serialize the work for
+    a key with an advisory file lock, so a worker can wait for another worker's
+    computation and then read its result from wherever that computation stored it.
+    """
+
+    def __init__(self, lock_dir: Optional[str] = None, lock_timeout: Optional[float] = None):
+        """
+        Args:
+            lock_dir (str, optional): Directory for cross-worker lock files.
+                Defaults to SINGLE_FLIGHT_LOCK_DIR, else /dev/shm/rift-rewind/single-flight.
+            lock_timeout (float, optional): Longest a worker waits on another worker's lock
+                before doing the work itself. Defaults to SINGLE_FLIGHT_LOCK_TIMEOUT or 600.
+        """
+        self._flights: Dict[str, _Flight] = {}
+        self.lock_timeout = lock_timeout or float(os.getenv("SINGLE_FLIGHT_LOCK_TIMEOUT", 600))
+
+        self.lock_dir = None
+        cross_worker = os.getenv("SINGLE_FLIGHT_CROSS_WORKER", "true").lower()
+        if fcntl is not None and cross_worker not in ("0", "false", "no"):
+            if lock_dir is None:
+                base = "/dev/shm" if os.path.isdir("/dev/shm") else tempfile.gettempdir()
+                lock_dir = os.getenv(
+                    "SINGLE_FLIGHT_LOCK_DIR", os.path.join(base, "rift-rewind", "single-flight")
+                )
+            try:
+                os.makedirs(lock_dir, exist_ok=True)
+                self.lock_dir = lock_dir
+            except OSError as e:
+                logger.warning(f"Cross-worker single-flight disabled: {e}")
+
+    async def do(
+        self,
+        key: str,
+        fn: Callable[[Callable[..., None]], Awaitable[Any]],
+        subscriber: Optional[Callable[..., None]] = None,
+    ) -> Tuple[Any, bool]:
+        """
+        Runs `fn(publish)` for `key`, or joins the call already in flight for it.
+
+        Args:
+            key (str): What is being computed
+            fn (callable): Coroutine function doing the work; every publish(*event) it
+                makes is passed on as subscriber(*event) to each caller waiting on it
+            subscriber (callable, optional): Receives the computation's events. A caller
+                joining late first gets the events published before it joined.
+
+        Returns:
+            tuple: (result, shared) where shared is True if this caller joined
+                   a computation started by another caller
+        """
+        flight = self._flights.get(key)
+        shared = flight is not None
+        if flight is None:
+            flight = _Flight()
+            flight.task = asyncio.create_task(fn(flight.publish))
+            self._flights[key] = flight
+            flight.task.add_done_callback(lambda task: self._finished(key, flight, task))
+        else:
+            logger.info(f"Joining in-flight computation for {key}")
+
+        if subscriber is not None:
+            for event in flight.events:
+                subscriber(*event)
+            flight.subscribers.append(subscriber)
+        try:
+            # Shielded so a caller going away doesn't cancel the work the others are waiting on
+            return await asyncio.shield(flight.task), shared
+        finally:
+            if subscriber is not None:
+                flight.subscribers.remove(subscriber)
+
+    def _finished(self, key: str, flight: _Flight, task: asyncio.Task) -> None:
+        if self._flights.get(key) is flight:
+            del self._flights[key]
+        # Retrieved here so a failure nobody is left waiting for still gets logged
+        if not task.cancelled() and task.exception() is not None:
+            logger.warning(f"Computation for {key} failed: {task.exception()!r}")
+
+    async def acquire_host_lock(self, key: str) -> Tuple[Optional[IO], bool]:
+        """
+        Takes the cross-worker lock for `key`, waiting while another worker holds it.
+
+        Returns:
+            tuple: (handle to pass to release_host_lock, waited) where waited is True if
+                   another worker held the lock, meaning it has just finished the same
+                   work. The handle is None when cross-worker locking is disabled.
+        """
+        if self.lock_dir is None:
+            return None, False
+
+        digest = hashlib.sha256(key.encode("utf-8")).hexdigest()
+        lock_file = open(os.path.join(self.lock_dir, f"{digest}.lock"), "a")
+        waited = False
+        deadline = time.monotonic() + self.lock_timeout
+        try:
+            while True:
+                try:
+                    fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                    break
+                except BlockingIOError:
+                    if time.monotonic() > deadline:
+                        logger.warning(f"Gave up waiting on another worker for {key}")
+                        break
+                    if not waited:
+                        logger.info(f"Another worker is computing {key}, waiting for it")
+                    waited = True
+                    await asyncio.sleep(0.25)
+        except BaseException:
+            lock_file.close()
+            raise
+        return lock_file, waited
+
+    def release_host_lock(self, handle: Optional[IO]) -> None:
+        """Releases a lock taken with acquire_host_lock."""
+        if handle is not None:
+            fcntl.flock(handle, fcntl.LOCK_UN)
+            handle.close()
@@ -1,10 +1,17 @@
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Response
+from fastapi.responses import JSONResponse, StreamingResponse
+from fastapi.concurrency import run_in_threadpool
+from contextlib import asynccontextmanager
 import uvicorn
+import asyncio
+import json
 import logging
 from fastapi.middleware.cors import CORSMiddleware
 from dotenv import load_dotenv
 import os
+import time
 import traceback
+from typing import Optional
 from pydantic import BaseModel
 
 from clients.riotAPIClient import RiotAPIClient, RiotAPIError
@@ -12,13 +19,24 @@ from clients.awsBedrock import (
     generate_player_wrapped_json,
     find_and_generate_descriptions_of_interesting_matches,
     get_wrapped_from_dynamodb,
-    store_wrapped_in_dynamodb,
+    get_wrapped_batch_from_dynamodb,
+    queue_wrapped_for_storage,
+    wrapped_cache,
+    wrapped_write_queue,
+    llm_cache,
     generate_player_comparison,
 )
-from clients.chatBot import get_chatbot_response
+from clients.chatBot import get_chatbot_response, stream_chatbot_response
+from clients.awsClients import AWSClientRegistry, set_aws_clients
+from clients.wrappedStore import get_wrapped_store
 from helpers.match_parser import parse_match_for_player
-from helpers.match_aggregator import MatchStatsAggregator
+from helpers.match_aggregator import MatchStatsAggregator, create_match_stats_aggregator
 from helpers.item_data import get_item_name
+from helpers.job_manager import JobManager, JobQueueFullError, FAILED, SUCCEEDED
+from helpers.single_flight import SingleFlight
+from helpers.match_ranking import timeline_entry
+from helpers.chat_sessions import ChatSession, ChatSessionBusyError, ChatSessionManager
+from helpers.comparison import canonical_comparison_id, reorient_comparison
 
 # --- Load environment variables ---
 load_dotenv(verbose=True)
@@ -31,8 +49,39 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+# Background wrapped generation jobs (bounded so they can't starve the other endpoints)
+job_manager = JobManager()
+
+# Coalesces concurrent wrapped generation for the same player
+wrapped_single_flight = SingleFlight()
+
+# Server-side chatbot conversations, persisted next to the wrapped records
+chat_sessions = ChatSessionManager(
+    load_record=lambda key: get_wrapped_store().get(key),
+    save_record=lambda record, ttl: get_wrapped_store().put(record, ttl=ttl),
+    delete_record=lambda key: get_wrapped_store().delete(key),
+)
+
+
 # --- FastAPI App Setup ---
-app = FastAPI()
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # One set of pooled AWS clients for the whole app, created before the first request.
+    # Tests can set app.state.aws_clients to a stand-in before startup.
+    aws_clients = getattr(app.state, "aws_clients", None) or AWSClientRegistry()
+    app.state.aws_clients = aws_clients
+    set_aws_clients(aws_clients)
+    yield
+    # Mark unfinished jobs as interrupted so pollers stop waiting on them
+    await job_manager.shutdown()
+    # Write out records still queued for storage before the AWS clients go away
+    await run_in_threadpool(wrapped_write_queue.close)
+    aws_clients.close()
+    # Release the shared Riot API keep-alive pools
+    await RiotAPIClient.close_pools()
+
+
+app = FastAPI(lifespan=lifespan)
 
 # Configure CORS for React
 app.add_middleware(
@@ -41,6 +90,7 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Wrapped-Age", "X-Wrapped-Stale"],
 )
 
 
@@ -49,6 +99,17 @@ def read_root():
     return {"message": "Hello World from Rift Wrapped Backend!"}
 
 
+@app.get("/api/metrics")
+def get_metrics():
+    """Returns this worker's storage write-behind, wrapped cache and LLM cache counters."""
+    return {
+        "write_behind": wrapped_write_queue.stats(),
+        "wrapped_cache": wrapped_cache.stats(),
+        "llm_cache": llm_cache.stats(),
+        "chat_sessions": chat_sessions.stats(),
+    }
+
+
 def get_platform_from_region(region: str) -> str:
     """Maps regional routing to platform routing for summoner-v4 API."""
     region_to_platform = {
@@ -72,7 +133,7 @@ def get_alternative_platforms(region: str) -> list:
 
 
 @app.get("/api/summonerIcon")
-def get_summoner_icon(name: str, tag: str, region: str):
+async def get_summoner_icon(name: str, tag: str, region: str):
     """
     Fetches the summoner's profile icon ID and returns the icon URL.
     """
@@ -80,7 +141,7 @@ def get_summoner_icon(name: str, tag: str, region: str):
         riot_api_client = RiotAPIClient(default_region=region)
 
         # Get PUUID first
-        puuid = riot_api_client.get_puuid_from_name_and_tag(name, tag, region=region)
+        puuid = await riot_api_client.get_puuid_from_name_and_tag(name, tag, region=region)
 
         if not puuid:
             raise HTTPException(
@@ -89,14 +150,14 @@ def get_summoner_icon(name: str, tag: str, region: str):
 
         # Map region to platform and get summoner info
         platform = get_platform_from_region(region)
-        summoner_data = riot_api_client.get_summoner_by_puuid(puuid, platform=platform)
+        summoner_data = await riot_api_client.get_summoner_by_puuid(puuid, platform=platform)
 
         # Try alternative platforms if first attempt fails
         if not summoner_data or "profileIconId" not in summoner_data:
             for alt_platform in get_alternative_platforms(region):
                 if alt_platform == platform:
                     continue
-                summoner_data = riot_api_client.get_summoner_by_puuid(puuid, platform=alt_platform)
+                summoner_data = await riot_api_client.get_summoner_by_puuid(puuid, platform=alt_platform)
                 if summoner_data and "profileIconId" in summoner_data:
                     break
 
@@ -128,167 +189,471 @@ def get_summoner_icon(name: str, tag: str, region: str):
         ) from e
 
 
-@app.get("/api/matchData")
-def matchData(name: str, tag: str, region: str):
-    try:
-        # Create unique identifier to check in DynamoDB
-        unique_id = f"{name.lower()}_{tag.lower()}_{region.lower()}"
+REQUIRED_MATCH_KEYS = {"kda", "championName", "win"}
 
-        # Check if wrapped data exists in DynamoDB
-        existing_data = get_wrapped_from_dynamodb(unique_id)
 
-        if existing_data:
-            logger.info(f"Found existing wrapped data for {unique_id}")
-            # existing_data has: {"unique_id": "...", "wrapped_data": {...}, "timeline": [...], "parsed_stats": {...}}
-            # We need to return: {"message": {"wrapped": {"unique_id": ..., "wrapped_data": ...}, "timeline": [...], "player_data": {...}}}
-            wrapped_obj = {
-                "unique_id": existing_data.get("unique_id"),
-                "wrapped_data": existing_data.get("wrapped_data"),
-            }
-            result = {
-                "wrapped": wrapped_obj,
-                "timeline": existing_data.get("timeline", []),
-                "player_data": existing_data.get("parsed_stats", {}),
+async def fetch_parsed_matches(
+    riot_api_client: RiotAPIClient, puuid: str, match_ids: list, region: str, on_progress=None
+) -> dict:
+    """
+    Fetches matches concurrently and parses each one for the player.
+
+    `on_progress(done, total)` is called as matches arrive.
+
+    Returns:
+        dict: match_id -> {"match_data": ..., "flattened_data": ...} for every usable match,
+              in match-ID order
+    """
+    match_data_cache = {}  # Cache match data to avoid re-fetching
+
+    matches = await riot_api_client.get_match_metadata_by_match_ids(
+        match_ids=match_ids, region=region, on_progress=on_progress
+    )
+
+    for match_id, match_data in matches.items():
+        if not match_data:
+            continue
+
+        flattened_match_data = parse_match_for_player(match_data=match_data, target_puuid=puuid)
+
+        if flattened_match_data and REQUIRED_MATCH_KEYS.issubset(flattened_match_data):
+            # Store match data for later enrichment
+            match_data_cache[match_id] = {
+                "match_data": match_data,
+                "flattened_data": flattened_match_data,
             }
-            return {"message": result}
+        else:
+            logger.warning("Skipping match: missing necessary keys (likely due to match abort)")
 
-        # If not found in DynamoDB, generate new wrapped data
-        riot_api_client = RiotAPIClient(default_region=region)
-        puuid = riot_api_client.get_puuid_from_name_and_tag(name, tag, region=region)
+    return match_data_cache
 
-        if not puuid:
-            raise HTTPException(
-                status_code=404, detail=f"Could not find player {name}#{tag} in region {region}"
-            )
 
-        logger.info(f"PUUID for {name}#{tag}: {puuid}")
+def aggregate_matches(match_data_cache: dict):
+    """
+    Folds parsed matches, in order, into an aggregator and a compact timeline.
 
-        recent_match_ids = riot_api_client.get_match_ids_by_puuid(puuid=puuid, region=region)
+    Returns:
+        tuple: (MatchStatsAggregator, timeline_data)
+    """
+    match_stats_aggregator = create_match_stats_aggregator()
+    timeline_data = []
+
+    for match_id, cached in match_data_cache.items():
+        flattened_match_data = cached["flattened_data"]
+        match_stats_aggregator.add_match(flattened_match_data)
+        timeline_data.append(timeline_entry(match_id, flattened_match_data))
+
+    return match_stats_aggregator, timeline_data
+
+
+def record_to_result(record: dict) -> dict:
+    """Shapes a stored wrapped record like the matchData response."""
+    # record has: {"unique_id": "...", "wrapped_data": {...}, "timeline": [...], "parsed_stats": {...}, ...}
+    # We need to return: {"wrapped": {"unique_id": ..., "wrapped_data": ...}, "timeline": [...], "player_data": {...}}
+    return {
+        "wrapped": {
+            "unique_id": record.get("unique_id"),
+            "wrapped_data": record.get("wrapped_data"),
+        },
+        "timeline": record.get("timeline", []),
+        "player_data": record.get("parsed_stats", {}),
+        "generated_at": record.get("generated_at"),
+    }
 
-        if not recent_match_ids:
-            raise HTTPException(
-                status_code=404, detail=f"No match history found for player {name}#{tag}"
-            )
 
-        match_stats_aggregator = MatchStatsAggregator()
-        timeline_data = []
-        match_data_cache = {}  # Cache match data to avoid re-fetching
+def enrich_interesting_matches(interesting_matches: list, match_data_cache: dict) -> list:
+    """Adds match details from the cache to the matches picked by the LLM (no API calls)."""
+    enriched_timeline = []
+    for match in interesting_matches:
+        match_id = match["id"]
+        if match_id not in match_data_cache:
+            continue
+
+        cached = match_data_cache[match_id]
+        match_data = cached["match_data"]
+        flattened_match_data = cached["flattened_data"]
+
+        enriched_match = {
+            **match,  # Keep id, kda, champ, win, description from LLM
+            "date": match_data.get("info", {}).get("gameCreation"),
+            "gameDuration": flattened_match_data.get("gameDuration"),
+            "gameMode": match_data.get("info", {}).get("gameMode"),
+            "kills": flattened_match_data.get("kills"),
+            "deaths": flattened_match_data.get("deaths"),
+            "assists": flattened_match_data.get("assists"),
+            "totalDamageDealtToChampions": flattened_match_data.get("totalDamageDealtToChampions"),
+            "goldEarned": flattened_match_data.get("goldEarned"),
+            "visionScore": flattened_match_data.get("visionScore"),
+            "pentaKills": flattened_match_data.get("pentaKills"),
+            "quadraKills": flattened_match_data.get("quadraKills"),
+            "tripleKills": flattened_match_data.get("tripleKills"),
+            "doubleKills": flattened_match_data.get("doubleKills"),
+            "killParticipation": flattened_match_data.get("killParticipation"),
+            "teamPosition": flattened_match_data.get("teamPosition"),
+            # Add item fields (IDs and names)
+            "item0": flattened_match_data.get("item0"),
+            "item1": flattened_match_data.get("item1"),
+            "item2": flattened_match_data.get("item2"),
+            "item3": flattened_match_data.get("item3"),
+            "item4": flattened_match_data.get("item4"),
+            "item5": flattened_match_data.get("item5"),
+            "item6": flattened_match_data.get("item6"),
+            "item0_name": get_item_name(flattened_match_data.get("item0", 0)),
+            "item1_name": get_item_name(flattened_match_data.get("item1", 0)),
+            "item2_name": get_item_name(flattened_match_data.get("item2", 0)),
+            "item3_name": get_item_name(flattened_match_data.get("item3", 0)),
+            "item4_name": get_item_name(flattened_match_data.get("item4", 0)),
+            "item5_name": get_item_name(flattened_match_data.get("item5", 0)),
+            "item6_name": get_item_name(flattened_match_data.get("item6", 0)),
+            # Add summoner spell casts
+            "summoner1Casts": flattened_match_data.get("summoner1Casts"),
+            "summoner2Casts": flattened_match_data.get("summoner2Casts"),
+        }
+        enriched_timeline.append(enriched_match)
+
+    logger.info(f"Enriched {len(enriched_timeline)} interesting matches with details")
+    return enriched_timeline
 
-        for match_id in recent_match_ids:
-            match_data = riot_api_client.get_match_metadata_by_match_id(
-                match_id=match_id, region=region
-            )
-            if match_data:
-                flattened_match_data = parse_match_for_player(
-                    match_data=match_data, target_puuid=puuid
-                )
 
-                required_keys = {"kda", "championName", "win"}
-                if required_keys.issubset(flattened_match_data):
-                    match_stats_aggregator.add_match(flattened_match_data)
+def report_progress(progress, stage: str, percent: float) -> None:
+    """Forwards a pipeline stage to an optional progress(stage, percent) callback."""
+    if progress:
+        progress(stage, percent)
 
-                    # Store match data for later enrichment
-                    match_data_cache[match_id] = {
-                        "match_data": match_data,
-                        "flattened_data": flattened_match_data,
-                    }
 
-                    timeline_data.append(
-                        {
-                            "id": match_id,
-                            "kda": flattened_match_data["kda"],
-                            "champ": flattened_match_data["championName"],
-                            "win": flattened_match_data["win"],
-                        }
-                    )
-                else:
-                    logger.warning(
-                        "Skipping match: missing necessary keys (likely due to match abort)"
-                    )
+def report_partial(on_partial, key: str, value) -> None:
+    """Forwards one finished part of the matchData result to an optional on_partial(key, value)."""
+    if on_partial:
+        on_partial(key, value)
 
-        logger.info(f"Timeline data generated: {timeline_data}")
 
+def report_result(on_partial, result: dict) -> None:
+    """Reports every part of an already complete matchData result, in stream order."""
+    for key in ("player_data", "timeline", "wrapped"):
+        report_partial(on_partial, key, result[key])
+
+
+async def build_player_wrapped(
+    name: str,
+    tag: str,
+    region: str,
+    previous_record: dict = None,
+    progress=None,
+    on_partial=None,
+) -> dict:
+    """
+    Runs the wrapped pipeline for one player and stores the result in DynamoDB.
+
+    When `previous_record` carries aggregation state from an earlier run, only matches
+    newer than the ones it already covers are fetched and folded into that state.
+    `progress(stage, percent)` is called as the pipeline moves through its stages, and
+    `on_partial(key, value)` as each part of the result ("player_data", "timeline",
+    "wrapped") is ready.
+
+    Returns:
+        dict: {"wrapped": {unique_id, wrapped_data} or None, "timeline": [...], "player_data": {...}}
+    """
+    unique_id = f"{name.lower()}_{tag.lower()}_{region.lower()}"
+    previous_record = previous_record or {}
+
+    report_progress(progress, "resolving_player", 2)
+    riot_api_client = RiotAPIClient(default_region=region)
+    puuid = previous_record.get("puuid") or await riot_api_client.get_puuid_from_name_and_tag(
+        name, tag, region=region
+    )
+
+    if not puuid:
+        raise HTTPException(
+            status_code=404, detail=f"Could not find player {name}#{tag} in region {region}"
+        )
+
+    logger.info(f"PUUID for {name}#{tag}: {puuid}")
+
+    report_progress(progress, "fetching_match_ids", 5)
+    recent_match_ids = await riot_api_client.get_match_ids_by_puuid(puuid=puuid, region=region)
+
+    if not recent_match_ids:
+        raise HTTPException(
+            status_code=404, detail=f"No match history found for player {name}#{tag}"
+        )
+
+    # Incremental refresh: only fetch the matches played since the previous run
+    previous_aggregator = None
+    previous_timeline = []
+    match_ids_to_fetch = recent_match_ids
+    last_match_id = previous_record.get("last_match_id")
+    if previous_record.get("aggregator_state") and last_match_id in recent_match_ids:
+        try:
+            previous_aggregator = MatchStatsAggregator.from_state(
+                previous_record["aggregator_state"]
+            )
+            previous_timeline = previous_record.get("match_timeline", [])
+            match_ids_to_fetch = recent_match_ids[: recent_match_ids.index(last_match_id)]
+        except (ValueError, KeyError, TypeError) as e:
+            logger.warning(f"Stored aggregation state for {unique_id} unusable, rebuilding: {e}")
+            previous_aggregator = None
+
+        if previous_aggregator and not match_ids_to_fetch:
+            logger.info(f"No new matches for {unique_id} since the last run")
+            # Nothing to regenerate, but the stored wrapped is now known to be current
+            refreshed_record = {**previous_record, "generated_at": int(time.time())}
+            await run_in_threadpool(queue_wrapped_for_storage, refreshed_record)
+            result = record_to_result(refreshed_record)
+            report_result(on_partial, result)
+            return result
+
+    if previous_aggregator:
+        logger.info(f"Folding {len(match_ids_to_fetch)} new matches into stored stats for {unique_id}")
+
+    # Match fetching is the long stage: it spans 10% to 70%
+    report_progress(progress, "fetching_matches", 10)
+    match_data_cache = await fetch_parsed_matches(
+        riot_api_client,
+        puuid,
+        match_ids_to_fetch,
+        region,
+        on_progress=lambda done, total: report_progress(
+            progress, "fetching_matches", 10 + 60 * done / total
+        ),
+    )
+    match_stats_aggregator, timeline_data = aggregate_matches(match_data_cache)
+
+    if previous_aggregator:
+        # New matches come first, matching the newest-first order of a full run
+        match_stats_aggregator.merge(previous_aggregator)
+        timeline_data += previous_timeline
+
+    logger.info(f"Timeline data generated: {timeline_data}")
+
+    # The stats only need the Riot data, so they can go out before the LLM calls
+    parsed_stats = match_stats_aggregator.get_summary()
+    report_partial(on_partial, "player_data", parsed_stats)
+
+    # The two LLM calls are independent (interesting matches need the timeline, the
+    # wrapped narrative needs the stats), so they run at the same time
+    async def build_timeline() -> list:
         # First, let LLM identify interesting matches
-        interesting_matches = find_and_generate_descriptions_of_interesting_matches(timeline_data)
+        interesting_matches = await run_in_threadpool(
+            find_and_generate_descriptions_of_interesting_matches, timeline_data
+        )
+
+        # Picks from earlier runs aren't in the cache; the match store serves them without API calls
+        missing_match_ids = [
+            match["id"] for match in interesting_matches if match["id"] not in match_data_cache
+        ]
+        if missing_match_ids:
+            match_data_cache.update(
+                await fetch_parsed_matches(riot_api_client, puuid, missing_match_ids, region)
+            )
 
         # Then enrich those matches with additional details from cache
-        enriched_timeline = []
-        for match in interesting_matches:
-            match_id = match["id"]
-
-            # Get cached match data (no additional API calls needed)
-            if match_id in match_data_cache:
-                cached = match_data_cache[match_id]
-                match_data = cached["match_data"]
-                flattened_match_data = cached["flattened_data"]
-
-                # Add additional details to the match
-                enriched_match = {
-                    **match,  # Keep id, kda, champ, win, description from LLM
-                    "date": match_data.get("info", {}).get("gameCreation"),
-                    "gameDuration": flattened_match_data.get("gameDuration"),
-                    "gameMode": match_data.get("info", {}).get("gameMode"),
-                    "kills": flattened_match_data.get("kills"),
-                    "deaths": flattened_match_data.get("deaths"),
-                    "assists": flattened_match_data.get("assists"),
-                    "totalDamageDealtToChampions": flattened_match_data.get(
-                        "totalDamageDealtToChampions"
-                    ),
-                    "goldEarned": flattened_match_data.get("goldEarned"),
-                    "visionScore": flattened_match_data.get("visionScore"),
-                    "pentaKills": flattened_match_data.get("pentaKills"),
-                    "quadraKills": flattened_match_data.get("quadraKills"),
-                    "tripleKills": flattened_match_data.get("tripleKills"),
-                    "doubleKills": flattened_match_data.get("doubleKills"),
-                    "killParticipation": flattened_match_data.get("killParticipation"),
-                    "teamPosition": flattened_match_data.get("teamPosition"),
-                    # Add item fields (IDs and names)
-                    "item0": flattened_match_data.get("item0"),
-                    "item1": flattened_match_data.get("item1"),
-                    "item2": flattened_match_data.get("item2"),
-                    "item3": flattened_match_data.get("item3"),
-                    "item4": flattened_match_data.get("item4"),
-                    "item5": flattened_match_data.get("item5"),
-                    "item6": flattened_match_data.get("item6"),
-                    "item0_name": get_item_name(flattened_match_data.get("item0", 0)),
-                    "item1_name": get_item_name(flattened_match_data.get("item1", 0)),
-                    "item2_name": get_item_name(flattened_match_data.get("item2", 0)),
-                    "item3_name": get_item_name(flattened_match_data.get("item3", 0)),
-                    "item4_name": get_item_name(flattened_match_data.get("item4", 0)),
-                    "item5_name": get_item_name(flattened_match_data.get("item5", 0)),
-                    "item6_name": get_item_name(flattened_match_data.get("item6", 0)),
-                    # Add summoner spell casts
-                    "summoner1Casts": flattened_match_data.get("summoner1Casts"),
-                    "summoner2Casts": flattened_match_data.get("summoner2Casts"),
-                }
-                enriched_timeline.append(enriched_match)
-
-        logger.info(f"Enriched {len(enriched_timeline)} interesting matches with details")
-
-        parsed_stats = match_stats_aggregator.get_summary()
-        player_wrapped = generate_player_wrapped_json(
-            player_data=parsed_stats, name=name, tag=tag, region=region
+        enriched_timeline = await run_in_threadpool(
+            enrich_interesting_matches, interesting_matches, match_data_cache
         )
-
-        result = {
-            "wrapped": player_wrapped,
+        report_partial(on_partial, "timeline", enriched_timeline)
+        return enriched_timeline
+
+    report_progress(progress, "generating_wrapped", 70)
+    enriched_timeline, player_wrapped = await asyncio.gather(
+        build_timeline(),
+        run_in_threadpool(
+            generate_player_wrapped_json,
+            player_data=parsed_stats,
+            name=name,
+            tag=tag,
+            region=region,
+        ),
+    )
+    # Reported after the timeline even when it finishes first, to keep the stream order
+    report_partial(on_partial, "wrapped", player_wrapped)
+
+    # Store the complete data in DynamoDB (merge player_wrapped with timeline and parsed_stats)
+    # player_wrapped = {"unique_id": "...", "wrapped_data": {...}}
+    # We need to store: {"unique_id": "...", "wrapped_data": {...}, "timeline": [...], "parsed_stats": {...}}
+    # plus what the next refresh needs to pick up where this run left off
+    generated_at = int(time.time())
+    if player_wrapped:
+        db_data = {
+            **player_wrapped,  # Spreads unique_id and wrapped_data
             "timeline": enriched_timeline,
-            "player_data": parsed_stats,
+            "parsed_stats": parsed_stats,
+            "puuid": puuid,
+            "last_match_id": recent_match_ids[0],
+            "match_timeline": timeline_data,
+            "aggregator_state": match_stats_aggregator.to_state(),
+            "generated_at": generated_at,
         }
+        report_progress(progress, "storing", 95)
+        await run_in_threadpool(queue_wrapped_for_storage, db_data)
+        logger.info(f"Queued new wrapped data for {unique_id} for storage")
+
+    return {
+        "wrapped": player_wrapped,
+        "timeline": enriched_timeline,
+        "player_data": parsed_stats,
+        "generated_at": generated_at,
+    }
 
-        # Store the complete data in DynamoDB (merge player_wrapped with timeline and parsed_stats)
-        # player_wrapped = {"unique_id": "...", "wrapped_data": {...}}
-        # We need to store: {"unique_id": "...", "wrapped_data": {...}, "timeline": [...], "parsed_stats": {...}}
-        if player_wrapped:
-            db_data = {
-                **player_wrapped,  # Spreads unique_id and wrapped_data
-                "timeline": enriched_timeline,
-                "parsed_stats": parsed_stats,
-            }
-            store_wrapped_in_dynamodb(db_data)
-            logger.info(f"Stored new wrapped data for {unique_id}")
 
-        return {"message": result}
+# Longest a host lock is held waiting for the build's record to be written
+HOST_LOCK_WRITE_TIMEOUT = 30
+
+# Running release_host_lock_when_stored tasks; the event loop only keeps weak
+# references to tasks, so an unreferenced one could be collected mid-run
+host_lock_release_tasks = set()
+
+
+async def release_host_lock_when_stored(lock, unique_id: str) -> None:
+    """Releases a single-flight host lock once `unique_id` has no pending store write."""
+    try:
+        await run_in_threadpool(
+            wrapped_write_queue.wait_until_written, unique_id, HOST_LOCK_WRITE_TIMEOUT
+        )
+    finally:
+        wrapped_single_flight.release_host_lock(lock)
+
+
+# Freshness policy for stored wrapped: younger than WRAPPED_FRESH_SECONDS it is served as
+# is; older, it is served and refreshed in the background, unless it is older than
+# WRAPPED_MAX_STALE_SECONDS (0 = no limit), in which case it is refreshed before responding.
+# Records stored before wrapped had a "generated_at" have no known age; they are served as
+# is and only rebuilt on ?refresh=true, so old records don't all trigger rebuilds at once.
+WRAPPED_FRESH_SECONDS = float(os.getenv("WRAPPED_FRESH_SECONDS", 6 * 3600))
+WRAPPED_MAX_STALE_SECONDS = float(os.getenv("WRAPPED_MAX_STALE_SECONDS", 0))
+
+# unique_ids with a background refresh queued or running in this worker
+scheduled_refreshes = set()
+
+
+def wrapped_age(result: dict):
+    """Seconds since a wrapped result was generated, or None if it predates timestamps."""
+    generated_at = result.get("generated_at")
+    if generated_at is None:
+        return None
+    return max(0.0, time.time() - float(generated_at))
+
+
+def is_stale(age) -> bool:
+    """Whether a wrapped of this age should be refreshed; an unknown age (None) never is."""
+    return age is not None and age > WRAPPED_FRESH_SECONDS
+
+
+def schedule_wrapped_refresh(name: str, tag: str, region: str) -> None:
+    """Queues a background (incremental) refresh of a player's stored wrapped."""
+    unique_id = f"{name.lower()}_{tag.lower()}_{region.lower()}"
+    if unique_id in scheduled_refreshes:
+        return
+
+    async def run(progress):
+        try:
+            result = await get_or_build_wrapped(name, tag, region, refresh=True, progress=progress)
+        finally:
+            scheduled_refreshes.discard(unique_id)
+        # The refreshed wrapped is in the store; the job only records that it happened
+        return {"unique_id": unique_id, "generated_at": result.get("generated_at")}
+
+    params = {"name": name, "tag": tag, "region": region}
+    try:
+        job_manager.submit("wrapped_refresh", params, run)
+        scheduled_refreshes.add(unique_id)
+        logger.info(f"Serving stale wrapped for {unique_id}, refreshing in the background")
+    except JobQueueFullError:
+        logger.warning(f"Job queue full, not refreshing stale wrapped for {unique_id}")
+
+# Marks that get_or_build_wrapped should look the stored record up itself
+NOT_LOOKED_UP = object()
+
+
+async def get_or_build_wrapped(
+    name: str,
+    tag: str,
+    region: str,
+    refresh: bool = False,
+    progress=None,
+    on_partial=None,
+    existing_data=NOT_LOOKED_UP,
+) -> dict:
+    """
+    Returns a player's wrapped from DynamoDB, generating it if needed.
+
+    A stored wrapped past WRAPPED_FRESH_SECONDS is returned right away and refreshed in
+    the background (see schedule_wrapped_refresh); the result's "generated_at" says how
+    old it is; one without "generated_at" is returned as is. `progress` and `on_partial`
+    are passed through to build_player_wrapped; a stored wrapped is reported to
+    `on_partial` all at once. Callers that already read the player's record (None if
+    there was none) pass it as `existing_data`.
+
+    Pipeline failures are raised as HTTPException with the status matchData responds with.
+    """
+    try:
+        # Create unique identifier to check in DynamoDB
+        unique_id = f"{name.lower()}_{tag.lower()}_{region.lower()}"
+
+        # Check if wrapped data exists in DynamoDB
+        report_progress(progress, "checking_cache", 0)
+        if existing_data is NOT_LOOKED_UP:
+            # A refresh starts from the latest stored state, not a cached copy
+            existing_data = await run_in_threadpool(
+                get_wrapped_from_dynamodb, unique_id, use_cache=not refresh
+            )
+
+        if existing_data and not refresh:
+            logger.info(f"Found existing wrapped data for {unique_id}")
+            result = record_to_result(existing_data)
+            age = wrapped_age(result)
+            too_stale = age is not None and 0 < WRAPPED_MAX_STALE_SECONDS < age
+            if not too_stale:
+                if is_stale(age):
+                    schedule_wrapped_refresh(name, tag, region)
+                report_result(on_partial, result)
+                return result
+            logger.info(f"Stored wrapped for {unique_id} is too old to serve, refreshing it")
+
+        # If not found in DynamoDB (or a refresh was asked for), generate new wrapped data.
+        # Concurrent requests for the same player share one run of the pipeline, and each
+        # gets its progress and partial results.
+        async def build(publish):
+            def publish_partial(key, value):
+                publish("partial", key, value)
+
+            lock, waited = await wrapped_single_flight.acquire_host_lock(unique_id)
+            try:
+                previous_record = existing_data
+                if waited:
+                    # Another worker just ran the pipeline for this player; use what it stored
+                    stored_data = await run_in_threadpool(
+                        get_wrapped_from_dynamodb, unique_id, use_cache=False
+                    )
+                    if stored_data and stored_data != existing_data:
+                        result = record_to_result(stored_data)
+                        report_result(publish_partial, result)
+                        return result
+                    previous_record = stored_data
+
+                return await build_player_wrapped(
+                    name,
+                    tag,
+                    region,
+                    previous_record=previous_record,
+                    progress=lambda stage, percent: publish("progress", stage, percent),
+                    on_partial=publish_partial,
+                )
+            finally:
+                # Workers waiting on the lock read the record from the store, so keep it
+                # until the write-behind queue has written it, without delaying this response
+                if lock is not None:
+                    task = asyncio.create_task(release_host_lock_when_stored(lock, unique_id))
+                    host_lock_release_tasks.add(task)
+                    task.add_done_callback(host_lock_release_tasks.discard)
+
+        def follow(kind, *args):
+            if kind == "progress":
+                report_progress(progress, *args)
+            else:
+                report_partial(on_partial, *args)
+
+        result, _ = await wrapped_single_flight.do(unique_id, build, follow)
+        return result
 
     except HTTPException:
         # Re-raise HTTPExceptions so they're not caught by the generic handler
@@ -320,8 +685,173 @@ def matchData(name: str, tag: str, region: str):
         ) from e
 
 
+@app.get("/api/matchData")
+async def matchData(
+    name: str, tag: str, region: str, response: Response, refresh: bool = False
+):
+    """
+    Returns a player's wrapped, generating it if needed.
+
+    With refresh=true, an existing wrapped is updated with the matches played since it was
+    generated instead of being returned as is. The X-Wrapped-Age header gives the wrapped's
+    age in seconds and X-Wrapped-Stale whether a background refresh was started for it.
+    """
+    result = await get_or_build_wrapped(name, tag, region, refresh=refresh)
+    age = wrapped_age(result)
+    if age is not None:
+        response.headers["X-Wrapped-Age"] = str(int(age))
+    response.headers["X-Wrapped-Stale"] = "true" if is_stale(age) else "false"
+    return {"message": result}
+
+
+@app.post("/api/matchData/jobs", status_code=202)
+async def submit_match_data_job(name: str, tag: str, region: str, refresh: bool = False):
+    """
+    Starts generating a player's wrapped in the background and returns the job's status.
+
+    Poll /api/matchData/jobs/{job_id} for its stage and percent complete, then fetch
+    /api/matchData/jobs/{job_id}/result. The job keeps running if the client disconnects.
+    """
+
+    async def run(progress):
+        return await get_or_build_wrapped(name, tag, region, refresh=refresh, progress=progress)
+
+    params = {"name": name, "tag": tag, "region": region, "refresh": refresh}
+    try:
+        return job_manager.submit("wrapped", params, run)
+    except JobQueueFullError as e:
+        logger.warning(f"Rejecting wrapped job for {name}#{tag}: {e}")
+        raise HTTPException(
+            status_code=503,
+            detail="Too many wrapped requests in progress. Please try again shortly.",
+        ) from e
+
+
+def sse_event(event: str, data) -> str:
+    """Formats one Server-Sent Event with a JSON payload."""
+    return f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n"
+
+
+SSE_KEEPALIVE_SECONDS = 15
+
+
+@app.get("/api/matchData/stream")
+async def stream_match_data(name: str, tag: str, region: str, refresh: bool = False):
+    """
+    Streams a player's wrapped as Server-Sent Events while it is generated.
+
+    Events, in order: `job` (the background job's status), `progress` ({stage, percent})
+    while the pipeline runs, then `player_data`, `timeline` and `wrapped`, each carrying
+    that part of the matchData result as soon as it is ready. A failure ends the stream
+    with an `error` event ({status_code, detail}).
+
+    The pipeline runs as a background job, so it finishes (and is stored) even if the
+    client disconnects; the job can still be polled through /api/matchData/jobs.
+    """
+    events: asyncio.Queue = asyncio.Queue()
+
+    async def run(progress):
+        last_progress = None
+
+        def on_progress(stage, percent):
+            nonlocal last_progress
+            progress(stage, percent)
+            if (stage, int(percent)) != last_progress:
+                last_progress = (stage, int(percent))
+                events.put_nowait(("progress", {"stage": stage, "percent": int(percent)}))
+
+        try:
+            result = await get_or_build_wrapped(
+                name,
+                tag,
+                region,
+                refresh=refresh,
+                progress=on_progress,
+                on_partial=lambda key, value: events.put_nowait((key, value)),
+            )
+        except Exception as e:
+            events.put_nowait(
+                (
+                    "error",
+                    {
+                        "status_code": getattr(e, "status_code", 500),
+                        "detail": getattr(e, "detail", None) or str(e),
+                    },
+                )
+            )
+            raise
+        events.put_nowait((None, None))
+        return result
+
+    params = {"name": name, "tag": tag, "region": region, "refresh": refresh}
+    try:
+        job = job_manager.submit("wrapped", params, run)
+    except JobQueueFullError as e:
+        logger.warning(f"Rejecting wrapped stream for {name}#{tag}: {e}")
+        raise HTTPException(
+            status_code=503,
+            detail="Too many wrapped requests in progress. Please try again shortly.",
+        ) from e
+
+    async def event_stream():
+        yield sse_event("job", job)
+        while True:
+            try:
+                event, data = await asyncio.wait_for(events.get(), timeout=SSE_KEEPALIVE_SECONDS)
+            except asyncio.TimeoutError:
+                # A job cancelled before it started never reports back; stop waiting on it
+                status = job_manager.get(job["job_id"])
+                if status and status["status"] == FAILED:
+                    yield sse_event("error", status["error"])
+                    return
+                # Comment line so proxies don't close the connection during the LLM calls
+                yield ": keep-alive\n\n"
+                continue
+
+            if event is None:
+                return
+            yield sse_event(event, data)
+            if event == "error":
+                return
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@app.get("/api/matchData/jobs/{job_id}")
+async def get_match_data_job(job_id: str):
+    """Returns a wrapped job's status, stage and percent complete."""
+    job = await run_in_threadpool(job_manager.get, job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail=f"Unknown or expired job {job_id}")
+    return job
+
+
+@app.get("/api/matchData/jobs/{job_id}/result")
+async def get_match_data_job_result(job_id: str):
+    """
+    Returns a finished wrapped job's result, shaped like the matchData response.
+
+    Responds 202 with the job's status while it is still running, and with the job's
+    error status if it failed.
+    """
+    job = await run_in_threadpool(job_manager.get, job_id, True)
+    if not job:
+        raise HTTPException(status_code=404, detail=f"Unknown or expired job {job_id}")
+
+    if job["status"] == FAILED:
+        raise HTTPException(status_code=job["error"]["status_code"], detail=job["error"]["detail"])
+    if job["status"] != SUCCEEDED:
+        job.pop("result", None)
+        return JSONResponse(status_code=202, content=job)
+    return {"message": job["result"]}
+
+
 @app.get("/api/compareData")
-def compareData(
+async def compareData(
     name1: str,
     tag1: str,
     region1: str,
@@ -338,165 +868,56 @@ def compareData(
         # Create unique comparison ID from both players
         player1_unique_id = f"{name1.lower()}_{tag1.lower()}_{region1.lower()}"
         player2_unique_id = f"{name2.lower()}_{tag2.lower()}_{region2.lower()}"
-        comparison_unique_id = f"comparison_{player1_unique_id}_{player2_unique_id}"
+        # A-vs-B and B-vs-A share one stored comparison, kept in sorted player order
+        comparison_unique_id, reversed_order = canonical_comparison_id(
+            player1_unique_id, player2_unique_id
+        )
 
-        # Check if comparison already exists in DynamoDB
-        existing_comparison = get_wrapped_from_dynamodb(comparison_unique_id)
+        # Look up the comparison and both players' wrapped data in one batch read
+        records = await run_in_threadpool(
+            get_wrapped_batch_from_dynamodb,
+            [comparison_unique_id, player1_unique_id, player2_unique_id],
+        )
+        existing_comparison = records[comparison_unique_id]
+        player1_record = records[player1_unique_id]
+        player2_record = records[player2_unique_id]
         if existing_comparison:
             logger.info(f"Found existing comparison data for {comparison_unique_id}")
-            # Return the cached comparison directly
-            return {"message": existing_comparison.get("comparison_result")}
+            # Return the cached comparison, turned around if it was stored the other way
+            cached_result = existing_comparison.get("comparison_result")
+            if reversed_order and cached_result:
+                cached_result = reorient_comparison(cached_result)
+            return {"message": cached_result}
 
         logger.info(f"No cached comparison found, generating new comparison")
 
         # Helper function to fetch player data
-        def fetch_player_data(name: str, tag: str, region: str):
+        async def fetch_player_data(name: str, tag: str, region: str, existing_data):
             unique_id = f"{name.lower()}_{tag.lower()}_{region.lower()}"
 
-            # ALWAYS check if wrapped data exists in DynamoDB first (no exceptions)
-            existing_data = get_wrapped_from_dynamodb(unique_id)
-            if existing_data:
-                logger.info(f"Found existing wrapped data for {unique_id} in compare mode")
-                # Return the complete cached data
-                return existing_data
-
-            # If not found, generate new wrapped data
-            logger.info(f"No cache found for {unique_id}, generating new data")
-            riot_api_client = RiotAPIClient(default_region=region)
-            puuid = riot_api_client.get_puuid_from_name_and_tag(name, tag, region=region)
-
-            if not puuid:
-                raise HTTPException(
-                    status_code=404, detail=f"Could not find player {name}#{tag} in region {region}"
-                )
-
-            logger.info(f"PUUID for {name}#{tag}: {puuid}")
-
-            # Get match IDs
-            recent_match_ids = riot_api_client.get_match_ids_by_puuid(
-                puuid=puuid, region=region, count=100
-            )
-
-            if not recent_match_ids:
-                raise HTTPException(
-                    status_code=404, detail=f"No match history found for player {name}#{tag}"
-                )
-
-            match_stats_aggregator = MatchStatsAggregator()
-            timeline_data = []
-            match_data_cache = {}
-
-            # Process all matches
-            for match_id in recent_match_ids:
-                match_data = riot_api_client.get_match_metadata_by_match_id(
-                    match_id=match_id, region=region
-                )
-                if match_data:
-                    flattened_match_data = parse_match_for_player(
-                        match_data=match_data, target_puuid=puuid
-                    )
-
-                    required_keys = {"kda", "championName", "win"}
-                    if required_keys.issubset(flattened_match_data):
-                        match_stats_aggregator.add_match(flattened_match_data)
-
-                        # Store match data for later enrichment
-                        match_data_cache[match_id] = {
-                            "match_data": match_data,
-                            "flattened_data": flattened_match_data,
-                        }
-
-                        timeline_data.append(
-                            {
-                                "id": match_id,
-                                "kda": flattened_match_data["kda"],
-                                "champ": flattened_match_data["championName"],
-                                "win": flattened_match_data["win"],
-                            }
-                        )
-
-            # Generate interesting matches with LLM
-            interesting_matches = find_and_generate_descriptions_of_interesting_matches(
-                timeline_data
-            )
+            # Uses stored wrapped data when it exists; otherwise generates (and stores) it,
+            # sharing the run with any matchData request for the same player
+            logger.info(f"Fetching wrapped data for {unique_id} in compare mode")
+            result = await get_or_build_wrapped(name, tag, region, existing_data=existing_data)
 
-            # Enrich timeline matches with additional details
-            enriched_timeline = []
-            for match in interesting_matches:
-                match_id = match["id"]
-                if match_id in match_data_cache:
-                    cached = match_data_cache[match_id]
-                    match_data = cached["match_data"]
-                    flattened_match_data = cached["flattened_data"]
-
-                    enriched_match = {
-                        **match,
-                        "date": match_data.get("info", {}).get("gameCreation"),
-                        "gameDuration": flattened_match_data.get("gameDuration"),
-                        "gameMode": match_data.get("info", {}).get("gameMode"),
-                        "kills": flattened_match_data.get("kills"),
-                        "deaths": flattened_match_data.get("deaths"),
-                        "assists": flattened_match_data.get("assists"),
-                        "totalDamageDealtToChampions": flattened_match_data.get(
-                            "totalDamageDealtToChampions"
-                        ),
-                        "goldEarned": flattened_match_data.get("goldEarned"),
-                        "visionScore": flattened_match_data.get("visionScore"),
-                        "pentaKills": flattened_match_data.get("pentaKills"),
-                        "quadraKills": flattened_match_data.get("quadraKills"),
-                        "tripleKills": flattened_match_data.get("tripleKills"),
-                        "doubleKills": flattened_match_data.get("doubleKills"),
-                        "killParticipation": flattened_match_data.get("killParticipation"),
-                        "teamPosition": flattened_match_data.get("teamPosition"),
-                        # Add item fields (IDs and names)
-                        "item0": flattened_match_data.get("item0"),
-                        "item1": flattened_match_data.get("item1"),
-                        "item2": flattened_match_data.get("item2"),
-                        "item3": flattened_match_data.get("item3"),
-                        "item4": flattened_match_data.get("item4"),
-                        "item5": flattened_match_data.get("item5"),
-                        "item6": flattened_match_data.get("item6"),
-                        "item0_name": get_item_name(flattened_match_data.get("item0", 0)),
-                        "item1_name": get_item_name(flattened_match_data.get("item1", 0)),
-                        "item2_name": get_item_name(flattened_match_data.get("item2", 0)),
-                        "item3_name": get_item_name(flattened_match_data.get("item3", 0)),
-                        "item4_name": get_item_name(flattened_match_data.get("item4", 0)),
-                        "item5_name": get_item_name(flattened_match_data.get("item5", 0)),
-                        "item6_name": get_item_name(flattened_match_data.get("item6", 0)),
-                    }
-                    enriched_timeline.append(enriched_match)
-
-            # Get parsed stats and generate wrapped data
-            parsed_stats = match_stats_aggregator.get_summary()
-            player_wrapped = generate_player_wrapped_json(
-                player_data=parsed_stats, name=name, tag=tag, region=region
-            )
-
-            if not player_wrapped:
+            if not result["wrapped"]:
                 raise HTTPException(
                     status_code=500, detail=f"Failed to generate wrapped data for {name}#{tag}"
                 )
 
-            # Create complete data structure
-            db_data = {
-                **player_wrapped,  # Spreads unique_id and wrapped_data
-                "timeline": enriched_timeline,
-                "parsed_stats": parsed_stats,
-            }
-
-            # ALWAYS store complete data in DynamoDB
-            store_wrapped_in_dynamodb(db_data)
-            logger.info(f"Stored new wrapped data for {unique_id} from compare endpoint")
-
             # Return the complete data structure (same as what we store)
-            return db_data
-
-        # Fetch both players' data
-        logger.info("Fetching data for player 1...")
-        player1_result = fetch_player_data(name1, tag1, region1)
+            return {
+                **result["wrapped"],  # Spreads unique_id and wrapped_data
+                "timeline": result["timeline"],
+                "parsed_stats": result["player_data"],
+            }
 
-        logger.info("Fetching data for player 2...")
-        player2_result = fetch_player_data(name2, tag2, region2)
+        # Fetch both players' data; their pipelines run concurrently
+        logger.info("Fetching data for both players...")
+        player1_result, player2_result = await asyncio.gather(
+            fetch_player_data(name1, tag1, region1, player1_record),
+            fetch_player_data(name2, tag2, region2, player2_record),
+        )
 
         # Validate results exist
         if not player1_result or not player2_result:
@@ -511,7 +932,8 @@ def compareData(
         player1_display = f"{name1}#{tag1}"
         player2_display = f"{name2}#{tag2}"
 
-        comparison_data = generate_player_comparison(
+        comparison_data = await run_in_threadpool(
+            generate_player_comparison,
             player1_data=player1_result,
             player2_data=player2_result,
             player1_name=player1_display,
@@ -558,14 +980,16 @@ def compareData(
         }
 
         # Store the comparison result in DynamoDB for future use
+        stored_result = reorient_comparison(result) if reversed_order else result
+        stored_player_ids = sorted((player1_unique_id, player2_unique_id))
         comparison_cache_data = {
             "unique_id": comparison_unique_id,
-            "comparison_result": result,
-            "player1_id": player1_unique_id,
-            "player2_id": player2_unique_id,
+            "comparison_result": stored_result,
+            "player1_id": stored_player_ids[0],
+            "player2_id": stored_player_ids[1],
         }
-        store_wrapped_in_dynamodb(comparison_cache_data)
-        logger.info(f"Stored comparison data for {comparison_unique_id}")
+        await run_in_threadpool(queue_wrapped_for_storage, comparison_cache_data)
+        logger.info(f"Queued comparison data for {comparison_unique_id} for storage")
 
         return {"message": result}
 
@@ -591,10 +1015,17 @@ def compareData(
 class ChatbotRequest(BaseModel):
     stats: dict
     conversation: list
+    # Summary returned by the previous turn; send it with the conversation returned
+    # alongside it (plus the new message), which no longer has the summarized turns
+    summary: Optional[str] = None
 
 
 @app.post("/api/chatbot/sendMessage")
 def chatbot_send_message(request: ChatbotRequest):
+    """
+    Answers the last message of `conversation`. Returns the reply, the conversation
+    (compacted if it grew too long), the summary of compacted turns and token usage.
+    """
     try:
         stats = request.stats
         conversation = request.conversation
@@ -606,7 +1037,7 @@ def chatbot_send_message(request: ChatbotRequest):
 
         # Call the chatbot function
         logger.info(f"Processing chatbot request with {len(conversation)} messages")
-        result = get_chatbot_response(stats, conversation)
+        result = get_chatbot_response(stats, conversation, summary=request.summary)
 
         if result["success"]:
             logger.info("Chatbot response generated successfully")
@@ -614,6 +1045,7 @@ def chatbot_send_message(request: ChatbotRequest):
                 "success": True,
                 "response": result["response_text"],
                 "conversation": result["conversation"],
+                "summary": result["summary"],
                 "token_usage": result["token_usage"],
             }
         else:
@@ -633,7 +1065,222 @@ def chatbot_send_message(request: ChatbotRequest):
         raise HTTPException(status_code=500, detail="Internal server error") from e
 
 
+@app.post("/api/chatbot/stream")
+def chatbot_stream_message(request: ChatbotRequest):
+    """
+    Streams the chatbot's answer as Server-Sent Events while the model generates it.
+
+    Takes the same body as /api/chatbot/sendMessage. Events: `delta` ({text}) for each
+    piece of the answer, then `done` ({response, conversation, summary, token_usage}) with the same
+    fields sendMessage returns, or `error` ({status_code, detail}) if generation fails.
+    """
+    if len(request.conversation) == 0:
+        logger.warning("Empty conversation provided")
+        raise HTTPException(status_code=400, detail="Conversation cannot be empty")
+
+    logger.info(f"Streaming chatbot response for {len(request.conversation)} messages")
+
+    # A plain generator: Starlette iterates it in the threadpool, so the blocking reads
+    # from the Bedrock stream don't hold up the event loop
+    def event_stream():
+        for event, data in stream_chatbot_response(
+            request.stats, request.conversation, summary=request.summary
+        ):
+            if event == "delta":
+                yield sse_event("delta", data)
+            elif event == "done":
+                yield sse_event(
+                    "done",
+                    {
+                        "success": True,
+                        "response": data["response_text"],
+                        "conversation": data["conversation"],
+                        "summary": data["summary"],
+                        "token_usage": data["token_usage"],
+                    },
+                )
+            else:
+                logger.error(f"Chatbot stream failed: {data.get('error')}")
+                yield sse_event("error", {"status_code": 500, "detail": data.get("error")})
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+class ChatSessionCreateRequest(BaseModel):
+    name: str
+    tag: str
+    region: str
+
+
+class ChatSessionMessageRequest(BaseModel):
+    message: str
+
+
+def load_chat_stats(unique_id: str):
+    """
+    Returns the chatbot stats for a player from their stored wrapped (the matchData
+    result, shaped like the stats the frontend sends to sendMessage), or None.
+    """
+    record = get_wrapped_from_dynamodb(unique_id)
+    if not record:
+        return None
+    result = record_to_result(record)
+    result.pop("generated_at", None)
+    return {"message": result}
+
+
+def get_chat_session(unique_id: str, session_id: str) -> ChatSession:
+    session = chat_sessions.get(unique_id, session_id, load_stats=load_chat_stats)
+    if session is None:
+        raise HTTPException(status_code=404, detail="Chat session not found or expired")
+    return session
+
+
+def start_chat_turn(session: ChatSession, message: str) -> dict:
+    """
+    Takes the session's turn lock and adds the new user message to its conversation.
+    Raises ChatSessionBusyError if the session is still answering another message.
+    """
+    if not session.lock.acquire(blocking=False):
+        raise ChatSessionBusyError(f"Chat session {session.session_id} is busy")
+    user_message = {"role": "user", "content": [{"text": message}]}
+    session.context.append(user_message)
+    return user_message
+
+
+def end_chat_turn(session: ChatSession, user_message: dict, answered: bool) -> None:
+    """
+    Persists the conversation once the model answered (the reply is already in the
+    session's context), or takes the unanswered message back out. Releases the turn lock.
+    """
+    try:
+        if answered:
+            chat_sessions.save(session)
+        elif session.context.messages and session.context.messages[-1] is user_message:
+            session.context.pop()
+    finally:
+        session.lock.release()
+
+
+@app.post("/api/chatbot/sessions", status_code=201)
+def create_chat_session(request: ChatSessionCreateRequest):
+    """
+    Starts a chatbot session for a player whose wrapped has been generated. The stats
+    are loaded from the stored wrapped, so messages sent to the session only carry text.
+    """
+    unique_id = f"{request.name.lower()}_{request.tag.lower()}_{request.region.lower()}"
+    stats = load_chat_stats(unique_id)
+    if stats is None:
+        raise HTTPException(
+            status_code=404, detail=f"No wrapped found for {request.name}#{request.tag}"
+        )
+    return chat_sessions.create(unique_id, stats).snapshot()
+
+
+@app.get("/api/chatbot/sessions/{unique_id}/{session_id}")
+def get_chat_session_state(unique_id: str, session_id: str):
+    """Returns a session's conversation and token estimate."""
+    return get_chat_session(unique_id, session_id).snapshot()
+
+
+@app.delete("/api/chatbot/sessions/{unique_id}/{session_id}")
+def delete_chat_session(unique_id: str, session_id: str):
+    chat_sessions.delete(unique_id, session_id)
+    return {"deleted": True}
+
+
+@app.post("/api/chatbot/sessions/{unique_id}/{session_id}/messages")
+def send_chat_session_message(unique_id: str, session_id: str, request: ChatSessionMessageRequest):
+    """
+    Sends one message to a session and returns the answer. Only the new message is
+    uploaded; the conversation so far is kept on the server.
+    """
+    if not request.message.strip():
+        raise HTTPException(status_code=400, detail="Message cannot be empty")
+
+    session = get_chat_session(unique_id, session_id)
+    try:
+        user_message = start_chat_turn(session, request.message)
+    except ChatSessionBusyError as e:
+        raise HTTPException(status_code=409, detail=str(e)) from e
+
+    # The session's context is compacted and extended with the reply in place
+    result = {"success": False}
+    try:
+        result = get_chatbot_response(session.stats, session.context)
+    finally:
+        end_chat_turn(session, user_message, answered=result["success"])
+
+    if not result["success"]:
+        logger.error(f"Chatbot response failed: {result.get('error')}")
+        raise HTTPException(status_code=500, detail=result.get("error", "Unknown error occurred"))
+
+    return {
+        "success": True,
+        "response": result["response_text"],
+        "token_usage": result["token_usage"],
+        "token_estimate": result["token_estimate"],
+    }
+
+
+@app.post("/api/chatbot/sessions/{unique_id}/{session_id}/stream")
+def stream_chat_session_message(
+    unique_id: str, session_id: str, request: ChatSessionMessageRequest
+):
+    """
+    Streams the answer to a session message as Server-Sent Events: `delta` ({text})
+    events, then `done` ({response, token_usage, token_estimate}) or `error`.
+    """
+    if not request.message.strip():
+        raise HTTPException(status_code=400, detail="Message cannot be empty")
+
+    session = get_chat_session(unique_id, session_id)
+
+    def event_stream():
+        # The turn lock is taken here rather than before responding, so it is always
+        # released by the generator that holds it
+        try:
+            user_message = start_chat_turn(session, request.message)
+        except ChatSessionBusyError as e:
+            yield sse_event("error", {"status_code": 409, "detail": str(e)})
+            return
+
+        answered = False
+        try:
+            for event, data in stream_chatbot_response(session.stats, session.context):
+                if event == "delta":
+                    yield sse_event("delta", data)
+                elif event == "done":
+                    answered = True
+                    yield sse_event(
+                        "done",
+                        {
+                            "success": True,
+                            "response": data["response_text"],
+                            "token_usage": data["token_usage"],
+                            "token_estimate": data["token_estimate"],
+                        },
+                    )
+                else:
+                    logger.error(f"Chatbot stream failed: {data.get('error')}")
+                    yield sse_event("error", {"status_code": 500, "detail": data.get("error")})
+        finally:
+            end_chat_turn(session, user_message, answered)
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
 if __name__ == "__main__":
     PORT = int(os.getenv("BACKEND_PORT", 9000))
-    logger.info(f"Starting server on port {PORT}")
-    uvicorn.run(app, host="0.0.0.0", port=PORT)
+    # Workers share one Riot API key through the RATE_LIMIT_STORE backend
+    WORKERS = int(os.getenv("BACKEND_WORKERS", 1))
+    logger.info(f"Starting server on port {PORT} with {WORKERS} worker(s)")
+    uvicorn.run("main:app", host="0.0.0.0", port=PORT, workers=WORKERS)
@@ -3,24 +3,112 @@ import { MessageCircle, Send, X, ChevronDown } from "lucide-react";
 import ReactMarkdown from "react-markdown";
 import remarkGfm from "remark-gfm";
 
+interface ChatPlayer {
+    name: string;
+    tag: string;
+    region: string;
+}
+
+interface ChatSession {
+    uniqueId: string;
+    sessionId: string;
+}
+
 interface ChatSidebarProps {
     recapData: any;
+    player?: ChatPlayer;
     isOpen: boolean;
     onClose: () => void;
 }
 
-export function ChatSidebar({ recapData, isOpen, onClose }: ChatSidebarProps) {
+export function ChatSidebar({ recapData, player, isOpen, onClose }: ChatSidebarProps) {
     const [messages, setMessages] = useState<Array<{ role: string; text: string }>>([]);
     const [input, setInput] = useState("");
     const [loading, setLoading] = useState(false);
     const [isExpanded, setIsExpanded] = useState(false);
     const messagesEndRef = useRef<HTMLDivElement>(null);
+    // Server-side chat session: the server keeps the stats and the conversation,
+    // so each turn only uploads the new message
+    const sessionRef = useRef<ChatSession | null>(null);
 
     // Auto-scroll to bottom
     useEffect(() => {
         messagesEndRef.current?.scrollIntoView({ behavior: "smooth" });
     }, [messages]);
 
+    const createSession = async (backend: string): Promise<ChatSession | null> => {
+        if (!player) return null;
+
+        const response = await fetch(backend + "/api/chatbot/sessions", {
+            method: "POST",
+            headers: {
+                "Content-Type": "application/json",
+            },
+            body: JSON.stringify(player),
+        });
+        if (!response.ok) {
+            console.debug("ChatSidebar could not start a chat session", response.status);
+            return null;
+        }
+
+        const data = await response.json();
+        sessionRef.current = { uniqueId: data.unique_id, sessionId: data.session_id };
+        return sessionRef.current;
+    };
+
+    const sendToSession = (backend: string, session: ChatSession, text: string) =>
+        fetch(
+            `${backend}/api/chatbot/sessions/${encodeURIComponent(session.uniqueId)}/${encodeURIComponent(session.sessionId)}/messages`,
+            {
+                method: "POST",
+                headers: {
+                    "Content-Type": "application/json",
+                },
+                body: JSON.stringify({ message: text }),
+            }
+        );
+
+    const sendStateless = (backend: string, userText: string) => {
+        const url = backend + "/api/chatbot/sendMessage";
+
+        // Build the request body with the detailed stats structure
+        const body = {
+            stats: {
+                message: recapData.message, // Full message object with all stats
+            },
+            conversation: messages
+                .filter((m) => m.role === "user" || m.role === "assistant")
+                .map((m) => ({
+                    role: m.role,
+                    content: [
+                        {
+                            text: m.text,
+                        },
+                    ],
+                }))
+                .concat([
+                    {
+                        role: "user",
+                        content: [
+                            {
+                                text: userText,
+                            },
+                        ],
+                    },
+                ]),
+        };
+
+        console.debug("ChatSidebar sending message", { url, body });
+
+        return fetch(url, {
+            method: "POST",
+            headers: {
+                "Content-Type": "application/json",
+            },
+            body: JSON.stringify(body),
+        });
+    };
+
     const sendMessage = async () => {
         if (!input.trim() || !recapData) return;
 
@@ -30,45 +118,27 @@ export function ChatSidebar({ recapData, isOpen, onClose }: ChatSidebarProps) {
         setLoading(true);
 
         try {
-            const backend = import.meta.env.VITE_BACKEND_URL || "https://riftwrapped.ishaan812.com";
-            const url = backend.replace(/\/$/, "") + "/api/chatbot/sendMessage";
+            const backend = (
+                import.meta.env.VITE_BACKEND_URL || "https://riftwrapped.ishaan812.com"
+            ).replace(/\/$/, "");
 
-            // Build the request body with the detailed stats structure
-            const body = {
-                stats: {
-                    message: recapData.message, // Full message object with all stats
-                },
-                conversation: messages
-                    .filter((m) => m.role === "user" || m.role === "assistant")
-                    .map((m) => ({
-                        role: m.role,
-                        content: [
-                            {
-                                text: m.text,
-                            },
-                        ],
-                    }))
-                    .concat([
-                        {
-                            role: "user",
-                            content: [
-                                {
-                                    text: userText,
-                                },
-                            ],
-                        },
-                    ]),
-            };
-
-            console.debug("ChatSidebar sending message", { url, body });
+            let sessionResponse: Response | null = null;
+            let session = sessionRef.current ?? (await createSession(backend));
+            if (session) {
+                sessionResponse = await sendToSession(backend, session, userText);
+                if (sessionResponse.status === 404) {
+                    // The session expired; start a new one
+                    sessionRef.current = null;
+                    session = await createSession(backend);
+                    sessionResponse = session
+                        ? await sendToSession(backend, session, userText)
+                        : null;
+                }
+            }
 
-            const response = await fetch(url, {
-                method: "POST",
-                headers: {
-                    "Content-Type": "application/json",
-                },
-                body: JSON.stringify(body),
-            });
+            // Without a session (no stored wrapped to start one from yet), send the
+            // stats and the history with the message
+            const response = sessionResponse ?? (await sendStateless(backend, userText));
 
             if (!response.ok) {
                 const errorText = await response.text();
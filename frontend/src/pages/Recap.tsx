@@ -2033,6 +2033,7 @@ export default function Recap() {
       {recapData && (
         <ChatSidebar
           recapData={recapData}
+          player={summonerTag ? { name: summonerName, tag: summonerTag, region } : undefined}
           isOpen={isSidebarOpen}
           onClose={() => setIsSidebarOpen(false)}
         />